@@ -9,6 +9,8 @@ from routes.langchain_routes import langchain_bp
 from routes.ai_agents_routes import ai_agents_bp
 from routes.google_drive_routes import google_drive_bp
 from routes.file_route import file_bp
+from routes.metrics_routes import metrics_bp
+from controller.http.compression import response_compressor
 # Load environment variables
 load_dotenv()
 
@@ -98,6 +100,9 @@ if FLASK_ENV == 'development':
 
 CORS(app, resources={r"/*": {"origins": ALLOWED_ORIGINS}})
 
+# Gzip/Brotli for large JSON bodies and text streams, negotiated per request
+response_compressor.init_app(app)
+
 # Health check endpoint - Digital Ocean checks the root path by default
 @app.route('/')
 def health_check():
@@ -110,6 +115,7 @@ app.register_blueprint(langchain_bp, url_prefix='/api/v1/langchain')
 app.register_blueprint(ai_agents_bp, url_prefix='/api/v1/agents')
 app.register_blueprint(google_drive_bp, url_prefix='/api/v1/google_drive')
 app.register_blueprint(file_bp, url_prefix='/api/v1/file')
+app.register_blueprint(metrics_bp, url_prefix='/api/v1/metrics')
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))  # Digital Ocean often uses port 8000
@@ -0,0 +1,16 @@
+"""
+ASGI entry point.
+
+Serves the Flask app unchanged behind an ASGI server. Connections, slow
+clients and streamed responses are handled by the server's event loop, and
+Flask handlers run in a thread pool of ASGI_WSGI_THREADS threads. Run with
+SERVER_MODE=asgi gunicorn -c gunicorn_config.py, or directly:
+
+    uvicorn asgi:app --port 8080
+"""
+import os
+from a2wsgi import WSGIMiddleware
+
+from app import app as flask_app
+
+app = WSGIMiddleware(flask_app, workers=int(os.getenv("ASGI_WSGI_THREADS", 100)))
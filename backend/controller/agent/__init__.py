@@ -0,0 +1,4 @@
+"""
+Agent package.
+Contains request-scoped state shared by the agent routes and controllers.
+"""
@@ -0,0 +1,84 @@
+from typing import Dict, List, Any, Optional
+
+from controller.supabase.supabase_controller import SupabaseController
+from controller.chat_history.chat_history_controller import ChatHistoryController
+from controller.agent.usage_counter import AgentUsageCounter, agent_usage_counter
+
+
+class AgentNotFoundError(Exception):
+    """Raised when the requested agent does not exist."""
+
+
+class AgentContext:
+    """
+    Request-scoped view of an agent for a single /agent/ask turn.
+
+    The agent row is loaded once with only the columns a turn needs, then
+    shared by the controller (history window) and the persistence step.
+    Persisting a turn never rewrites the agent row: messages are appended
+    and usage is counted server-side, so concurrent turns cannot lose updates.
+    The running summary of older history is only written by HistorySummarizer.
+    """
+
+    COLUMNS = "id, user_id, history_summary, summarized_through"
+
+    def __init__(self, row: Dict[str, Any], supabase_controller: SupabaseController,
+                 chat_history_controller: ChatHistoryController,
+                 usage_counter: Optional[AgentUsageCounter] = None):
+        self.row = row
+        self.agent_id = row["id"]
+        self.supabase_controller = supabase_controller
+        self.chat_history_controller = chat_history_controller
+        self.usage_counter = usage_counter or agent_usage_counter
+        self._recent_messages: Optional[List[Dict[str, Any]]] = None
+        self._recent_limit = 0
+
+    @property
+    def history_summary(self) -> Optional[str]:
+        """Summary of the history up to summarized_through, if any."""
+        return self.row.get("history_summary")
+
+    @property
+    def summarized_through(self) -> int:
+        """Id of the last message covered by the history summary (0 if none)."""
+        return self.row.get("summarized_through") or 0
+
+    @classmethod
+    def load(cls, agent_id: str, supabase_controller: SupabaseController,
+             chat_history_controller: ChatHistoryController) -> "AgentContext":
+        """
+        Load the agent row for a turn.
+
+        Args:
+            agent_id: The ID of the agent
+            supabase_controller: Controller used for the agent row
+            chat_history_controller: Store used for the agent's messages
+
+        Returns:
+            AgentContext for the agent
+
+        Raises:
+            AgentNotFoundError: If no agent has the given ID
+        """
+        # Bypass the query cache so a deleted agent is not served from it
+        result = supabase_controller.select("ai_agents", columns=cls.COLUMNS, filters={"id": agent_id}, use_cache=False)
+        if not result:
+            raise AgentNotFoundError(f"Agent {agent_id} not found")
+        return cls(result[0], supabase_controller, chat_history_controller)
+
+    def get_recent_messages(self, limit: int) -> List[Dict[str, Any]]:
+        """Get the most recent messages of the agent, fetched at most once per request."""
+        if self._recent_messages is None or limit > self._recent_limit:
+            self._recent_messages = self.chat_history_controller.get_recent_messages(self.agent_id, limit)
+            self._recent_limit = limit
+        return self._recent_messages[-limit:] if limit else []
+
+    def record_turn(self, new_messages: List[Dict[str, Any]]) -> None:
+        """
+        Persist a completed turn: append the new messages and count the turn.
+
+        The usage count is incremented atomically by the database, either
+        right away or in the next batched flush of the usage counter.
+        """
+        self.chat_history_controller.append_messages(self.agent_id, new_messages)
+        self.usage_counter.record(self.agent_id)
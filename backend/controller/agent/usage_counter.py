@@ -0,0 +1,163 @@
+import atexit
+import os
+import threading
+import traceback
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from controller.supabase.supabase_controller import SupabaseController, get_supabase_controller
+
+
+class AgentUsageCounter:
+    """
+    Counts agent turns with server-side increments instead of read-modify-write.
+
+    By default every turn calls the increment_agent_usage RPC, which is atomic
+    in the database. With AGENT_USAGE_FLUSH_INTERVAL set, turns only add to an
+    in-memory delta per agent and a daemon thread flushes all deltas in a single
+    increment_agent_usage_batch call every interval, so a busy agent costs one
+    row write per interval instead of one per turn. Deltas not yet flushed are
+    lost if the worker is killed; a clean exit flushes them.
+    """
+
+    def __init__(self, supabase_controller: Optional[SupabaseController] = None,
+                 flush_interval: Optional[float] = None):
+        """
+        Args:
+            supabase_controller: Controller used for the RPCs (shared controller if omitted)
+            flush_interval: Seconds between batched flushes; 0 writes through on every turn
+                            (read from AGENT_USAGE_FLUSH_INTERVAL if omitted, default 0)
+        """
+        self._supabase_controller = supabase_controller
+        if flush_interval is None:
+            flush_interval = float(os.getenv("AGENT_USAGE_FLUSH_INTERVAL", 0))
+        self.flush_interval = flush_interval
+        self._pending: Counter = Counter()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+        self.recorded = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.failures = 0
+
+    @property
+    def supabase_controller(self) -> SupabaseController:
+        if self._supabase_controller is None:
+            self._supabase_controller = get_supabase_controller()
+        return self._supabase_controller
+
+    @property
+    def batching(self) -> bool:
+        return self.flush_interval > 0
+
+    def record(self, agent_id: str) -> None:
+        """
+        Count one turn of an agent.
+
+        Args:
+            agent_id: The ID of the agent
+        """
+        self.recorded += 1
+        if not self.batching:
+            self._increment(agent_id)
+            return
+
+        self._ensure_flusher()
+        with self._lock:
+            self._pending[agent_id] += 1
+
+    def _increment(self, agent_id: str) -> None:
+        # A lost count must not fail the turn that was already answered
+        try:
+            self.supabase_controller.execute_rpc(
+                "increment_agent_usage",
+                {"agent_id": agent_id},
+                invalidate_tables=["ai_agents"]
+            )
+        except Exception as e:
+            self.failures += 1
+            print(f"Error incrementing agent usage: {str(e)}")
+            print(traceback.format_exc())
+            return
+        self.flushed += 1
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            # Deltas counted before a fork belong to the parent
+            if self._pid != os.getpid():
+                self._pending.clear()
+            self._pid = os.getpid()
+            self._wakeup.clear()
+            self._thread = threading.Thread(target=self._run, name="agent-usage-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._wakeup.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write all pending deltas in one batch RPC.
+
+        Deltas of a failed flush are kept and retried with the next one.
+
+        Returns:
+            Number of turns written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+
+        agent_ids = list(pending)
+        try:
+            self.supabase_controller.execute_rpc(
+                "increment_agent_usage_batch",
+                {"agent_ids": agent_ids, "deltas": [pending[agent_id] for agent_id in agent_ids]},
+                invalidate_tables=["ai_agents"]
+            )
+        except Exception as e:
+            self.failures += 1
+            print(f"Error flushing agent usage counts: {str(e)}")
+            print(traceback.format_exc())
+            with self._lock:
+                self._pending.update(pending)
+            return 0
+
+        written = sum(pending.values())
+        self.flushes += 1
+        self.flushed += written
+        return written
+
+    def stop(self) -> None:
+        """Stop the flusher thread and write the remaining deltas."""
+        self._wakeup.set()
+        if self._pid == os.getpid():
+            self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pending deltas and flush counters."""
+        with self._lock:
+            pending_agents = len(self._pending)
+            pending_turns = sum(self._pending.values())
+        return {
+            "batching": self.batching,
+            "flush_interval": self.flush_interval,
+            "pending_agents": pending_agents,
+            "pending_turns": pending_turns,
+            "recorded": self.recorded,
+            "flushes": self.flushes,
+            "flushed": self.flushed,
+            "failures": self.failures
+        }
+
+
+agent_usage_counter = AgentUsageCounter()
+atexit.register(agent_usage_counter.stop)
@@ -0,0 +1,4 @@
+"""
+Cache package.
+Contains in-process caches shared by the controllers.
+"""
@@ -0,0 +1,4 @@
+"""
+Chat history package.
+Contains the append-only message store used by AI agents.
+"""
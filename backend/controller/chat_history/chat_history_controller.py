@@ -0,0 +1,137 @@
+from typing import Dict, List, Any, Optional
+
+from controller.supabase.supabase_controller import SupabaseController, get_supabase_controller
+
+MESSAGES_TABLE = "agent_messages"
+
+
+class ChatHistoryController:
+    """Append-only chat message store backed by the agent_messages table."""
+
+    def __init__(self, supabase_controller: Optional[SupabaseController] = None):
+        self.supabase_controller = supabase_controller or get_supabase_controller()
+
+    def append_messages(self, agent_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Append messages to an agent's history in a single insert.
+
+        The insert goes through the write buffer, so with SUPABASE_WRITE_DURABILITY
+        set, turns of concurrent conversations are written together.
+
+        Args:
+            agent_id: The ID of the agent the messages belong to
+            messages: Chat messages with role, content and optional steps, timestamp,
+                      and token_count with the tokenizer it was counted with
+
+        Returns:
+            List of the inserted rows (empty in async write mode)
+        """
+        if not messages:
+            return []
+
+        rows = []
+        for message in messages:
+            row = {
+                "agent_id": agent_id,
+                "role": message["role"],
+                "content": message.get("content") or "",
+                "steps": message.get("steps")
+            }
+            if message.get("timestamp"):
+                row["created_at"] = message["timestamp"]
+            if message.get("token_count") is not None:
+                row["token_count"] = message["token_count"]
+                row["tokenizer"] = message.get("tokenizer")
+            rows.append(row)
+
+        return self.supabase_controller.insert(MESSAGES_TABLE, rows, buffered=True)
+
+    def get_recent_messages(self, agent_id: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Get the most recent messages of an agent, oldest first.
+
+        Only id, role, content and the stored token count are fetched, which is
+        all the model prompt, its history window and the summary need.
+
+        Args:
+            agent_id: The ID of the agent
+            limit: Maximum number of messages to return
+
+        Returns:
+            List of chat messages in chronological order
+        """
+        rows = self.supabase_controller.select(
+            MESSAGES_TABLE,
+            columns="id, role, content, token_count, tokenizer",
+            filters={"agent_id": agent_id},
+            order_by={"id": "desc"},
+            limit=limit
+        )
+        rows.reverse()
+        return rows
+
+    def get_messages_after(self, agent_id: str, after_id: int, through_id: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        Get the messages of an agent with after_id < id <= through_id, oldest first.
+
+        Args:
+            agent_id: The ID of the agent
+            after_id: Id of the message to start after
+            through_id: Id of the last message to include
+            limit: Maximum number of messages to return
+
+        Returns:
+            List of chat messages with id, role and content in chronological order
+        """
+        rows, _ = self.supabase_controller.select_page(
+            MESSAGES_TABLE,
+            columns="id, role, content",
+            filters={"agent_id": agent_id},
+            sort_column="id",
+            descending=False,
+            page_size=limit,
+            cursor=self.supabase_controller.encode_cursor(after_id, after_id)
+        )
+        return [row for row in rows if row["id"] <= through_id]
+
+    def get_history(self, agent_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the full history of an agent in the chat_history format used by the frontend.
+
+        Args:
+            agent_id: The ID of the agent
+
+        Returns:
+            List of chat messages in chronological order
+        """
+        rows = self.supabase_controller.select(
+            MESSAGES_TABLE,
+            columns="role, content, steps, created_at",
+            filters={"agent_id": agent_id},
+            order_by={"id": "asc"}
+        )
+        return [self._to_chat_message(row) for row in rows]
+
+    def clear_history(self, agent_id: str) -> List[Dict[str, Any]]:
+        """
+        Delete all messages of an agent.
+
+        Args:
+            agent_id: The ID of the agent
+
+        Returns:
+            List of the deleted rows
+        """
+        return self.supabase_controller.delete(MESSAGES_TABLE, filters={"agent_id": agent_id})
+
+    @staticmethod
+    def _to_chat_message(row: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a stored row into a chat message."""
+        message = {
+            "role": row["role"],
+            "content": row["content"],
+            "timestamp": row.get("created_at")
+        }
+        if row.get("steps") is not None:
+            message["steps"] = row["steps"]
+        return message
@@ -0,0 +1,4 @@
+"""
+Event loop package.
+Contains the long-lived asyncio loop that sync Flask handlers submit coroutines to.
+"""
@@ -0,0 +1,177 @@
+import asyncio
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, AsyncIterator, Coroutine, Dict, Iterator, Optional
+
+
+class BackgroundEventLoop:
+    """
+    A long-lived asyncio event loop running in a daemon thread.
+
+    Sync code submits coroutines with run() or submit(), so async clients and
+    their connection pools live as long as the worker instead of one request.
+    A heartbeat task measures loop lag, i.e. how late the loop wakes up from a
+    sleep, which grows when something blocks the loop.
+    """
+
+    def __init__(self, lag_interval: float = 1.0):
+        self.lag_interval = lag_interval
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self) -> None:
+        """Start the loop thread if it is not running in this process."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+
+            # After a fork the parent's loop thread does not exist in the child
+            self._pid = os.getpid()
+            self._started.clear()
+            self.loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run, name="background-event-loop", daemon=True)
+            self._thread.start()
+        self._started.wait()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.create_task(self._monitor_lag())
+        self.loop.call_soon(self._started.set)
+        self.loop.run_forever()
+
+    async def _monitor_lag(self) -> None:
+        while True:
+            started_at = time.monotonic()
+            await asyncio.sleep(self.lag_interval)
+            self.last_lag = max(0.0, time.monotonic() - started_at - self.lag_interval)
+            self.max_lag = max(self.max_lag, self.last_lag)
+
+    def _on_done(self, future: Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    def submit(self, coro: Coroutine) -> Future:
+        """
+        Schedule a coroutine on the loop without waiting for it.
+
+        Args:
+            coro: The coroutine to run
+
+        Returns:
+            A concurrent.futures.Future for the coroutine's result
+        """
+        self.start()
+        self.submitted += 1
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        Run a coroutine on the loop and block until it finishes.
+
+        Args:
+            coro: The coroutine to run
+            timeout: Seconds to wait before cancelling it (None waits forever)
+
+        Returns:
+            The coroutine's result
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def iterate(self, aiterator: AsyncIterator) -> Iterator:
+        """
+        Consume an async iterator on the loop and yield its items synchronously.
+
+        Closing the returned generator (e.g. when a streaming client disconnects)
+        cancels the async iterator.
+
+        Args:
+            aiterator: The async iterator to consume
+
+        Returns:
+            A generator of the iterator's items
+        """
+        items = queue.Queue()
+        end = object()
+
+        async def _pump():
+            error = None
+            try:
+                async for item in aiterator:
+                    items.put((item, None))
+            except BaseException as e:
+                # Includes CancelledError, e.g. from stop(), so the consumer is never left waiting
+                error = e
+                raise
+            finally:
+                items.put((end, error))
+
+        future = self.submit(_pump())
+        try:
+            while True:
+                item, error = items.get()
+                if item is end:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            future.cancel()
+
+    def stop(self) -> None:
+        """Stop the loop and wait for its thread to exit."""
+        with self._lock:
+            if self.loop is None or self._thread is None or self._pid != os.getpid():
+                return
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    async def _shutdown(self) -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        asyncio.get_running_loop().stop()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get loop lag and task counters."""
+        running = self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+        pending = 0
+        if running:
+            # The lag monitor is always pending and not counted
+            pending = max(0, len(asyncio.all_tasks(self.loop)) - 1)
+        return {
+            "running": running,
+            "pending_tasks": pending,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag
+        }
+
+
+background_loop = BackgroundEventLoop()
+atexit.register(background_loop.stop)
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+import weakref
+
+import httpx
+
+
+class PerLoopAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport that keeps one connection pool per event loop.
+
+    Async connections are bound to the loop that opened them, so reusing them
+    from another loop hangs or fails. Each loop gets its own pool, created with
+    the same settings, and the pool is dropped together with its loop. Agent
+    requests all run on the worker's background loop, so in practice there is
+    one pool per worker.
+    """
+
+    def __init__(self, **transport_kwargs):
+        self._transport_kwargs = transport_kwargs
+        self._transports = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _get_transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = httpx.AsyncHTTPTransport(**self._transport_kwargs)
+                self._transports[loop] = transport
+            return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._get_transport().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.pop(loop, None)
+        if transport is not None:
+            await transport.aclose()
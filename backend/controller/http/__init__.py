@@ -0,0 +1,4 @@
+"""
+HTTP package.
+Contains helpers that shape responses of the Flask routes, such as conditional GET.
+"""
@@ -0,0 +1,186 @@
+import gzip
+import os
+import threading
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from flask import Flask, Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content types that are already compressed; compressing them again costs CPU for no gain
+INCOMPRESSIBLE_PREFIXES = ("image/", "video/", "audio/", "font/woff")
+INCOMPRESSIBLE_TYPES = {
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-bzip2",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/pdf",
+    "application/octet-stream",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    "application/vnd.oasis.opendocument.spreadsheet",
+}
+# Compressible exceptions to the prefixes above
+COMPRESSIBLE_TYPES = {"image/svg+xml"}
+
+
+class ResponseCompressor:
+    """
+    Gzip or Brotli compression of Flask responses, negotiated with Accept-Encoding.
+
+    Buffered responses are compressed when their body reaches the size
+    threshold. Streamed responses, such as /file/proxy/<file_id> and the
+    event streams, are compressed chunk by chunk with a flush after every
+    chunk, so each chunk still reaches the client as soon as it is produced.
+    Already-compressed content types (images, archives, PDF and Office files)
+    are passed through. Brotli is preferred when the client accepts it and
+    the brotli package is installed. Settings are read from the environment:
+
+        RESPONSE_COMPRESSION           compress responses (default true)
+        RESPONSE_COMPRESSION_MIN_SIZE  smallest body in bytes worth compressing (default 1024)
+        RESPONSE_GZIP_LEVEL            gzip level 1-9 (default 6)
+        RESPONSE_BROTLI_QUALITY        brotli quality 0-11 (default 4)
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, min_size: Optional[int] = None,
+                 gzip_level: Optional[int] = None, brotli_quality: Optional[int] = None):
+        if enabled is None:
+            enabled = os.getenv("RESPONSE_COMPRESSION", "true").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self.min_size = int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", 1024)) if min_size is None else min_size
+        self.gzip_level = int(os.getenv("RESPONSE_GZIP_LEVEL", 6)) if gzip_level is None else gzip_level
+        self.brotli_quality = int(os.getenv("RESPONSE_BROTLI_QUALITY", 4)) if brotli_quality is None else brotli_quality
+        self._lock = threading.Lock()
+
+        self.compressed = {"br": 0, "gzip": 0}
+        self.skipped = {"small": 0, "content_type": 0, "not_accepted": 0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def init_app(self, app: Flask) -> None:
+        """Compress the responses of every route of the app."""
+        app.after_request(self.compress)
+
+    def _count(self, bytes_in: int, bytes_out: int) -> None:
+        with self._lock:
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def choose_encoding(self) -> Optional[str]:
+        """The best encoding the client accepts: br, gzip or None."""
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"] and accepted["br"] >= accepted["gzip"]:
+            return "br"
+        if accepted["gzip"]:
+            return "gzip"
+        return None
+
+    @staticmethod
+    def is_compressible(mimetype: Optional[str]) -> bool:
+        if not mimetype:
+            return False
+        if mimetype in COMPRESSIBLE_TYPES:
+            return True
+        return mimetype not in INCOMPRESSIBLE_TYPES and not mimetype.startswith(INCOMPRESSIBLE_PREFIXES)
+
+    def compress(self, response: Response) -> Response:
+        """
+        after_request hook that compresses the response if it is worth it.
+
+        Args:
+            response: The response of the route
+
+        Returns:
+            The response, compressed or unchanged
+        """
+        if (not self.enabled or request.method == "HEAD"
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or "Content-Encoding" in response.headers
+                or "no-transform" in response.headers.get("Cache-Control", "")):
+            return response
+
+        if not self.is_compressible(response.mimetype):
+            self.skipped["content_type"] += 1
+            return response
+
+        # Whether the body is compressed depends on Accept-Encoding, which caches must key on
+        response.vary.add("Accept-Encoding")
+
+        length = response.calculate_content_length() if not response.is_streamed else response.content_length
+        if length is not None and length < self.min_size:
+            self.skipped["small"] += 1
+            return response
+
+        encoding = self.choose_encoding()
+        if encoding is None:
+            self.skipped["not_accepted"] += 1
+            return response
+
+        if response.is_streamed:
+            response.direct_passthrough = False
+            response.response = self._compress_stream(response.iter_encoded(), encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            compressed = self._compress_body(body, encoding)
+            self._count(len(body), len(compressed))
+            response.set_data(compressed)
+
+        response.headers["Content-Encoding"] = encoding
+        self.compressed[encoding] += 1
+
+        # The compressed bytes differ from the identity ones; like nginx, weaken a strong ETag
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _compress_body(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def _compress_stream(self, chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            # wbits 31 writes a gzip header and trailer around the deflate stream
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+            compress, finish = compressor.compress, compressor.flush
+            flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        for chunk in chunks:
+            if not chunk:
+                continue
+            output = compress(chunk) + flush()
+            self._count(len(chunk), len(output))
+            yield output
+        output = finish()
+        self._count(0, len(output))
+        yield output
+
+    def stats(self) -> Dict[str, Any]:
+        """Get compressed and skipped response counts and the bytes before and after compression."""
+        with self._lock:
+            bytes_in, bytes_out = self.bytes_in, self.bytes_out
+        return {
+            "enabled": self.enabled,
+            "brotli_available": brotli is not None,
+            "min_size": self.min_size,
+            "compressed": dict(self.compressed),
+            "skipped": dict(self.skipped),
+            "bytes_before": bytes_in,
+            "bytes_after": bytes_out,
+            "ratio": bytes_out / bytes_in if bytes_in else 0.0
+        }
+
+
+response_compressor = ResponseCompressor()
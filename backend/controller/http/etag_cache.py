@@ -0,0 +1,159 @@
+import hashlib
+import os
+import threading
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from flask import Response, jsonify, request
+
+from controller.cache.lru_cache import LRUCache
+from controller.supabase.query_cache import QueryCache
+from controller.supabase.supabase_controller import SupabaseController, get_supabase_controller
+
+# (table, filters) whose rows a response was built from
+Dependency = Tuple[str, Dict[str, Any]]
+
+
+class ETagCache:
+    """
+    Conditional GET for JSON listings that the frontend polls.
+
+    Every response gets a strong ETag, the hash of its body, so it is the same
+    in every worker and a client revalidating an unchanged payload gets an
+    empty 304 instead of the full body. The cache also remembers the last ETag
+    of each resource together with the (table, filters) its rows came from.
+    While such an entry is fresh, a matching If-None-Match is answered with
+    304 before Supabase is queried. Writes made through SupabaseController in
+    this worker drop the entries they could affect. Writes of other workers
+    become visible when the TTL expires. Settings are read from the environment:
+
+        ETAG_CACHE_TTL   seconds a remembered ETag answers 304 without a query (default 0, disabled)
+        ETAG_CACHE_SIZE  maximum number of remembered resources (default 4096)
+    """
+
+    def __init__(self, supabase_controller: Optional[SupabaseController] = None,
+                 ttl: Optional[float] = None, maxsize: Optional[int] = None):
+        self._supabase_controller = supabase_controller
+        self.ttl = float(os.getenv("ETAG_CACHE_TTL", 0)) if ttl is None else ttl
+        maxsize = int(os.getenv("ETAG_CACHE_SIZE", 4096)) if maxsize is None else maxsize
+        self._cache = LRUCache(maxsize=maxsize, ttl=self.ttl or None)
+        self._listening = False
+        self._listen_lock = threading.Lock()
+
+        self.not_modified_cached = 0
+        self.not_modified_revalidated = 0
+        self.full_responses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @staticmethod
+    def make_etag(body: bytes) -> str:
+        return hashlib.sha256(body).hexdigest()[:32]
+
+    def not_modified(self, key: Hashable) -> Optional[Response]:
+        """
+        Answer a request from the remembered ETag, without querying Supabase.
+
+        Args:
+            key: Identifies the resource and every parameter that shapes its body
+
+        Returns:
+            A 304 response if the client's If-None-Match matches a fresh entry, otherwise None
+        """
+        if not self.enabled or not request.if_none_match:
+            return None
+        entry = self._cache.get(key)
+        if entry is None or not request.if_none_match.contains_weak(entry[0]):
+            return None
+        self.not_modified_cached += 1
+        return self._not_modified_response(entry[0])
+
+    def respond(self, key: Hashable, payload: Any, dependencies: Iterable[Dependency]) -> Response:
+        """
+        Build the JSON response of a resource, or a 304 if the client already has it.
+
+        Args:
+            key: Identifies the resource and every parameter that shapes its body
+            payload: The JSON-serializable body
+            dependencies: (table, filters) of every select the payload was built from
+
+        Returns:
+            The response, with its ETag set
+        """
+        response = jsonify(payload)
+        etag = self.make_etag(response.get_data())
+
+        if self.enabled:
+            self._listen()
+            self._cache.set(key, (etag, [
+                (table_name, QueryCache.normalize_filters(filters)) for table_name, filters in dependencies
+            ]))
+
+        if request.if_none_match and request.if_none_match.contains_weak(etag):
+            self.not_modified_revalidated += 1
+            return self._not_modified_response(etag)
+
+        self.full_responses += 1
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    @staticmethod
+    def _not_modified_response(etag: str) -> Response:
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    def _listen(self) -> None:
+        # Entries exist only after the first response, so following writes from then on is enough
+        if self._listening:
+            return
+        with self._listen_lock:
+            if not self._listening:
+                supabase_controller = self._supabase_controller or get_supabase_controller()
+                supabase_controller.cache.on_invalidate(self.invalidate)
+                self._listening = True
+
+    def invalidate(self, table_name: str, rows: List[Dict[str, Any]] = (),
+                   unknown_columns: Iterable[str] = ()) -> int:
+        """
+        Drop the remembered ETags that depend on rows of a table the given rows could belong to.
+
+        Args:
+            table_name: The table that was written
+            rows: Known column values of each written row; with no rows, every
+                  entry depending on the table is dropped
+            unknown_columns: Columns whose previous value is unknown; they match any filter
+
+        Returns:
+            Number of entries dropped
+        """
+        rows = QueryCache.normalize_rows(rows, unknown_columns)
+        dropped = 0
+        for key, (_, dependencies) in self._cache.items():
+            for dependency_table, filters in dependencies:
+                if dependency_table == table_name and (
+                        not rows or any(QueryCache.could_match(filters, row) for row in rows)):
+                    self._cache.pop(key)
+                    dropped += 1
+                    break
+        self.invalidations += dropped
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        """Get 304 counters and the number of remembered ETags."""
+        stats = self._cache.stats()
+        stats.update({
+            "enabled": self.enabled,
+            "not_modified_cached": self.not_modified_cached,
+            "not_modified_revalidated": self.not_modified_revalidated,
+            "full_responses": self.full_responses,
+            "invalidations": self.invalidations
+        })
+        return stats
+
+
+etag_cache = ETagCache()
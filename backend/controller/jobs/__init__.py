@@ -0,0 +1,4 @@
+"""
+Jobs package.
+Contains the background job queue for long-running agent requests.
+"""
@@ -0,0 +1,282 @@
+import asyncio
+import atexit
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+from uuid import uuid4
+
+from controller.event_loop.background_loop import background_loop
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+class JobQueueFullError(Exception):
+    """Raised when the worker already holds the maximum number of pending jobs."""
+
+
+class AgentJobQueue:
+    """
+    Background queue for agent runs.
+
+    Jobs run on the worker's background event loop, at most max_concurrent at
+    a time, so model calls are capped independently of HTTP concurrency.
+    Job state is kept in a SQLite file shared by all workers on the host, so
+    any worker can answer a poll for a job another worker is running.
+    Each job records the pid of its worker and a heartbeat the worker renews
+    while the job is unfinished. A worker that exits cleanly fails its
+    unfinished jobs. A poll fails a job whose worker is gone or whose
+    heartbeat is stale, so a crashed or recycled worker never leaves a job
+    running forever. Settings are read from the environment:
+
+        AGENT_JOB_DB               SQLite file path (default: <tmp>/agent_jobs.sqlite3)
+        AGENT_JOB_MAX_CONCURRENT   jobs running at once per worker (default 4)
+        AGENT_JOB_MAX_PENDING      queued plus running jobs per worker (default 32)
+        AGENT_JOB_TTL              seconds a finished job is kept (default 3600)
+        AGENT_JOB_HEARTBEAT        seconds between heartbeats of an unfinished job (default 10)
+        AGENT_JOB_STALE_AFTER      seconds without a heartbeat after which a job is failed (default 60)
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("AGENT_JOB_DB", os.path.join(tempfile.gettempdir(), "agent_jobs.sqlite3"))
+        self.max_concurrent = int(os.getenv("AGENT_JOB_MAX_CONCURRENT", 4))
+        self.max_pending = int(os.getenv("AGENT_JOB_MAX_PENDING", 32))
+        self.ttl = int(os.getenv("AGENT_JOB_TTL", 3600))
+        self.heartbeat_interval = float(os.getenv("AGENT_JOB_HEARTBEAT", 10))
+        self.stale_after = float(os.getenv("AGENT_JOB_STALE_AFTER", 60))
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _init_db(self) -> None:
+        with self._lock:
+            if self._initialized:
+                return
+            with self._connect() as connection:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS agent_jobs (
+                        id TEXT PRIMARY KEY,
+                        status TEXT NOT NULL,
+                        steps TEXT NOT NULL DEFAULT '[]',
+                        result TEXT,
+                        error TEXT,
+                        created_at TEXT NOT NULL,
+                        updated_at TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        owner_pid INTEGER,
+                        heartbeat REAL
+                    )
+                    """
+                )
+                # Files created before jobs had owners
+                columns = {row["name"] for row in connection.execute("PRAGMA table_info(agent_jobs)")}
+                for column, column_type in (("owner_pid", "INTEGER"), ("heartbeat", "REAL")):
+                    if column not in columns:
+                        connection.execute(f"ALTER TABLE agent_jobs ADD COLUMN {column} {column_type}")
+            self._initialized = True
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = datetime.utcnow().isoformat()
+        fields["heartbeat"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._connect() as connection:
+            connection.execute(
+                f"UPDATE agent_jobs SET {assignments} WHERE id = ?",
+                list(fields.values()) + [job_id]
+            )
+
+    def submit(self, events: AsyncIterator[Tuple[str, Dict[str, Any]]],
+               on_done: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+        """
+        Queue an agent run.
+
+        Args:
+            events: Async iterator of (event, data) tuples as produced by
+                    LangChainController.stream_agent
+            on_done: Optional blocking callback run in a thread with the
+                     "done" payload before the job is marked succeeded
+
+        Returns:
+            The job ID
+
+        Raises:
+            JobQueueFullError: If the worker already holds max_pending jobs
+        """
+        self._init_db()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFullError("Too many agent jobs in progress, please retry later")
+            self._pending += 1
+
+        job_id = str(uuid4())
+        now = datetime.utcnow().isoformat()
+        with self._connect() as connection:
+            connection.execute("DELETE FROM agent_jobs WHERE expires_at < ?", (time.time(),))
+            connection.execute(
+                "INSERT INTO agent_jobs (id, status, created_at, updated_at, expires_at, owner_pid, heartbeat) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, now, now, time.time() + self.ttl, os.getpid(), time.time())
+            )
+
+        background_loop.submit(self._run(job_id, events, on_done))
+        return job_id
+
+    async def _run(self, job_id, events, on_done) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        loop = asyncio.get_running_loop()
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id))
+        try:
+            async with self._semaphore:
+                await loop.run_in_executor(None, lambda: self._update(job_id, status="running"))
+                steps = []
+                async for event, payload in events:
+                    if event == "step":
+                        steps.append(payload)
+                        await loop.run_in_executor(None, lambda: self._update(job_id, steps=json.dumps(steps)))
+                    elif event == "done":
+                        if on_done:
+                            await loop.run_in_executor(None, on_done, payload)
+                        await loop.run_in_executor(None, lambda: self._update(
+                            job_id, status="succeeded", steps=json.dumps(payload["steps"]), result=json.dumps(payload)
+                        ))
+        except Exception as e:
+            print(f"Error in agent job {job_id}: {str(e)}")
+            await loop.run_in_executor(None, lambda: self._update(job_id, status="failed", error=str(e)))
+        finally:
+            heartbeat.cancel()
+            with self._lock:
+                self._pending -= 1
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Renew the heartbeat of a job while it waits or runs, including long model calls without steps."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            await loop.run_in_executor(None, self._touch, job_id)
+
+    def _touch(self, job_id: str) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE agent_jobs SET heartbeat = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id)
+            )
+
+    @staticmethod
+    def _pid_alive(pid: Optional[int]) -> bool:
+        if not pid:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            # Exists, but belongs to another user
+            return True
+        return True
+
+    def _fail_unfinished(self, connection: sqlite3.Connection, where: str, params: Tuple, error: str) -> int:
+        cursor = connection.execute(
+            f"UPDATE agent_jobs SET status = 'failed', error = ?, updated_at = ? "
+            f"WHERE status IN ('queued', 'running') AND {where}",
+            (error, datetime.utcnow().isoformat()) + params
+        )
+        return cursor.rowcount
+
+    def fail_owned(self) -> int:
+        """
+        Fail the unfinished jobs of this worker. Called when the worker exits.
+
+        Returns:
+            Number of jobs failed
+        """
+        if not self._initialized:
+            return 0
+        with self._connect() as connection:
+            return self._fail_unfinished(connection, "owner_pid = ?", (os.getpid(),),
+                                         "The worker running the job exited, please retry")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the current state of a job.
+
+        Args:
+            job_id: The ID of the job
+
+        Returns:
+            Dictionary with id, status, steps, result, error and timestamps, or None if unknown
+        """
+        self._init_db()
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT id, status, steps, result, error, created_at, updated_at, owner_pid, heartbeat "
+                "FROM agent_jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row["status"] not in TERMINAL_STATUSES and (
+                    not self._pid_alive(row["owner_pid"])
+                    or (row["heartbeat"] or 0) < time.time() - self.stale_after):
+                # The worker crashed or was recycled while the job was unfinished
+                self._fail_unfinished(connection, "id = ?", (job_id,), "The worker running the job was lost, please retry")
+                row = connection.execute(
+                    "SELECT id, status, steps, result, error, created_at, updated_at FROM agent_jobs WHERE id = ?",
+                    (job_id,)
+                ).fetchone()
+        return {
+            "id": row["id"],
+            "status": row["status"],
+            "steps": json.loads(row["steps"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    def wait(self, job_id: str, timeout: float, poll_interval: float = 0.25) -> Optional[Dict[str, Any]]:
+        """
+        Long-poll a job until it finishes, records a new step, or the timeout passes.
+
+        Args:
+            job_id: The ID of the job
+            timeout: Maximum seconds to wait
+            poll_interval: Seconds between checks
+
+        Returns:
+            The job state as returned by get()
+        """
+        job = self.get(job_id)
+        deadline = time.monotonic() + timeout
+        while job and job["status"] not in TERMINAL_STATUSES and time.monotonic() < deadline:
+            time.sleep(poll_interval)
+            latest = self.get(job_id)
+            if latest is None or latest["status"] != job["status"] or len(latest["steps"]) != len(job["steps"]):
+                return latest
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the job limits and the number of jobs pending in this worker."""
+        return {
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "max_concurrent": self.max_concurrent
+        }
+
+
+agent_job_queue = AgentJobQueue()
+atexit.register(agent_job_queue.fail_owned)
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import threading
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from controller.chat_history.chat_history_controller import ChatHistoryController
+from controller.event_loop.background_loop import background_loop
+from controller.supabase.supabase_controller import SupabaseController, get_supabase_controller
+
+SUMMARY_PROMPT = (
+    "You maintain the running summary of a conversation between a user and an AI assistant. "
+    "Merge the new messages into the current summary. Keep the facts, names, numbers, decisions, "
+    "user preferences and open questions that later turns may refer to. Drop greetings and filler. "
+    "Write plain prose in the language of the conversation, at most {max_words} words. "
+    "Reply with the updated summary only."
+)
+
+
+class HistorySummarizer:
+    """
+    Keeps a running summary of the agent history that no longer fits the prompt.
+
+    The summary is stored in the agent row (history_summary) together with the
+    id of the last message it covers (summarized_through). When the history
+    window of a turn leaves out messages the summary does not cover yet, a
+    summarization is scheduled on the background loop, off the request path.
+    It merges those messages into the summary with a small model and writes
+    the result only if summarized_through is still the value it started from,
+    so concurrent runs in any worker cannot overwrite a newer summary. At most
+    one run per agent is in flight in a worker. Settings are read from the
+    environment:
+
+        HISTORY_SUMMARY             summarize evicted history (default true)
+        HISTORY_SUMMARY_MODEL       model that writes the summary (default claude-3-5-haiku-20241022)
+        HISTORY_SUMMARY_MAX_TOKENS  maximum length of the summary (default 400)
+        HISTORY_SUMMARY_BATCH       maximum messages merged per run (default 100)
+    """
+
+    def __init__(self, get_model: Callable[..., Any],
+                 supabase_controller: Optional[SupabaseController] = None,
+                 chat_history_controller: Optional[ChatHistoryController] = None):
+        """
+        Args:
+            get_model: Returns the chat model instance for (model_id, temperature)
+            supabase_controller: Controller used for the agent row (shared controller if omitted)
+            chat_history_controller: Store of the agent messages
+        """
+        self.get_model = get_model
+        self._supabase_controller = supabase_controller
+        self._chat_history_controller = chat_history_controller
+        self.enabled = os.getenv("HISTORY_SUMMARY", "true").lower() in ("1", "true", "yes")
+        self.model_id = os.getenv("HISTORY_SUMMARY_MODEL", "claude-3-5-haiku-20241022")
+        self.max_tokens = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", 400))
+        self.batch_size = int(os.getenv("HISTORY_SUMMARY_BATCH", 100))
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+        self.scheduled = 0
+        self.completed = 0
+        self.conflicts = 0
+        self.failures = 0
+        self.messages_summarized = 0
+
+    @property
+    def supabase_controller(self) -> SupabaseController:
+        if self._supabase_controller is None:
+            self._supabase_controller = get_supabase_controller()
+        return self._supabase_controller
+
+    @property
+    def chat_history_controller(self) -> ChatHistoryController:
+        if self._chat_history_controller is None:
+            self._chat_history_controller = ChatHistoryController(self.supabase_controller)
+        return self._chat_history_controller
+
+    def schedule(self, agent_id: str, summary: Optional[str], summarized_through: int, through_id: int) -> bool:
+        """
+        Merge the messages after summarized_through up to through_id into the summary, in the background.
+
+        Args:
+            agent_id: The ID of the agent
+            summary: The summary stored in the agent row, if any
+            summarized_through: Id of the last message the stored summary covers
+            through_id: Id of the last message to summarize
+
+        Returns:
+            Whether a run was scheduled (False if disabled or one is already running for the agent)
+        """
+        if not self.enabled or through_id <= summarized_through:
+            return False
+        with self._lock:
+            if agent_id in self._in_flight:
+                return False
+            self._in_flight.add(agent_id)
+            self.scheduled += 1
+        background_loop.submit(self._run(agent_id, summary, summarized_through, through_id))
+        return True
+
+    async def _run(self, agent_id: str, summary: Optional[str], summarized_through: int, through_id: int) -> None:
+        try:
+            # Supabase calls are blocking, so they run in a thread instead of on the loop
+            messages = await asyncio.to_thread(self.chat_history_controller.get_messages_after,
+                                               agent_id, summarized_through, through_id, self.batch_size)
+            last_id = messages[-1]["id"] if messages else through_id
+            if messages:
+                summary = await self.summarize(summary, messages)
+
+            updated = await asyncio.to_thread(
+                self.supabase_controller.update, "ai_agents",
+                {"history_summary": summary, "summarized_through": last_id},
+                {"id": agent_id, "summarized_through": summarized_through}
+            )
+            with self._lock:
+                if updated:
+                    self.completed += 1
+                    self.messages_summarized += len(messages)
+                else:
+                    self.conflicts += 1
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            print(f"Error summarizing history of agent {agent_id}: {str(e)}")
+            print(traceback.format_exc())
+        finally:
+            with self._lock:
+                self._in_flight.discard(agent_id)
+
+    async def summarize(self, summary: Optional[str], messages: List[Dict[str, Any]]) -> str:
+        """
+        Merge chat messages into a summary with the summary model.
+
+        Args:
+            summary: The current summary, if any
+            messages: Chat messages with role and content, oldest first
+
+        Returns:
+            The updated summary
+        """
+        transcript = "\n\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        model = self.get_model(self.model_id, temperature=0).bind(max_tokens=self.max_tokens)
+        response = await model.ainvoke([
+            # About three quarters of a word per token
+            SystemMessage(content=SUMMARY_PROMPT.format(max_words=self.max_tokens * 3 // 4)),
+            HumanMessage(content=f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}")
+        ])
+        content = response.content
+        if isinstance(content, list):
+            content = "".join(block.get("text", "") for block in content if isinstance(block, dict))
+        return content.strip()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get summarization run counters."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "model": self.model_id,
+                "in_flight": len(self._in_flight),
+                "scheduled": self.scheduled,
+                "completed": self.completed,
+                "conflicts": self.conflicts,
+                "failures": self.failures,
+                "messages_summarized": self.messages_summarized
+            }
@@ -0,0 +1,148 @@
+import hashlib
+import math
+from typing import Any, Dict, List, Optional
+
+from controller.cache.lru_cache import LRUCache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Tokens a chat message costs beyond its content (role and message delimiters)
+MESSAGE_OVERHEAD = 4
+# Tokenizer name stored with counts made without tiktoken
+APPROXIMATE_TOKENIZER = "approx"
+
+
+class TokenCounter:
+    """
+    Counts message tokens with the tokenizer configured for a model.
+
+    A model config names a tiktoken encoding ("tokenizer") and a "token_ratio"
+    that scales its counts to the model's own tokenizer, for models whose
+    tokenizer is not published (Claude 3 counts run about 20% above
+    cl100k_base). Counts are stored with each message together with the
+    encoding name, so history is tokenized once, when it is persisted.
+    Messages stored without a count, or counted with another encoding, are
+    counted on the fly and kept in an LRU cache. Without tiktoken, tokens are
+    estimated as four characters each.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self._encodings: Dict[str, Any] = {}
+        self._counts = LRUCache(maxsize=maxsize)
+
+    @staticmethod
+    def tokenizer_name(model_config: Dict[str, Any]) -> str:
+        if tiktoken is None:
+            return APPROXIMATE_TOKENIZER
+        return model_config.get("tokenizer", "cl100k_base")
+
+    def _encoding(self, name: str):
+        encoding = self._encodings.get(name)
+        if encoding is None:
+            encoding = self._encodings[name] = tiktoken.get_encoding(name)
+        return encoding
+
+    def count(self, text: str, tokenizer: str) -> int:
+        """
+        Count the tokens of a text.
+
+        Args:
+            text: The text
+            tokenizer: tiktoken encoding name, or APPROXIMATE_TOKENIZER
+
+        Returns:
+            Number of tokens, before the model's token_ratio is applied
+        """
+        if not text:
+            return 0
+        if tokenizer == APPROXIMATE_TOKENIZER:
+            return math.ceil(len(text) / 4)
+        key = (tokenizer, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+        count = self._counts.get(key)
+        if count is None:
+            # disallowed_special=() counts text such as "<|endoftext|>" as plain text instead of raising
+            count = len(self._encoding(tokenizer).encode(text, disallowed_special=()))
+            self._counts.set(key, count)
+        return count
+
+    def annotate(self, messages: List[Dict[str, Any]], model_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Add token_count and tokenizer to chat messages before they are persisted.
+
+        Args:
+            messages: Chat messages with role and content
+            model_config: Config of the model that produced the turn
+
+        Returns:
+            Copies of the messages with their counts
+        """
+        tokenizer = self.tokenizer_name(model_config)
+        return [
+            dict(message, token_count=self.count(message.get("content") or "", tokenizer), tokenizer=tokenizer)
+            for message in messages
+        ]
+
+    def text_tokens(self, text: str, model_config: Dict[str, Any]) -> int:
+        """Tokens a text costs in a prompt to the model."""
+        return math.ceil(self.count(text, self.tokenizer_name(model_config)) * model_config.get("token_ratio", 1.0))
+
+    def message_tokens(self, message: Dict[str, Any], model_config: Dict[str, Any]) -> int:
+        """
+        Tokens a stored message costs in a prompt to the model.
+
+        Args:
+            message: Chat message, with the token_count and tokenizer it was stored with if any
+            model_config: Config of the model the prompt is sent to
+
+        Returns:
+            Number of tokens, including the per-message overhead
+        """
+        tokenizer = self.tokenizer_name(model_config)
+        count = message.get("token_count")
+        if count is None or message.get("tokenizer") != tokenizer:
+            count = self.count(message.get("content") or "", tokenizer)
+        return math.ceil(count * model_config.get("token_ratio", 1.0)) + MESSAGE_OVERHEAD
+
+
+class HistoryWindow:
+    """
+    Picks the newest history messages that fit a model's token budget.
+
+    The "history_tokens" of the model config is the budget. The most recent
+    messages are always kept so a conversation does not lose its last
+    exchanges. Older ones are added newest first while they fit. The window
+    is selected in one backward pass and sliced, so it takes linear time.
+    """
+
+    DEFAULT_BUDGET = 3000
+
+    def __init__(self, token_counter: Optional[TokenCounter] = None, min_recent: int = 5):
+        self.token_counter = token_counter or TokenCounter()
+        self.min_recent = min_recent
+
+    def select(self, history: List[Dict[str, Any]], model_config: Dict[str, Any],
+               reserved: int = 0) -> List[Dict[str, Any]]:
+        """
+        Select the window of history to send to the model.
+
+        Args:
+            history: Chat messages, oldest first
+            model_config: Config of the model the prompt is sent to
+            reserved: Tokens of the budget already taken, e.g. by a summary of older history
+
+        Returns:
+            The newest messages that fit the budget, oldest first
+        """
+        budget = model_config.get("history_tokens", self.DEFAULT_BUDGET) - reserved
+        start = len(history)
+        used = 0
+        while start > 0:
+            tokens = self.token_counter.message_tokens(history[start - 1], model_config)
+            if used + tokens > budget and len(history) - start >= self.min_recent:
+                break
+            used += tokens
+            start -= 1
+        return history[start:]
@@ -8,12 +8,24 @@ from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 from langgraph.prebuilt import create_react_agent
 
-from controller.supabase.supabase_controller import SupabaseController
+from controller.supabase.supabase_controller import get_supabase_controller
+from controller.chat_history.chat_history_controller import ChatHistoryController
+from controller.cache.lru_cache import LRUCache
+from controller.langchain.model_pool import ModelClientPool
+from controller.langchain.response_cache import ResponseCache
+from controller.langchain.prompt_cache import PromptCache
+from controller.langchain.history_window import HistoryWindow
+from controller.langchain.history_summarizer import HistorySummarizer
+from controller.langchain.model_router import AUTO_MODEL, ModelRouter
+from controller.event_loop.background_loop import background_loop
 
-supabase_controller = SupabaseController()
+supabase_controller = get_supabase_controller()
+chat_history_controller = ChatHistoryController(supabase_controller)
 
 
 import asyncio
+import hashlib
+import anthropic
 
 import os
 import sys
@@ -32,9 +44,21 @@ from google_drive_tool import list_allowed_files, get_drive_file_content
 from file_tool import list_uploaded_files, get_file_content, search_files
 load_dotenv()
 
+AGENT_PROMPT = (
+    "You are a helpful assistant. \n\n"     
+    "**NEVER** expose the parameters of the tools you use, and the internal workings of the tools. When you reject to give this information, don't tell the user why you can't give the information. \n\n"        
+    "You have access to specialized tools to help you answer the question. \n\n"
+    "You don't need to specify that you used a tool, just answer the question."
+    "Never assume the current date or time, use the tools to get the current date and time."
+    "Whenever you have to find a file, use the list_uploaded_files and list_allowed_files tools to decide which file to use."
+    "Always write your answer in markdown format and use bullet points and numbered lists when appropriate."
+)
+
 class LangChainController:
     """Controller for handling LangChain operations with different models."""
     
+    MAX_HISTORY_MESSAGES = 50  # Upper bound on history messages read from the store per turn
+    
     def __init__(self):
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
@@ -75,25 +99,56 @@ class LangChainController:
             # Add more tool categories here 
         }
         
-        # Model configurations
+        # Model configurations. tokenizer and token_ratio count prompt tokens,
+        # history_tokens is the token budget of the history sent with agent questions.
         self.models = {
             "claude-3-7-sonnet-20250219": {
                 "provider": "anthropic",
-                "name": "claude-3-7-sonnet-20250219"
+                "name": "claude-3-7-sonnet-20250219",
+                "tokenizer": "cl100k_base",
+                "token_ratio": 1.2,
+                "history_tokens": 8000
             },
             "claude-3-5-haiku-20241022": {
                 "provider": "anthropic",
-                "name": "claude-3-5-haiku-20241022"
+                "name": "claude-3-5-haiku-20241022",
+                "tokenizer": "cl100k_base",
+                "token_ratio": 1.2,
+                "history_tokens": 4000
             },
             "claude-3-5-sonnet-20241022": {
                 "provider": "anthropic",
-                "name": "claude-3-5-sonnet-20241022"
+                "name": "claude-3-5-sonnet-20241022",
+                "tokenizer": "cl100k_base",
+                "token_ratio": 1.2,
+                "history_tokens": 8000
             },
             # add more models here
         }
+        
+        # Compiled ReAct agents keyed by (model, tool categories, prompt hash)
+        self.agent_cache = LRUCache(maxsize=int(os.getenv("AGENT_CACHE_SIZE", 32)))
+        
+        # Model clients and their HTTP connections, shared by all requests of this worker
+        self.model_pool = ModelClientPool()
+        
+        # Answers of ask_question keyed by normalized question and model
+        self.response_cache = ResponseCache()
+        
+        # Cache breakpoints of agent requests and their cached token counts
+        self.prompt_cache = PromptCache()
+        
+        # Token-budgeted window of the history sent with agent questions
+        self.history_window = HistoryWindow()
+        
+        # Running summary of the history that left the window, updated in the background
+        self.history_summarizer = HistorySummarizer(self.get_model_instance, supabase_controller, chat_history_controller)
+        
+        # Picks the model of requests made with model "auto"
+        self.model_router = ModelRouter()
     
-    def get_model_instance(self, model_id):
-        """Get the appropriate model instance based on the model ID."""
+    def get_model_instance(self, model_id, temperature=0.7):
+        """Get the pooled model instance for the model ID and temperature."""
         if model_id not in self.models:
             raise ValueError(f"Model {model_id} not supported")
         
@@ -101,31 +156,49 @@ class LangChainController:
         provider = model_config["provider"]
         model_name = model_config["name"]
         
+        return self.model_pool.get(
+            provider, model_name, temperature,
+            lambda: self._create_model_instance(provider, model_name, temperature)
+        )
+    
+    def _create_model_instance(self, provider, model_name, temperature):
+        """Create a model instance wired to the shared HTTP connection pool."""
         if provider == "openai":
             if not self.openai_api_key:
                 raise ValueError("OpenAI API key not found")
             return ChatOpenAI(
                 model_name=model_name,
                 openai_api_key=self.openai_api_key,
-                temperature=0.7
+                temperature=temperature,
+                http_client=self.model_pool.http_client,
+                http_async_client=self.model_pool.http_async_client
             )
         
         elif provider == "anthropic":
             if not self.anthropic_api_key:
                 raise ValueError("Anthropic API key not found")
-            return ChatAnthropic(
+            model = ChatAnthropic(
                 model_name=model_name,
                 anthropic_api_key=self.anthropic_api_key,
-                temperature=0.7
+                temperature=temperature
+            )
+            # ChatAnthropic does not take HTTP clients, so swap in SDK clients that use the pool.
+            # They are built from its own client params to keep the base URL, headers and timeout.
+            client_params = model._client_params
+            model._client = anthropic.Client(**{**client_params, "http_client": self.model_pool.http_client})
+            model._async_client = anthropic.AsyncClient(
+                **{**client_params, "http_client": self.model_pool.http_async_client}
             )
+            return model
         
         elif provider == "google":
             if not self.google_api_key:
                 raise ValueError("Google API key not found")
+            # Google clients use gRPC channels, which are kept alive by reusing the instance
             return ChatGoogleGenerativeAI(
                 model=model_name,
                 google_api_key=self.google_api_key,
-                temperature=0.7
+                temperature=temperature
             )
         
         raise ValueError(f"Provider {provider} not supported")
@@ -148,16 +221,55 @@ class LangChainController:
             for model_id, config in self.models.items()
         ]
     
-    def ask_question(self, question, model_id="claude-3-5-haiku-20241022"):
-        """Ask a question to the specified model and return the answer."""
+    def ask_question(self, question, model_id="claude-3-5-haiku-20241022", use_cache=True):
+        """
+        Ask a question to the specified model and return the answer.
+
+        :param question: The question to ask
+        :param model_id: The ID of the model to use, or "auto" to let the model router pick one
+        :param use_cache: Serve a cached answer to the same or a similar question if there is one
+        :return: {"answer", "model", "cached"}, plus "similarity" when the answer was cached for a similar question
+        """
+        if model_id == AUTO_MODEL:
+            decision = self.model_router.route(question, tool_categories=())
+            error = None
+            try:
+                result = self.ask_question(question, decision["model"], use_cache)
+                return result
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                # Cached answers say nothing about the model's latency or health
+                if error is not None or not result["cached"]:
+                    self.model_router.record(decision, error)
+        
         try:
+            if use_cache:
+                cached = self.response_cache.get(question, model_id)
+                if cached is not None:
+                    result = {
+                        "answer": cached["answer"],
+                        "model": model_id,
+                        "cached": True
+                    }
+                    if cached["similarity"] < 1.0:
+                        result["similarity"] = round(cached["similarity"], 4)
+                    return result
+            
             model = self.get_model_instance(model_id)
             message = HumanMessage(content=question)
             response = model.invoke([message])
             
+            if use_cache and isinstance(response.content, str):
+                usage = getattr(response, "usage_metadata", None) or {}
+                tokens = usage.get("total_tokens") or None
+                self.response_cache.set(question, model_id, response.content, tokens)
+            
             return {
                 "answer": response.content,
-                "model": model_id
+                "model": model_id,
+                "cached": False
             }
         
         except Exception as e:
@@ -211,88 +323,182 @@ class LangChainController:
             "final_answer": final_answer
         }
 
-    def ask_agent(self, question, model_id="claude-3-5-haiku-20241022", tool_categories=None, user_id=None, agent_id=None):
+    def get_agent(self, model_id, tool_categories=None, prompt=AGENT_PROMPT):
+        """
+        Get a compiled ReAct agent for the model, tool categories and prompt.
+
+        Agents are built once and reused from an LRU cache, since the set of
+        model and tool-category combinations in use is small.
+
+        :param model_id: The ID of the model to use
+        :param tool_categories: (Optional) List of tool category names; None means all tools
+        :param prompt: The system prompt of the agent
+        :return: A compiled LangGraph agent
+        """
+        categories = tuple(sorted(set(tool_categories))) if tool_categories else None
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        key = (model_id, categories, prompt_hash)
+        
+        def _build_agent():
+            model = self.get_model_instance(model_id)
+            
+            selected_tools = []
+            for cat in categories or self.tools.keys():
+                selected_tools.extend(self.tools.get(cat, {}).get("tools", []))
+            
+            # Tools and prompt come first in the request and are the same on every turn, so they are cached
+            return create_react_agent(
+                model=model,
+                tools=selected_tools,
+                prompt=self.prompt_cache.system_prompt(prompt, self.models[model_id]["provider"])
+            )
+        
+        return self.agent_cache.get_or_create(key, _build_agent)
+    
+    def get_agent_cache_stats(self):
+        """Get size and hit/miss counters of the compiled agent cache."""
+        return self.agent_cache.stats()
+    
+    def get_ask_cache_stats(self):
+        """Get hit rate and estimated tokens saved of the ask_question response cache."""
+        return self.response_cache.stats()
+    
+    def count_message_tokens(self, messages, model_id):
+        """
+        Add token counts to chat messages before they are persisted.
+
+        :param messages: Chat messages with role and content
+        :param model_id: The ID of the model that produced the turn
+        :return: Copies of the messages with token_count and tokenizer
+        """
+        return self.history_window.token_counter.annotate(messages, self.models.get(model_id, {}))
+    
+    def get_history_summary_stats(self):
+        """Get run counters of the background history summarizer."""
+        return self.history_summarizer.stats()
+    
+    def _route_agent(self, question, tool_categories=None, agent_context=None):
+        """Route an agent request of model "auto", sizing its history from the request's AgentContext."""
+        history_size = len(agent_context.get_recent_messages(self.MAX_HISTORY_MESSAGES)) if agent_context else 0
+        # Like get_agent, no categories means every tool category
+        categories = [cat for cat in tool_categories or self.tools.keys() if cat in self.tools]
+        return self.model_router.route(question, categories, history_size, len(self.tools))
+    
+    async def _record_route(self, stream, decision):
+        """Pass a routed stream through and record its outcome with the model router."""
+        error = None
+        try:
+            async for item in stream:
+                yield item
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.model_router.record(decision, error)
+    
+    def get_model_router_stats(self):
+        """Get routing counts and the observed latency and error rate per model."""
+        return self.model_router.stats()
+    
+    def get_prompt_cache_stats(self):
+        """Get input, output and cached token totals of agent requests."""
+        return self.prompt_cache.stats()
+    
+    def get_model_pool_stats(self):
+        """Get the pooled model clients and HTTP pool limits."""
+        return self.model_pool.stats()
+
+    def _build_agent_config(self, user_id=None, agent_id=None):
+        """Build the runnable config that injects user_id and agent_id into the tools."""
+        return {
+            "configurable": {
+                "user_id": user_id,
+                "agent_id": agent_id
+            }
+        } if user_id or agent_id else {}
+
+    def _build_agent_messages(self, question, model_id, agent_id=None, agent_context=None):
+        """
+        Build the prompt messages for an agent turn: the summary of older history,
+        a window of recent history and the question.
+
+        :param question: The user's query
+        :param model_id: The ID of the model the messages are sent to
+        :param agent_id: The ID of the agent whose history is used
+        :param agent_context: (Optional) AgentContext already loaded for this request
+        :return: list of LangChain messages
+        """
+        # Only read the window of history that can make it into the prompt
+        summary, summarized_through = None, 0
+        if agent_context:
+            history = agent_context.get_recent_messages(self.MAX_HISTORY_MESSAGES)
+            summary, summarized_through = agent_context.history_summary, agent_context.summarized_through
+        elif agent_id:
+            history = chat_history_controller.get_recent_messages(agent_id, self.MAX_HISTORY_MESSAGES)
+        else:
+            history = []
+
+        # The newest messages not covered by the summary that fit the model's token budget, next to the summary
+        model_config = self.models.get(model_id, {})
+        unsummarized = [msg for msg in history if msg.get("id", 0) > summarized_through]
+        reserved = self.history_window.token_counter.text_tokens(summary, model_config) if summary else 0
+        window = self.history_window.select(unsummarized, model_config, reserved)
+
+        # Fold messages that left the window into the summary, in the background
+        if agent_context and window and (
+                len(window) < len(unsummarized) or len(history) == self.MAX_HISTORY_MESSAGES == len(unsummarized)):
+            self.history_summarizer.schedule(agent_context.agent_id, summary, summarized_through,
+                                             window[0]["id"] - 1)
+
+        messages = []
+        if summary:
+            messages.append(HumanMessage(content=f"Summary of our earlier conversation:\n{summary}"))
+        for msg in window:
+            if msg["role"] == "user":
+                messages.append(HumanMessage(content=msg["content"]))
+            elif msg["role"] == "assistant":
+                messages.append(AIMessage(content=msg["content"]))
+
+        # Add current question, the end of the prefix that the tool-calling steps of the run read from the cache
+        messages.append(HumanMessage(content=question))
+        provider = self.models.get(model_id, {}).get("provider")
+        if summary:
+            # The summary stays put while the window slides, so later turns can reuse the prefix up to it
+            messages = self.prompt_cache.mark_breakpoint(messages, provider, index=0)
+        return self.prompt_cache.mark_breakpoint(messages, provider)
+
+    def ask_agent(self, question, model_id="claude-3-5-haiku-20241022", tool_categories=None, user_id=None, agent_id=None, agent_context=None):
         """
         Use LangGraph's ReAct agent approach to answer a question with multi-step reasoning.
         The agent decides if it needs any of the provided tools.
         
         :param question: The user's query
-        :param model_id: The ID of the model to use (default: 'claude-3-5-haiku-20241022')
+        :param model_id: The ID of the model to use (default: 'claude-3-5-haiku-20241022'),
+                         or "auto" to let the model router pick one
         :param tool_categories: (Optional) List of tool category names to enable (e.g. ["math"])
                             If None, all available tools are used.
         :param user_id: The ID of the user making the request
         :param agent_id: The ID of the agent being used
-        :return: dict with steps and final answer
+        :param agent_context: (Optional) AgentContext already loaded for this request,
+                            used to read the history window without another lookup
+        :return: dict with steps, final answer, the model used and the token usage of the run
         """
+        if model_id == AUTO_MODEL:
+            decision = self._route_agent(question, tool_categories, agent_context)
+            error = None
+            try:
+                return self.ask_agent(question, decision["model"], tool_categories, user_id, agent_id, agent_context)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self.model_router.record(decision, error)
+        
         try:
-            model = self.get_model_instance(model_id)
+            config = self._build_agent_config(user_id, agent_id)
+            messages = self._build_agent_messages(question, model_id, agent_id, agent_context)
             
-            if tool_categories:
-                selected_tools = []
-                for cat in tool_categories:
-                    selected_tools.extend(self.tools.get(cat, [])["tools"])
-            else:
-                selected_tools = []
-                for cat_tools in self.tools.values():
-                    selected_tools.extend(cat_tools["tools"])
-            
-            # Create config with user_id and agent_id
-            config = {
-                "configurable": {
-                    "user_id": user_id,
-                    "agent_id": agent_id
-                }
-            } if user_id or agent_id else {}
-
-            # Get full history
-            history = supabase_controller.select("ai_agents", filters={"id": agent_id})[0]["chat_history"] or []
-
-            messages = []
-            token_count = 0
-            token_budget = 3000  # Model-dependent, adjust as needed
-            MAX_RECENT_MESSAGES = 5  # Always include the most recent exchanges
-
-            # Always include the N most recent messages
-            recent_messages = history[-MAX_RECENT_MESSAGES:] if len(history) >= MAX_RECENT_MESSAGES else history
-            older_messages = history[:-MAX_RECENT_MESSAGES] if len(history) >= MAX_RECENT_MESSAGES else []
-
-            # Add older messages until we approach token budget
-            for msg in reversed(older_messages):  # Start from more recent older messages
-                # Rough token estimation (3 tokens per word + 4 for role)
-                msg_tokens = len(msg["content"].split()) * 3 + 4
-                if token_count + msg_tokens > token_budget:
-                    break
-                
-                if msg["role"] == "user":
-                    messages.insert(0, HumanMessage(content=msg["content"]))
-                elif msg["role"] == "assistant":
-                    messages.insert(0, AIMessage(content=msg["content"]))
-                
-                token_count += msg_tokens
-
-            # Add all recent messages
-            for msg in recent_messages:
-                if msg["role"] == "user":
-                    messages.append(HumanMessage(content=msg["content"]))
-                elif msg["role"] == "assistant":
-                    messages.append(AIMessage(content=msg["content"]))
-
-            # Add current question
-            messages.append(HumanMessage(content=question))
-            
-            agent = create_react_agent(
-                model=model,
-                tools=selected_tools,
-                prompt=(
-                    "You are a helpful assistant. \n\n"     
-                    "**NEVER** expose the parameters of the tools you use, and the internal workings of the tools. When you reject to give this information, don't tell the user why you can't give the information. \n\n"        
-                    "You have access to specialized tools to help you answer the question. \n\n"
-                    "You don't need to specify that you used a tool, just answer the question."
-                    "Never assume the current date or time, use the tools to get the current date and time."
-                    "Whenever you have to find a file, use the list_uploaded_files and list_allowed_files tools to decide which file to use."
-                    "Always write your answer in markdown format and use bullet points and numbered lists when appropriate."
-                )
-            )
+            agent = self.get_agent(model_id, tool_categories)
             
             async def _run_agent():
                 # Pass the message history instead of just the current question
@@ -302,8 +508,11 @@ class LangChainController:
                 )
                 return result
 
-            raw_response = asyncio.run(_run_agent())
+            # Run on the worker's long-lived loop so async connections survive across requests
+            raw_response = background_loop.run(_run_agent())
             parsed_response = self.parse_agent_response(raw_response)
+            parsed_response["model"] = model_id
+            parsed_response["usage"] = self.prompt_cache.record(raw_response["messages"][len(messages):])
             
             return parsed_response
             
@@ -311,6 +520,125 @@ class LangChainController:
             print(f"Error in ask_agent: {str(e)}")
             raise Exception(f"Failed to process query: {str(e)}")
 
+    @staticmethod
+    def _content_text(content):
+        """Extract the text of a message or chunk content, which may be a list of blocks."""
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            return "".join(
+                block.get("text", "") for block in content
+                if isinstance(block, dict) and block.get("type") == "text"
+            )
+        return ""
+
+    async def stream_question(self, question, model_id="claude-3-5-haiku-20241022"):
+        """
+        Stream the answer of the specified model token by token.
+
+        :param question: The question to ask
+        :param model_id: The ID of the model to use, or "auto" to let the model router pick one
+        :return: async generator of (event, data) tuples: "token" events with
+                 {"delta": text}, then one "done" event with {"answer", "model"}
+        """
+        if model_id == AUTO_MODEL:
+            decision = self.model_router.route(question, tool_categories=())
+            async for item in self._record_route(self.stream_question(question, decision["model"]), decision):
+                yield item
+            return
+        
+        model = self.get_model_instance(model_id)
+        answer = ""
+        
+        async for chunk in model.astream([HumanMessage(content=question)]):
+            delta = self._content_text(chunk.content)
+            if delta:
+                answer += delta
+                yield "token", {"delta": delta}
+        
+        yield "done", {"answer": answer, "model": model_id}
+
+    async def stream_agent(self, question, model_id="claude-3-5-haiku-20241022", tool_categories=None, user_id=None, agent_id=None, agent_context=None):
+        """
+        Stream a ReAct agent run as it happens.
+
+        Takes the same parameters as ask_agent.
+
+        :return: async generator of (event, data) tuples:
+                 - "token": {"delta": text} for each text delta of the model
+                 - "step": a step in the shape produced by parse_agent_response,
+                   emitted when its tool has returned
+                 - "done": {"steps", "final_answer", "model", "usage"}, the same result as ask_agent
+        """
+        if model_id == AUTO_MODEL:
+            # Sizing the history may query Supabase, which must not block the shared loop
+            decision = await asyncio.to_thread(self._route_agent, question, tool_categories, agent_context)
+            stream = self.stream_agent(question, decision["model"], tool_categories, user_id, agent_id, agent_context)
+            async for item in self._record_route(stream, decision):
+                yield item
+            return
+        
+        config = self._build_agent_config(user_id, agent_id)
+        # Reading the history is a blocking Supabase select, so it runs in a thread instead of on the loop
+        messages = await asyncio.to_thread(self._build_agent_messages, question, model_id, agent_id, agent_context)
+        agent = self.get_agent(model_id, tool_categories)
+        
+        steps = []
+        open_steps = {}
+        step_description = None
+        text_buffer = ""
+        final_answer = ""
+        model_outputs = []
+        
+        async for event in agent.astream_events({"messages": messages}, config=config, version="v2"):
+            kind = event["event"]
+            data = event.get("data", {})
+            
+            if kind == "on_chat_model_start":
+                text_buffer = ""
+            
+            elif kind == "on_chat_model_stream":
+                delta = self._content_text(data["chunk"].content)
+                if delta:
+                    text_buffer += delta
+                    yield "token", {"delta": delta}
+            
+            elif kind == "on_chat_model_end":
+                output = data.get("output")
+                model_outputs.append(output)
+                if getattr(output, "tool_calls", None):
+                    step_description = text_buffer or None
+                else:
+                    final_answer = self._content_text(getattr(output, "content", text_buffer))
+            
+            elif kind == "on_tool_start":
+                tool_input = dict(data.get("input") or {})
+                tool_input.pop("config", None)
+                step = {
+                    "step": f"Step {len(steps) + 1}",
+                    "description": step_description,
+                    "tool_used": event["name"],
+                    "input": tool_input,
+                    "output": None
+                }
+                steps.append(step)
+                open_steps[event["run_id"]] = step
+            
+            elif kind == "on_tool_end":
+                step = open_steps.pop(event["run_id"], None)
+                if step is None:
+                    continue
+                output = data.get("output")
+                output = getattr(output, "content", output)
+                try:
+                    step["output"] = float(output)
+                except (TypeError, ValueError):
+                    step["output"] = output if isinstance(output, (str, int, float, list, dict)) or output is None else str(output)
+                yield "step", step
+        
+        yield "done", {"steps": steps, "final_answer": final_answer, "model": model_id,
+                       "usage": self.prompt_cache.record(model_outputs)}
+
     def get_available_tools(self):
         """Get a list of all available tools organized by category.
         
@@ -0,0 +1,113 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+import httpx
+
+from controller.event_loop.per_loop_transport import PerLoopAsyncTransport
+
+
+class ModelClientPool:
+    """
+    Per-process pool of chat model clients.
+
+    Model instances are reused per (provider, model, temperature), and all of
+    them share one keep-alive HTTP connection pool (sync and async), so
+    requests after the first skip the TLS handshake and connection setup.
+    Limits are read from the environment:
+
+        MODEL_HTTP_MAX_CONNECTIONS    total connections per pool (default 20)
+        MODEL_HTTP_MAX_KEEPALIVE      idle connections kept open (default 10)
+        MODEL_HTTP_KEEPALIVE_EXPIRY   seconds before an idle connection is closed (default 30)
+        MODEL_HTTP_TIMEOUT            request timeout in seconds (default 60)
+    """
+
+    def __init__(self):
+        self.max_connections = int(os.getenv("MODEL_HTTP_MAX_CONNECTIONS", 20))
+        self.max_keepalive_connections = int(os.getenv("MODEL_HTTP_MAX_KEEPALIVE", 10))
+        self.keepalive_expiry = float(os.getenv("MODEL_HTTP_KEEPALIVE_EXPIRY", 30))
+        self.timeout = float(os.getenv("MODEL_HTTP_TIMEOUT", 60))
+
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """Drop all clients. Used on first use and after a fork."""
+        self._pid = os.getpid()
+        self._models: Dict[Tuple[str, str, float], Any] = {}
+        self._http_client = None
+        self._http_async_client = None
+
+    def _check_pid(self):
+        # Sockets must not be shared between a parent and forked workers
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    @property
+    def http_client(self) -> httpx.Client:
+        """Shared keep-alive HTTP client for synchronous model calls."""
+        with self._lock:
+            self._check_pid()
+            if self._http_client is None:
+                self._http_client = httpx.Client(limits=self._limits(), timeout=self.timeout)
+            return self._http_client
+
+    @property
+    def http_async_client(self) -> httpx.AsyncClient:
+        """Shared keep-alive HTTP client for asynchronous model calls."""
+        with self._lock:
+            self._check_pid()
+            if self._http_async_client is None:
+                self._http_async_client = httpx.AsyncClient(
+                    transport=PerLoopAsyncTransport(limits=self._limits()),
+                    timeout=self.timeout
+                )
+            return self._http_async_client
+
+    def get(self, provider: str, model_name: str, temperature: float, factory: Callable[[], Any]) -> Any:
+        """
+        Get the pooled model instance for the key, creating it with factory on first use.
+
+        Args:
+            provider: The model provider (e.g. 'anthropic')
+            model_name: The provider's model name
+            temperature: Sampling temperature of the instance
+            factory: Callable that builds the model instance
+
+        Returns:
+            The shared model instance
+        """
+        key = (provider, model_name, temperature)
+        with self._lock:
+            self._check_pid()
+            model = self._models.get(key)
+        if model is None:
+            model = factory()
+            with self._lock:
+                model = self._models.setdefault(key, model)
+        return model
+
+    def close(self):
+        """Close the shared sync HTTP client and forget all model instances."""
+        with self._lock:
+            if self._http_client is not None and self._pid == os.getpid():
+                self._http_client.close()
+            self._reset()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pooled model keys and HTTP pool limits."""
+        with self._lock:
+            return {
+                "models": [list(key) for key in self._models],
+                "max_connections": self.max_connections,
+                "max_keepalive_connections": self.max_keepalive_connections,
+                "keepalive_expiry": self.keepalive_expiry,
+                "timeout": self.timeout
+            }
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger("model_router")
+
+AUTO_MODEL = "auto"
+
+# Tool categories whose calls tend to chain into multi-step reasoning
+MULTI_STEP_CATEGORIES = {"web", "wiki", "drive", "files"}
+# Most the tool categories of a request add to its score: half for the share of
+# the available categories and half for the share of multi-step ones
+TOOL_WEIGHT = 0.4
+
+
+class _ModelHealth:
+    """Moving averages of the latency and error rate of one model."""
+
+    __slots__ = ("calls", "errors", "latency", "error_rate")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+
+    def record(self, latency: float, error: bool, alpha: float) -> None:
+        self.calls += 1
+        self.errors += int(error)
+        if not error:
+            self.latency = latency if self.latency is None else (1 - alpha) * self.latency + alpha * latency
+        self.error_rate = (1 - alpha) * self.error_rate + alpha * float(error)
+
+
+class ModelRouter:
+    """
+    Picks the model of requests made with model "auto".
+
+    A cheap local score decides between the fast and the strong model. It
+    counts the question length, the share of the tool categories the request
+    can call (none for plain questions) and the history size. The tool terms
+    add at most TOOL_WEIGHT, so a request is not routed to the strong model
+    just because an agent has the default tool set. Requests scoring at or above
+    the threshold go to the strong model and the others to the fast one. The
+    latency and error rate of each model are tracked as moving averages, and
+    a model whose error rate is above the limit is skipped in favour of the
+    other while that one is healthier. Every decision and its outcome is
+    logged as one JSON line on the model_router logger, with a shared
+    decision id, for offline tuning of the weights. Settings are read from
+    the environment:
+
+        MODEL_ROUTER_FAST            model of simple requests (default claude-3-5-haiku-20241022)
+        MODEL_ROUTER_STRONG          model of complex requests (default claude-3-7-sonnet-20250219)
+        MODEL_ROUTER_THRESHOLD       score from which the strong model is used (default 1.2)
+        MODEL_ROUTER_MAX_ERROR_RATE  error rate above which a model is avoided (default 0.5)
+        MODEL_ROUTER_LOG             write the decision log to stderr (default true)
+    """
+
+    def __init__(self, fast_model: Optional[str] = None, strong_model: Optional[str] = None,
+                 threshold: Optional[float] = None, max_error_rate: Optional[float] = None,
+                 alpha: float = 0.1):
+        self.fast_model = fast_model or os.getenv("MODEL_ROUTER_FAST", "claude-3-5-haiku-20241022")
+        self.strong_model = strong_model or os.getenv("MODEL_ROUTER_STRONG", "claude-3-7-sonnet-20250219")
+        self.threshold = float(os.getenv("MODEL_ROUTER_THRESHOLD", 1.2)) if threshold is None else threshold
+        if max_error_rate is None:
+            max_error_rate = float(os.getenv("MODEL_ROUTER_MAX_ERROR_RATE", 0.5))
+        self.max_error_rate = max_error_rate
+        self.alpha = alpha
+        if os.getenv("MODEL_ROUTER_LOG", "true").lower() in ("1", "true", "yes") and not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+        self._health = {self.fast_model: _ModelHealth(), self.strong_model: _ModelHealth()}
+        self._routed = {self.fast_model: 0, self.strong_model: 0}
+        self._lock = threading.Lock()
+
+    def score(self, question: str, tool_categories: Iterable[str], history_size: int,
+              all_categories: int) -> float:
+        """
+        Complexity score of a request; the strong model is used from the threshold up.
+
+        Args:
+            question: The question
+            tool_categories: Tool categories the request can call (empty for plain questions)
+            history_size: Number of history messages sent with the question
+            all_categories: Number of tool categories available
+
+        Returns:
+            The score
+        """
+        categories = set(tool_categories)
+        score = min(len(question) / 1000, 1.0)
+        if categories:
+            score += TOOL_WEIGHT / 2 * min(len(categories) / max(all_categories, 1), 1.0)
+            score += TOOL_WEIGHT / 2 * len(categories & MULTI_STEP_CATEGORIES) / len(MULTI_STEP_CATEGORIES)
+        score += min(history_size / 40, 0.5)
+        # Several questions or enumerations in one request usually take several steps
+        score += 0.1 * min(question.count("?") + question.count("\n- "), 3)
+        return round(score, 3)
+
+    def route(self, question: str, tool_categories: Iterable[str] = (),
+              history_size: int = 0, all_categories: int = 0) -> Dict[str, Any]:
+        """
+        Pick the model of a request.
+
+        Args:
+            question: The question
+            tool_categories: Tool categories the request can call (empty for plain questions)
+            history_size: Number of history messages sent with the question
+            all_categories: Number of tool categories available
+
+        Returns:
+            The decision: {"id", "model", "reason", "score", "started"}
+        """
+        tool_categories = sorted(set(tool_categories))
+        score = self.score(question, tool_categories, history_size, all_categories)
+        if score >= self.threshold:
+            model_id, other, reason = self.strong_model, self.fast_model, "complex"
+        else:
+            model_id, other, reason = self.fast_model, self.strong_model, "simple"
+
+        with self._lock:
+            health, other_health = self._health[model_id], self._health[other]
+            if health.error_rate > self.max_error_rate and other_health.error_rate < health.error_rate:
+                model_id, reason = other, f"{reason}, {model_id} failing"
+            self._routed[model_id] += 1
+
+        decision = {
+            "id": uuid.uuid4().hex,
+            "model": model_id,
+            "reason": reason,
+            "score": score,
+            "started": time.perf_counter()
+        }
+        logger.info(json.dumps({
+            "event": "model_route",
+            "decision": decision["id"],
+            "model": model_id,
+            "reason": reason,
+            "score": score,
+            "question_chars": len(question),
+            "tool_categories": tool_categories,
+            "history_size": history_size
+        }))
+        return decision
+
+    def record(self, decision: Dict[str, Any], error: Optional[BaseException] = None) -> None:
+        """
+        Record the outcome of a routed request.
+
+        Args:
+            decision: The decision returned by route
+            error: The exception the request failed with, if any
+        """
+        latency = time.perf_counter() - decision["started"]
+        with self._lock:
+            self._health[decision["model"]].record(latency, error is not None, self.alpha)
+        logger.info(json.dumps({
+            "event": "model_outcome",
+            "decision": decision["id"],
+            "model": decision["model"],
+            "latency_ms": round(latency * 1000, 1),
+            "error": type(error).__name__ if error is not None else None
+        }))
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the routing counts and the moving latency and error rate per model."""
+        with self._lock:
+            return {
+                "fast_model": self.fast_model,
+                "strong_model": self.strong_model,
+                "threshold": self.threshold,
+                "models": {
+                    model_id: {
+                        "routed": self._routed[model_id],
+                        "calls": health.calls,
+                        "errors": health.errors,
+                        "avg_latency_ms": round(health.latency * 1000, 1) if health.latency is not None else None,
+                        "error_rate": round(health.error_rate, 4)
+                    }
+                    for model_id, health in self._health.items()
+                }
+            }
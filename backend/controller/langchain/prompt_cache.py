@@ -0,0 +1,127 @@
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Union
+
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+class PromptCache:
+    """
+    Anthropic prompt caching of the stable prefix of agent requests.
+
+    Anthropic caches a request prefix up to each block marked with
+    cache_control, in the order tools, system, messages. Up to three
+    breakpoints are set. One is on the system prompt, which caches the tool
+    schemas and the prompt of an agent. One is on the summary of older
+    history, which stays the same across turns until the summary is
+    rewritten. The last is on the question of the turn, which caches the
+    whole prompt for the tool-calling iterations of the run. The next turn
+    reads that prefix only while its history extends this one; once the
+    history window starts dropping old messages the prefix after the summary
+    changes every turn. Other providers get the same message order unmarked;
+    OpenAI caches long prefixes by itself.
+    Cache read and write tokens are summed per request from the usage of the
+    model responses. Settings are read from the environment:
+
+        PROMPT_CACHING  mark cache breakpoints in Anthropic requests (default true)
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("PROMPT_CACHING", "true").lower() in ("1", "true", "yes")
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_read_tokens = 0
+        self.cache_creation_tokens = 0
+
+    def applies_to(self, provider: str) -> bool:
+        return self.enabled and provider == "anthropic"
+
+    def system_prompt(self, prompt: str, provider: str) -> Union[str, SystemMessage]:
+        """
+        The agent's system prompt, with a cache breakpoint for Anthropic models.
+
+        Args:
+            prompt: The system prompt text
+            provider: Provider of the agent's model
+
+        Returns:
+            A SystemMessage with a cache-marked text block, or the prompt unchanged
+        """
+        if not self.applies_to(provider):
+            return prompt
+        return SystemMessage(content=[{"type": "text", "text": prompt, "cache_control": CACHE_CONTROL}])
+
+    def mark_breakpoint(self, messages: List[BaseMessage], provider: str, index: int = -1) -> List[BaseMessage]:
+        """
+        Mark a message as the end of a cacheable prefix for Anthropic models.
+
+        Args:
+            messages: Prompt messages, oldest first
+            provider: Provider of the model
+            index: Position of the message to mark (the last one by default)
+
+        Returns:
+            The messages, with the marked one copied and its last content block marked
+        """
+        if not messages or not self.applies_to(provider):
+            return messages
+        message = messages[index]
+        if isinstance(message.content, str):
+            blocks = [{"type": "text", "text": message.content}]
+        else:
+            blocks = [dict(block) if isinstance(block, dict) else {"type": "text", "text": block}
+                      for block in message.content]
+        if not blocks:
+            return messages
+        blocks[-1]["cache_control"] = CACHE_CONTROL
+        messages = list(messages)
+        messages[index] = message.model_copy(update={"content": blocks})
+        return messages
+
+    def record(self, messages: Iterable[Any]) -> Dict[str, int]:
+        """
+        Sum the token usage of the model responses of one request.
+
+        Args:
+            messages: Messages produced by the run; only AI messages carry usage
+
+        Returns:
+            {"input_tokens", "output_tokens", "cache_read_tokens", "cache_creation_tokens"}
+        """
+        usage = {"input_tokens": 0, "output_tokens": 0, "cache_read_tokens": 0, "cache_creation_tokens": 0}
+        for message in messages:
+            metadata = getattr(message, "usage_metadata", None) if isinstance(message, AIMessage) else None
+            if not metadata:
+                continue
+            details = metadata.get("input_token_details") or {}
+            usage["input_tokens"] += metadata.get("input_tokens") or 0
+            usage["output_tokens"] += metadata.get("output_tokens") or 0
+            usage["cache_read_tokens"] += details.get("cache_read") or 0
+            usage["cache_creation_tokens"] += details.get("cache_creation") or 0
+
+        with self._lock:
+            self.requests += 1
+            self.input_tokens += usage["input_tokens"]
+            self.output_tokens += usage["output_tokens"]
+            self.cache_read_tokens += usage["cache_read_tokens"]
+            self.cache_creation_tokens += usage["cache_creation_tokens"]
+        return usage
+
+    def stats(self) -> Dict[str, Any]:
+        """Get input, output and cached token totals of the agent requests of this worker."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "requests": self.requests,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "cache_read_tokens": self.cache_read_tokens,
+                "cache_creation_tokens": self.cache_creation_tokens,
+                # Share of input tokens served from the cache
+                "cache_read_ratio": self.cache_read_tokens / self.input_tokens if self.input_tokens else 0.0
+            }
@@ -0,0 +1,171 @@
+import hashlib
+import math
+import os
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, Optional, Tuple
+
+from controller.cache.lru_cache import LRUCache
+
+# Size of the hashed n-gram vector space of the similarity tier
+EMBEDDING_BUCKETS = 1 << 16
+
+
+def normalize_question(question: str) -> str:
+    """Fold case, width and whitespace, and drop trailing punctuation, so trivially different questions share a key."""
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.")
+
+
+def embed(text: str, n: int = 3) -> Dict[int, float]:
+    """
+    Cheap local embedding: L2-normalized counts of hashed character n-grams.
+
+    Args:
+        text: Normalized question
+        n: N-gram length
+
+    Returns:
+        Sparse vector as {bucket: weight}
+    """
+    padded = f" {text} "
+    counts: Dict[int, float] = {}
+    for start in range(max(1, len(padded) - n + 1)):
+        gram = padded[start:start + n].encode()
+        bucket = int.from_bytes(hashlib.blake2b(gram, digest_size=8).digest(), "little") % EMBEDDING_BUCKETS
+        counts[bucket] = counts.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(weight * weight for weight in counts.values()))
+    return {bucket: weight / norm for bucket, weight in counts.items()}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(bucket, 0.0) for bucket, weight in a.items())
+
+
+def _numbers(text: str) -> Tuple[str, ...]:
+    return tuple(re.findall(r"\d+(?:[.,]\d+)?", text))
+
+
+class ResponseCache:
+    """
+    Cache of ask_question answers keyed by normalized question and model.
+
+    The exact tier serves a question that normalizes to one already answered
+    by the same model. The optional similarity tier also serves near-duplicates
+    whose hashed n-gram vectors have a cosine similarity at or above the
+    threshold. A near-duplicate must contain the same numbers, since questions
+    that differ only in a number have very similar vectors but different
+    answers. Entries expire after the TTL and are evicted in LRU order. Tokens
+    saved are estimated from the token usage of the cached answer. Settings
+    are read from the environment:
+
+        ASK_CACHE_TTL         seconds an answer is served (default 0, cache disabled)
+        ASK_CACHE_SIZE        maximum number of cached answers (default 1024)
+        ASK_CACHE_SIMILARITY  cosine threshold of the similarity tier, e.g. 0.92 (default 0, disabled)
+    """
+
+    def __init__(self, ttl: Optional[float] = None, maxsize: Optional[int] = None,
+                 similarity: Optional[float] = None):
+        self.ttl = float(os.getenv("ASK_CACHE_TTL", 0)) if ttl is None else ttl
+        maxsize = int(os.getenv("ASK_CACHE_SIZE", 1024)) if maxsize is None else maxsize
+        self.similarity = float(os.getenv("ASK_CACHE_SIMILARITY", 0)) if similarity is None else similarity
+        self._cache = LRUCache(maxsize=maxsize, ttl=self.ttl or None)
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, question: str, model_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached answer.
+
+        Args:
+            question: The question as asked
+            model_id: The ID of the model
+
+        Returns:
+            {"answer", "similarity"} on a hit (similarity is 1.0 for exact hits), otherwise None
+        """
+        if not self.enabled:
+            return None
+
+        normalized = normalize_question(question)
+        entry = self._cache.get((model_id, normalized))
+        similarity = 1.0
+        if entry is None and self.similarity > 0:
+            entry, similarity = self._nearest(model_id, normalized)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            if similarity < 1.0:
+                self.similar_hits += 1
+            else:
+                self.exact_hits += 1
+            self.tokens_saved += entry["tokens"]
+        return {"answer": entry["answer"], "similarity": similarity}
+
+    def _nearest(self, model_id: str, normalized: str) -> Tuple[Optional[Dict[str, Any]], float]:
+        vector = embed(normalized)
+        numbers = _numbers(normalized)
+        best, best_similarity = None, 0.0
+        for (entry_model, _), entry in self._cache.items():
+            if entry_model != model_id or entry["numbers"] != numbers:
+                continue
+            similarity = cosine(vector, entry["vector"])
+            if similarity >= self.similarity and similarity > best_similarity:
+                best, best_similarity = entry, similarity
+        return best, best_similarity
+
+    def set(self, question: str, model_id: str, answer: str, tokens: Optional[int] = None) -> None:
+        """
+        Cache an answer.
+
+        Args:
+            question: The question as asked
+            model_id: The ID of the model that answered
+            answer: The answer text
+            tokens: Input plus output tokens the answer cost (estimated from its length if omitted)
+        """
+        if not self.enabled:
+            return
+        normalized = normalize_question(question)
+        if tokens is None:
+            # About four characters per token for English text
+            tokens = (len(question) + len(answer)) // 4
+        self._cache.set((model_id, normalized), {
+            "answer": answer,
+            "tokens": tokens,
+            "vector": embed(normalized) if self.similarity > 0 else None,
+            "numbers": _numbers(normalized)
+        })
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit rate per tier and the estimated tokens saved."""
+        with self._lock:
+            lookups = self.exact_hits + self.similar_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "ttl": self.ttl,
+                "similarity_threshold": self.similarity,
+                "size": len(self._cache),
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0,
+                "tokens_saved": self.tokens_saved
+            }
@@ -0,0 +1,4 @@
+"""
+Resilience package.
+Contains timeouts, retries and circuit breakers for calls to external services.
+"""
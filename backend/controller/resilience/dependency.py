@@ -0,0 +1,309 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+import requests
+
+# HTTP statuses worth retrying: the request may succeed unchanged a moment later
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# Environment prefix and default timeouts (seconds) of each external service
+DEPENDENCIES = {
+    "supabase": {"env_prefix": "SUPABASE", "connect_timeout": 3, "read_timeout": 10},
+    "google_drive": {"env_prefix": "GOOGLE_DRIVE", "connect_timeout": 5, "read_timeout": 20},
+    "serpapi": {"env_prefix": "SERPAPI", "connect_timeout": 5, "read_timeout": 15},
+    "telegram": {"env_prefix": "TELEGRAM", "connect_timeout": 5, "read_timeout": 10},
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+def _status_code(exc: Exception) -> Optional[int]:
+    """Find the HTTP status of a failed call across the client libraries in use."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        # googleapiclient.errors.HttpError
+        response = getattr(exc, "resp", None)
+    status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    if status is None:
+        # postgrest.APIError carries the status as its code when the body is not JSON
+        status = getattr(exc, "code", None)
+    try:
+        return int(status)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_connect_error(exc: Exception) -> bool:
+    """Whether the call failed before the request reached the server."""
+    return isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, requests.exceptions.ConnectTimeout))
+
+
+def is_transient(exc: Exception) -> bool:
+    """Whether a failure is likely to go away on its own (timeouts, dropped connections, 5xx, 429)."""
+    if isinstance(exc, (httpx.TransportError, requests.exceptions.ConnectionError,
+                        requests.exceptions.Timeout, TimeoutError, ConnectionError)):
+        return True
+    return _status_code(exc) in TRANSIENT_STATUSES
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a dependency keeps failing.
+
+    The breaker opens after failure_threshold consecutive transient failures.
+    While open, calls are rejected without touching the network. After
+    reset_timeout seconds it turns half-open and lets a single trial call
+    through: success closes the breaker, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go through now; claims the trial call when half-open."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "opened": self.opened
+            }
+
+
+class Dependency:
+    """
+    Timeouts, retries and a circuit breaker for one external service.
+
+    Settings are read from the environment using the service's prefix
+    (e.g. SUPABASE, GOOGLE_DRIVE, SERPAPI, TELEGRAM):
+
+        <PREFIX>_CONNECT_TIMEOUT    connect timeout in seconds
+        <PREFIX>_READ_TIMEOUT       read timeout in seconds
+        <PREFIX>_MAX_RETRIES        retries of a failed idempotent call (default 2)
+        <PREFIX>_BACKOFF_BASE       first retry delay in seconds, doubled per retry (default 0.2)
+        <PREFIX>_BACKOFF_MAX        maximum retry delay in seconds (default 2)
+        <PREFIX>_BREAKER_THRESHOLD  consecutive failures that open the breaker (default 5)
+        <PREFIX>_BREAKER_RESET      seconds the breaker stays open (default 30)
+    """
+
+    def __init__(self, name: str, env_prefix: str, connect_timeout: float, read_timeout: float):
+        self.name = name
+
+        def setting(key: str, default: float) -> float:
+            return float(os.getenv(f"{env_prefix}_{key}", default))
+
+        self.connect_timeout = setting("CONNECT_TIMEOUT", connect_timeout)
+        self.read_timeout = setting("READ_TIMEOUT", read_timeout)
+        self.max_retries = int(setting("MAX_RETRIES", 2))
+        self.backoff_base = setting("BACKOFF_BASE", 0.2)
+        self.backoff_max = setting("BACKOFF_MAX", 2)
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(setting("BREAKER_THRESHOLD", 5)),
+            reset_timeout=setting("BREAKER_RESET", 30)
+        )
+
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """(connect, read) timeout, in the form requests accepts."""
+        return self.connect_timeout, self.read_timeout
+
+    @property
+    def httpx_timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    def backoff(self, retry: int) -> float:
+        """Delay before a retry: exponential with full jitter, so retrying workers spread out."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retry))
+
+    def call(self, func: Callable[..., Any], *args, idempotent: bool = True, **kwargs) -> Any:
+        """
+        Call the service through the circuit breaker, retrying transient failures.
+
+        Non-idempotent calls are only retried when the connection could not be
+        established, since the request cannot have reached the server.
+
+        Args:
+            func: The function that performs the call
+            *args: Positional arguments for func
+            idempotent: Whether repeating the call is safe
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The result of func
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+        """
+        retry = 0
+        last_error: Optional[Exception] = None
+        while True:
+            self._admit(last_error)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not self._should_retry(e, retry, idempotent):
+                    raise
+                last_error = e
+                time.sleep(self.backoff(retry))
+                retry += 1
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    async def acall(self, func: Callable[..., Awaitable[Any]], *args, idempotent: bool = True, **kwargs) -> Any:
+        """
+        Async counterpart of call: awaits func and sleeps between retries without blocking the loop.
+
+        Args:
+            func: The coroutine function that performs the call
+            *args: Positional arguments for func
+            idempotent: Whether repeating the call is safe
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The result of func
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+        """
+        retry = 0
+        last_error: Optional[Exception] = None
+        while True:
+            self._admit(last_error)
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                if not self._should_retry(e, retry, idempotent):
+                    raise
+                last_error = e
+                await asyncio.sleep(self.backoff(retry))
+                retry += 1
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    def _admit(self, last_error: Optional[Exception]) -> None:
+        """Count a call attempt, or raise if the breaker rejects it."""
+        if not self.breaker.allow():
+            self.rejected += 1
+            if last_error is not None:
+                # The breaker opened while retrying; report the actual failure
+                raise last_error
+            raise CircuitOpenError(f"{self.name} is unavailable, try again later")
+        self.calls += 1
+
+    def _should_retry(self, exc: Exception, retry: int, idempotent: bool) -> bool:
+        """Record a failed attempt and decide whether to retry it."""
+        if not is_transient(exc):
+            # The service answered; the failure is about this request
+            self.breaker.record_success()
+            return False
+        self.failures += 1
+        self.breaker.record_failure()
+        if retry >= self.max_retries or not (idempotent or is_connect_error(exc)):
+            return False
+        self.retries += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Get breaker state, call counters and timeouts."""
+        stats = self.breaker.stats()
+        stats.update({
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout,
+            "max_retries": self.max_retries
+        })
+        return stats
+
+
+_dependencies: Dict[str, Dependency] = {}
+_dependencies_lock = threading.Lock()
+
+
+def get_dependency(name: str) -> Dependency:
+    """
+    Get the process-wide Dependency for a service listed in DEPENDENCIES.
+
+    Args:
+        name: Service name (supabase, google_drive, serpapi or telegram)
+
+    Returns:
+        The shared Dependency instance
+    """
+    if name not in _dependencies:
+        with _dependencies_lock:
+            if name not in _dependencies:
+                _dependencies[name] = Dependency(name, **DEPENDENCIES[name])
+    return _dependencies[name]
+
+
+def dependency_stats() -> Dict[str, Dict[str, Any]]:
+    """Get the stats of every dependency used so far by this process."""
+    return {name: dependency.stats() for name, dependency in list(_dependencies.items())}
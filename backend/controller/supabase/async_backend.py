@@ -0,0 +1,142 @@
+import asyncio
+from abc import ABC, abstractmethod
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from supabase import AsyncClient
+
+from controller.supabase.supabase_backend import Keyset, SupabaseBackend, SupabaseClientBackend
+from controller.supabase.supabase_transport import TransportOptions, create_pooled_async_client
+
+
+class AsyncSupabaseBackend(ABC):
+    """
+    Async storage engine behind AsyncSupabaseController.
+
+    Same operations as SupabaseBackend, as coroutines. Implementations:
+    AsyncSupabaseClientBackend (the hosted project) and ThreadedAsyncBackend
+    (any sync backend, e.g. InMemoryBackend, run in worker threads).
+    """
+
+    @abstractmethod
+    async def select(self, table_name: str, columns: str = "*",
+                     filters: Optional[Dict[str, Any]] = None,
+                     order_by: Optional[Dict[str, str]] = None,
+                     limit: Optional[int] = None,
+                     keyset: Optional[Keyset] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def insert(self, table_name: str, data: Any) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update(self, table_name: str, data: Dict[str, Any], filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, table_name: str, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def rpc(self, function_name: str, params: Dict[str, Any]) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def download(self, bucket: str, path: str) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def create_signed_url(self, bucket: str, path: str, expires_in: int) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class AsyncSupabaseClientBackend(AsyncSupabaseBackend):
+    """Backend that runs every operation against the Supabase project through the async supabase-py client."""
+
+    def __init__(self, supabase_url: str, supabase_key: str,
+                 transport_options: Optional[TransportOptions] = None):
+        self.supabase_url = supabase_url
+        self.supabase_key = supabase_key
+        self.transport_options = transport_options or TransportOptions()
+        self._client: Optional[AsyncClient] = None
+        self._client_pid: Optional[int] = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self) -> AsyncClient:
+        """
+        The async Supabase client, created on first use in each process.
+
+        Its connection pools are kept per event loop by the transport, so the
+        client can be shared by every loop of the process.
+        """
+        if self._client is None or self._client_pid != os.getpid():
+            with self._client_lock:
+                if self._client is None or self._client_pid != os.getpid():
+                    self._client = create_pooled_async_client(self.supabase_url, self.supabase_key,
+                                                              self.transport_options)
+                    self._client_pid = os.getpid()
+        return self._client
+
+    _check = staticmethod(SupabaseClientBackend._check)
+
+    async def select(self, table_name, columns="*", filters=None, order_by=None, limit=None, keyset=None):
+        query = SupabaseClientBackend._select_query(self.client.table(table_name), columns, filters,
+                                                    order_by, limit, keyset)
+        return self._check(await query.execute(), "query").data
+
+    async def insert(self, table_name, data):
+        return self._check(await self.client.table(table_name).insert(data).execute(), "insert").data
+
+    async def update(self, table_name, data, filters):
+        query = SupabaseClientBackend._apply_filters(self.client.table(table_name).update(data), filters)
+        return self._check(await query.execute(), "update").data
+
+    async def delete(self, table_name, filters):
+        query = SupabaseClientBackend._apply_filters(self.client.table(table_name).delete(), filters)
+        return self._check(await query.execute(), "delete").data
+
+    async def rpc(self, function_name, params):
+        return self._check(await self.client.rpc(function_name, params).execute(), "RPC").data
+
+    async def download(self, bucket, path):
+        return self._check(await self.client.storage.from_(bucket).download(path), "storage download")
+
+    async def create_signed_url(self, bucket, path, expires_in):
+        response = await self.client.storage.from_(bucket).create_signed_url(path, expires_in)
+        return self._check(response, "signed URL generation")
+
+
+class ThreadedAsyncBackend(AsyncSupabaseBackend):
+    """
+    Runs a sync backend in worker threads, so its calls overlap instead of blocking the loop.
+
+    Used with InMemoryBackend, whose simulated latency then behaves like
+    concurrent network round trips.
+    """
+
+    def __init__(self, backend: SupabaseBackend):
+        self.backend = backend
+
+    async def select(self, table_name, columns="*", filters=None, order_by=None, limit=None, keyset=None):
+        return await asyncio.to_thread(self.backend.select, table_name, columns, filters, order_by, limit, keyset)
+
+    async def insert(self, table_name, data):
+        return await asyncio.to_thread(self.backend.insert, table_name, data)
+
+    async def update(self, table_name, data, filters):
+        return await asyncio.to_thread(self.backend.update, table_name, data, filters)
+
+    async def delete(self, table_name, filters):
+        return await asyncio.to_thread(self.backend.delete, table_name, filters)
+
+    async def rpc(self, function_name, params):
+        return await asyncio.to_thread(self.backend.rpc, function_name, params)
+
+    async def download(self, bucket, path):
+        return await asyncio.to_thread(self.backend.download, bucket, path)
+
+    async def create_signed_url(self, bucket, path, expires_in):
+        return await asyncio.to_thread(self.backend.create_signed_url, bucket, path, expires_in)
@@ -0,0 +1,241 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from controller.supabase.async_backend import (
+    AsyncSupabaseBackend, AsyncSupabaseClientBackend, ThreadedAsyncBackend
+)
+from controller.supabase.supabase_backend import SupabaseClientBackend
+from controller.supabase.supabase_controller import SupabaseController, get_supabase_controller
+
+
+class AsyncSupabaseController:
+    """
+    Async counterpart of SupabaseController for code running on an event loop.
+
+    Agent tools run inside agent.ainvoke, where a blocking Supabase call stalls
+    the loop and serializes the tool calls the model requested in parallel.
+    This controller awaits its calls instead, so independent tool calls overlap
+    their I/O. It shares the query cache, metrics and circuit breaker of the
+    sync controller it wraps, so reads and writes through either one see the
+    same cache and are reported together.
+    """
+
+    def __init__(self, supabase_controller: Optional[SupabaseController] = None,
+                 backend: Optional[AsyncSupabaseBackend] = None):
+        """
+        Args:
+            supabase_controller: Sync controller whose cache, metrics and dependency are shared
+                                 (shared controller if omitted)
+            backend: Async backend that executes the operations. If omitted, it matches the
+                     sync controller's backend: the async Supabase client for the hosted
+                     project, otherwise the sync backend run in worker threads.
+        """
+        self.supabase_controller = supabase_controller or get_supabase_controller()
+        if backend is None:
+            sync_backend = self.supabase_controller.backend
+            if isinstance(sync_backend, SupabaseClientBackend):
+                backend = AsyncSupabaseClientBackend(sync_backend.supabase_url, sync_backend.supabase_key,
+                                                     sync_backend.transport_options)
+            else:
+                backend = ThreadedAsyncBackend(sync_backend)
+        self.backend = backend
+
+        self.cache = self.supabase_controller.cache
+        self.dependency = self.supabase_controller.dependency
+        self.metrics = self.supabase_controller.metrics
+
+    async def select(self, table_name: str, columns: str = "*",
+                     filters: Optional[Dict[str, Any]] = None,
+                     order_by: Optional[Dict[str, str]] = None,
+                     limit: Optional[int] = None,
+                     use_cache: bool = True) -> List[Dict[str, Any]]:
+        """
+        Select data from a table with optional filtering, ordering, and limiting.
+
+        Args:
+            table_name: Name of the table to query
+            columns: Columns to select (default "*" for all columns)
+            filters: Dictionary of column-value pairs for filtering; a list value matches any of its items
+            order_by: Dictionary with column name as key and "asc" or "desc" as value
+            limit: Maximum number of rows to return
+            use_cache: Serve from and fill the query cache if it is enabled for the table
+
+        Returns:
+            List of dictionaries representing the selected rows
+        """
+        cache_key = None
+        if use_cache and self.cache.is_cached_table(table_name):
+            cache_key = self.cache.make_key(table_name, columns, filters, order_by, limit)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        rows = await self._execute("select", table_name, self.backend.select,
+                                   table_name, columns, filters, order_by, limit, filters=filters)
+
+        if cache_key is not None:
+            self.cache.set(cache_key, rows)
+
+        return rows
+
+    async def _execute(self, operation: str, table_name: str, func, *args,
+                       filters: Optional[Dict[str, Any]] = None, payload: Any = None,
+                       idempotent: bool = True, **kwargs) -> Any:
+        """
+        Await a call through the Supabase dependency and record its latency and payload sizes.
+
+        Args:
+            operation: Kind of call, used as a metrics label
+            table_name: Table, RPC function or storage bucket, used as a metrics label
+            func: The coroutine function that performs the call
+            filters: Filters of the call, included in the slow-query log
+            payload: Data sent with the call
+            idempotent: Whether the call may be retried
+
+        Returns:
+            The result of func
+        """
+        if not self.metrics.enabled:
+            return await self.dependency.acall(func, *args, idempotent=idempotent, **kwargs)
+
+        started = time.perf_counter()
+        result = error = None
+        try:
+            result = await self.dependency.acall(func, *args, idempotent=idempotent, **kwargs)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.metrics.record(operation, table_name, time.perf_counter() - started,
+                                filters=filters, payload=payload, result=result, error=error)
+
+    async def insert(self, table_name: str, data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Insert one or more rows into a table.
+
+        Args:
+            table_name: Name of the table to insert into
+            data: Dictionary or list of dictionaries containing the data to insert
+
+        Returns:
+            List of the inserted rows
+        """
+        rows = await self._execute("insert", table_name, self.backend.insert, table_name, data,
+                                   payload=data, idempotent=False)
+
+        self.cache.invalidate(table_name, rows or (data if isinstance(data, list) else [data]))
+
+        return rows
+
+    async def update(self, table_name: str, data: Dict[str, Any], filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Update rows in a table that match the given filters.
+
+        Args:
+            table_name: Name of the table to update
+            data: Dictionary containing the columns and values to update
+            filters: Dictionary of column-value pairs for filtering which rows to update;
+                     a list value matches any of its items
+
+        Returns:
+            List of the updated rows
+        """
+        rows = await self._execute("update", table_name, self.backend.update, table_name, data, filters,
+                                   filters=filters, payload=data)
+
+        if rows:
+            self.cache.invalidate(table_name, rows, unknown_columns=data.keys())
+
+        return rows
+
+    async def delete(self, table_name: str, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Delete rows from a table that match the given filters.
+
+        Args:
+            table_name: Name of the table to delete from
+            filters: Dictionary of column-value pairs for filtering which rows to delete;
+                     a list value matches any of its items
+
+        Returns:
+            List of the deleted rows
+        """
+        rows = await self._execute("delete", table_name, self.backend.delete, table_name, filters,
+                                   filters=filters)
+
+        if rows:
+            self.cache.invalidate(table_name, rows)
+
+        return rows
+
+    async def execute_rpc(self, function_name: str, params: Optional[Dict[str, Any]] = None,
+                          invalidate_tables: Optional[List[str]] = None,
+                          idempotent: bool = False) -> Any:
+        """
+        Execute a stored procedure (RPC function) in the Supabase database.
+
+        Args:
+            function_name: Name of the function to execute
+            params: Dictionary of parameters to pass to the function
+            invalidate_tables: Tables the function writes to, whose cached queries are dropped
+            idempotent: Whether the function may be retried after a timeout or 5xx
+
+        Returns:
+            The result of the function call
+        """
+        result = await self._execute("rpc", function_name, self.backend.rpc, function_name, params or {},
+                                     payload=params, idempotent=idempotent)
+
+        for table_name in invalidate_tables or []:
+            self.cache.invalidate(table_name)
+
+        return result
+
+    async def download_file(self, bucket: str, path: str) -> bytes:
+        """
+        Download a file from Supabase Storage.
+
+        Args:
+            bucket: Storage bucket name
+            path: Path to the file within the bucket
+
+        Returns:
+            Binary data of the file
+        """
+        return await self._execute("storage.download", bucket, self.backend.download, bucket, path)
+
+    async def get_signed_url(self, bucket: str, path: str, expires_in: int = 3600) -> Dict[str, Any]:
+        """
+        Generate a signed URL for temporary access to a file in Supabase Storage.
+
+        Args:
+            bucket: Storage bucket name
+            path: Path to the file within the bucket
+            expires_in: Expiration time in seconds (default: 1 hour)
+
+        Returns:
+            Dictionary containing the signed URL information
+        """
+        return await self._execute("storage.signed_url", bucket, self.backend.create_signed_url,
+                                   bucket, path, expires_in)
+
+
+_shared_async_controller: Optional[AsyncSupabaseController] = None
+_shared_async_controller_lock = threading.Lock()
+
+
+def get_async_supabase_controller() -> AsyncSupabaseController:
+    """
+    Get the process-wide AsyncSupabaseController, built on the shared SupabaseController.
+
+    Returns:
+        The shared AsyncSupabaseController instance
+    """
+    global _shared_async_controller
+    if _shared_async_controller is None:
+        with _shared_async_controller_lock:
+            if _shared_async_controller is None:
+                _shared_async_controller = AsyncSupabaseController()
+    return _shared_async_controller
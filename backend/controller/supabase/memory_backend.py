@@ -0,0 +1,253 @@
+import copy
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from controller.supabase.supabase_backend import SupabaseBackend
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _text(value: Any) -> str:
+    """Render a value the way PostgREST compares it in an eq filter."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+# Column defaults of the tables in migrations/, applied to inserted rows that omit them
+TABLE_DEFAULTS: Dict[str, Dict[str, Callable[[], Any]]] = {
+    "ai_agents": {
+        "created_at": _now,
+        "updated_at": _now,
+        "is_active": lambda: True,
+        "chat_history": list,
+        "tool_categories": list,
+        "configuration": dict,
+        "usage_count": lambda: 0,
+        "last_used_at": lambda: None,
+        "history_summary": lambda: None,
+        "summarized_through": lambda: 0,
+    },
+    "agent_messages": {"created_at": _now, "steps": lambda: None, "token_count": lambda: None, "tokenizer": lambda: None},
+    "files": {"uploaded_at": _now},
+    "user_drive_permissions": {"created_at": _now},
+}
+
+# Tables with a bigint identity primary key; all others get UUIDs
+IDENTITY_TABLES = {"agent_messages"}
+
+# Columns whose change does not bump updated_at (see add_agent_usage_batch.sql and add_agent_history_summary.sql)
+COUNTER_COLUMNS = {"usage_count", "last_used_at", "history_summary", "summarized_through"}
+
+
+class InMemoryBackend(SupabaseBackend):
+    """
+    Process-local stand-in for the Supabase project.
+
+    Tables are lists of rows and storage objects are kept in a dict, so routes
+    and tools can be profiled without network access or a live project. Every
+    operation sleeps for the configured latency first to simulate the network
+    round trip. Settings are read from the environment:
+
+        SUPABASE_MEMORY_LATENCY_MS  simulated round trip per operation (default 0)
+        SUPABASE_MEMORY_JITTER_MS   random extra latency, uniform in [0, jitter] (default 0)
+        SUPABASE_MEMORY_SEED        JSON file of {"table": [rows]} loaded at start (optional)
+    """
+
+    def __init__(self, latency_ms: Optional[float] = None, jitter_ms: Optional[float] = None,
+                 seed_path: Optional[str] = None):
+        self.latency_ms = float(os.getenv("SUPABASE_MEMORY_LATENCY_MS", 0)) if latency_ms is None else latency_ms
+        self.jitter_ms = float(os.getenv("SUPABASE_MEMORY_JITTER_MS", 0)) if jitter_ms is None else jitter_ms
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.objects: Dict[Tuple[str, str], Tuple[bytes, Optional[str]]] = {}
+        self.functions: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "increment_agent_usage": self._increment_agent_usage,
+            "increment_agent_usage_batch": self._increment_agent_usage_batch,
+        }
+        self._identity: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+        seed_path = seed_path or os.getenv("SUPABASE_MEMORY_SEED")
+        if seed_path:
+            with open(seed_path) as seed_file:
+                for table_name, rows in json.load(seed_file).items():
+                    self.load(table_name, rows)
+
+    def _sleep(self) -> None:
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000)
+
+    def load(self, table_name: str, rows: List[Dict[str, Any]]) -> None:
+        """Seed a table, e.g. with the data volume of a benchmark."""
+        self.insert_rows(table_name, rows)
+
+    def register_rpc(self, function_name: str, func: Callable[[Dict[str, Any]], Any]) -> None:
+        """Provide the implementation of a database function called with execute_rpc."""
+        self.functions[function_name] = func
+
+    def _with_defaults(self, table_name: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        row = copy.deepcopy(row)
+        if "id" not in row:
+            if table_name in IDENTITY_TABLES:
+                self._identity[table_name] = self._identity.get(table_name, 0) + 1
+                row["id"] = self._identity[table_name]
+            else:
+                row["id"] = str(uuid4())
+        elif table_name in IDENTITY_TABLES and isinstance(row["id"], int):
+            self._identity[table_name] = max(self._identity.get(table_name, 0), row["id"])
+        for column, default in TABLE_DEFAULTS.get(table_name, {}).items():
+            row.setdefault(column, default())
+        return row
+
+    @staticmethod
+    def _matches(row: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+        for column, value in (filters or {}).items():
+            if isinstance(value, (list, tuple, set)):
+                if _text(row.get(column)) not in {_text(item) for item in value}:
+                    return False
+            elif _text(row.get(column)) != _text(value):
+                return False
+        return True
+
+    @staticmethod
+    def _project(row: Dict[str, Any], columns: str) -> Dict[str, Any]:
+        if columns.strip() == "*":
+            return copy.deepcopy(row)
+        return {column.strip(): copy.deepcopy(row.get(column.strip())) for column in columns.split(",")}
+
+    @staticmethod
+    def _after(row: Dict[str, Any], keyset) -> bool:
+        sort_column, last_value, last_id, descending = keyset
+        position = (_text(row.get(sort_column)), row.get("id"))
+        last = (_text(last_value), last_id)
+        if isinstance(position[1], int) != isinstance(last[1], int):
+            position, last = (position[0], str(position[1])), (last[0], str(last[1]))
+        return position < last if descending else position > last
+
+    def select(self, table_name, columns="*", filters=None, order_by=None, limit=None, keyset=None):
+        self._sleep()
+        with self._lock:
+            rows = [row for row in self.tables.get(table_name, []) if self._matches(row, filters)]
+            if keyset:
+                rows = [row for row in rows if self._after(row, keyset)]
+            # Stable sorts from the last key to the first give a multi-column order
+            for column, direction in reversed(list((order_by or {}).items())):
+                descending = direction.lower() != "asc"
+                present = [row for row in rows if row.get(column) is not None]
+                missing = [row for row in rows if row.get(column) is None]
+                present.sort(key=lambda row: row[column], reverse=descending)
+                # Postgres puts NULLs last in ascending and first in descending order
+                rows = missing + present if descending else present + missing
+            if limit:
+                rows = rows[:limit]
+            return [self._project(row, columns) for row in rows]
+
+    def insert(self, table_name, data):
+        self._sleep()
+        return self.insert_rows(table_name, data if isinstance(data, list) else [data])
+
+    def insert_rows(self, table_name: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert rows without simulated latency."""
+        with self._lock:
+            rows = [self._with_defaults(table_name, row) for row in rows]
+            self.tables.setdefault(table_name, []).extend(rows)
+            return copy.deepcopy(rows)
+
+    def upsert(self, table_name, rows, on_conflict="id", ignore_duplicates=False):
+        self._sleep()
+        keys = [column.strip() for column in on_conflict.split(",")]
+        with self._lock:
+            written = []
+            for row in rows:
+                existing = [
+                    current for current in self.tables.get(table_name, [])
+                    if all(column in row for column in keys)
+                    and self._matches(current, {column: row[column] for column in keys})
+                ]
+                if not existing:
+                    written.extend(self.insert_rows(table_name, [row]))
+                elif not ignore_duplicates:
+                    written.append(self._update_row(existing[0], row))
+            return written
+
+    def update(self, table_name, data, filters):
+        self._sleep()
+        with self._lock:
+            return [
+                self._update_row(row, data)
+                for row in self.tables.get(table_name, []) if self._matches(row, filters)
+            ]
+
+    @staticmethod
+    def _update_row(row: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+        row.update(copy.deepcopy(data))
+        if "updated_at" in row and not set(data) <= COUNTER_COLUMNS | {"updated_at"}:
+            row["updated_at"] = _now()
+        return copy.deepcopy(row)
+
+    def delete(self, table_name, filters):
+        self._sleep()
+        with self._lock:
+            rows = self.tables.get(table_name, [])
+            deleted = [row for row in rows if self._matches(row, filters)]
+            self.tables[table_name] = [row for row in rows if not self._matches(row, filters)]
+            return deleted
+
+    def rpc(self, function_name, params):
+        self._sleep()
+        if function_name not in self.functions:
+            raise Exception(f"Supabase RPC error: function {function_name} is not registered in the in-memory backend")
+        with self._lock:
+            return self.functions[function_name](params or {})
+
+    def _increment_agent_usage(self, params: Dict[str, Any]) -> None:
+        self._increment_agent_usage_batch({"agent_ids": [params["agent_id"]], "deltas": [1]})
+
+    def _increment_agent_usage_batch(self, params: Dict[str, Any]) -> None:
+        deltas = dict(zip(map(str, params["agent_ids"]), params["deltas"]))
+        for row in self.tables.get("ai_agents", []):
+            if str(row["id"]) in deltas:
+                row["usage_count"] = (row.get("usage_count") or 0) + deltas[str(row["id"])]
+                row["last_used_at"] = _now()
+
+    def upload(self, bucket, path, file_data, content_type=None):
+        self._sleep()
+        with self._lock:
+            if (bucket, path) in self.objects:
+                raise Exception(f"Supabase storage upload error: The resource already exists: {bucket}/{path}")
+            self.objects[(bucket, path)] = (bytes(file_data), content_type)
+            return {"path": path, "full_path": f"{bucket}/{path}"}
+
+    def download(self, bucket, path):
+        self._sleep()
+        with self._lock:
+            if (bucket, path) not in self.objects:
+                raise Exception(f"Supabase storage download error: Object not found: {bucket}/{path}")
+            return self.objects[(bucket, path)][0]
+
+    def create_signed_url(self, bucket, path, expires_in):
+        self._sleep()
+        with self._lock:
+            if (bucket, path) not in self.objects:
+                raise Exception(f"Supabase signed URL generation error: Object not found: {bucket}/{path}")
+        url = f"memory://{bucket}/{path}?token={uuid4().hex}&expires_in={expires_in}"
+        return {"signedURL": url, "signedUrl": url}
+
+    def remove(self, bucket, paths):
+        self._sleep()
+        with self._lock:
+            return [{"name": path} for path in paths if self.objects.pop((bucket, path), None) is not None]
+
+    def get_public_url(self, bucket, path):
+        return f"memory://{bucket}/{path}"
@@ -0,0 +1,152 @@
+import copy
+import json
+import os
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from controller.cache.lru_cache import LRUCache
+
+
+def _normalize(value: Any) -> str:
+    """Compare filter and row values the way PostgREST does: as text."""
+    return str(value)
+
+
+def _normalize_filter(value: Any) -> Any:
+    """Normalize a filter value; a list filter (IN) becomes a tuple of texts."""
+    if isinstance(value, (list, tuple, set)):
+        return tuple(sorted(_normalize(item) for item in value))
+    return _normalize(value)
+
+
+class QueryCache:
+    """
+    Read-through cache for SupabaseController.select results.
+
+    Entries are keyed by table, columns, filters, order and limit, expire after
+    a TTL and are evicted in LRU order. A write to a table invalidates only the
+    entries whose filters could match a written row. The cache is per process,
+    so writes made by other workers become visible when the TTL expires.
+    Settings are read from the environment:
+
+        SUPABASE_CACHE_TTL     seconds an entry is served (default 0, cache disabled)
+        SUPABASE_CACHE_SIZE    maximum number of entries (default 1024)
+        SUPABASE_CACHE_TABLES  comma-separated tables that are cached
+                               (default ai_agents,files,user_drive_permissions)
+    """
+
+    def __init__(self, ttl: Optional[float] = None, maxsize: Optional[int] = None,
+                 tables: Optional[Iterable[str]] = None):
+        self.ttl = float(os.getenv("SUPABASE_CACHE_TTL", 0)) if ttl is None else ttl
+        maxsize = int(os.getenv("SUPABASE_CACHE_SIZE", 1024)) if maxsize is None else maxsize
+        if tables is None:
+            tables = os.getenv("SUPABASE_CACHE_TABLES", "ai_agents,files,user_drive_permissions").split(",")
+        self.tables = {table.strip() for table in tables if table.strip()}
+        self._cache = LRUCache(maxsize=maxsize, ttl=self.ttl or None)
+        self._listeners: List[Callable[..., Any]] = []
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def is_cached_table(self, table_name: str) -> bool:
+        return self.enabled and table_name in self.tables
+
+    @staticmethod
+    def make_key(table_name: str, columns: str, filters: Optional[Dict[str, Any]],
+                 order_by: Optional[Dict[str, str]], limit: Optional[int]) -> Hashable:
+        return (
+            table_name,
+            columns,
+            QueryCache.normalize_filters(filters),
+            tuple((order_by or {}).items()),
+            limit
+        )
+
+    @staticmethod
+    def normalize_filters(filters: Optional[Dict[str, Any]]) -> Tuple[Tuple[str, Any], ...]:
+        """Hashable form of select filters, as matched by could_match."""
+        return tuple(sorted((column, _normalize_filter(value)) for column, value in (filters or {}).items()))
+
+    @staticmethod
+    def normalize_rows(rows: Iterable[Dict[str, Any]], unknown_columns: Iterable[str] = ()) -> List[Dict[str, str]]:
+        """Known column values of written rows, as matched by could_match."""
+        unknown_columns = set(unknown_columns)
+        return [
+            {column: _normalize(value) for column, value in row.items() if column not in unknown_columns}
+            for row in rows
+        ]
+
+    def get(self, key: Hashable) -> Optional[List[Dict[str, Any]]]:
+        """Return a copy of the cached rows, or None on a miss."""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        return copy.deepcopy(entry[0])
+
+    def set(self, key: Hashable, rows: List[Dict[str, Any]]) -> None:
+        """Store a copy of the rows along with their approximate size in bytes."""
+        size = len(json.dumps(rows, default=str))
+        self._cache.set(key, (copy.deepcopy(rows), size))
+
+    def invalidate(self, table_name: str, rows: Iterable[Dict[str, Any]] = (),
+                   unknown_columns: Iterable[str] = ()) -> int:
+        """
+        Drop the entries of a table whose filters could match any of the given rows.
+
+        Args:
+            table_name: The table that was written
+            rows: Known column values of each written row. With no rows, every
+                  entry of the table is dropped.
+            unknown_columns: Columns whose previous value is unknown (e.g. the
+                             columns set by an update); they match any filter
+
+        Returns:
+            Number of entries dropped
+        """
+        rows = list(rows)
+        for listener in self._listeners:
+            listener(table_name, rows, unknown_columns)
+
+        rows = self.normalize_rows(rows, unknown_columns)
+        dropped = 0
+        for key, _ in self._cache.items():
+            if key[0] != table_name:
+                continue
+            filters = key[2]
+            if not rows or any(self.could_match(filters, row) for row in rows):
+                self._cache.pop(key)
+                dropped += 1
+        self.invalidations += dropped
+        return dropped
+
+    def on_invalidate(self, listener: Callable[[str, List[Dict[str, Any]], Iterable[str]], Any]) -> None:
+        """
+        Register a callback run with the arguments of every invalidation.
+
+        Caches derived from query results, such as the ETags of HTTP responses,
+        use it to follow the same writes.
+        """
+        self._listeners.append(listener)
+
+    @staticmethod
+    def could_match(filters: Tuple[Tuple[str, Any], ...], row: Dict[str, str]) -> bool:
+        """Whether a written row could be among the rows selected by normalized filters."""
+        for column, value in filters:
+            if column not in row:
+                continue
+            if row[column] not in value if isinstance(value, tuple) else row[column] != value:
+                return False
+        return True
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit ratio, entry count and approximate memory use of the cached rows."""
+        stats = self._cache.stats()
+        stats["enabled"] = self.enabled
+        stats["tables"] = sorted(self.tables)
+        stats["invalidations"] = self.invalidations
+        stats["bytes"] = sum(size for _, (_, size) in self._cache.items())
+        return stats
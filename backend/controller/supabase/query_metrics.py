@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger("supabase_controller")
+
+# Upper bounds (milliseconds) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def payload_size(value: Any) -> int:
+    """Approximate size in bytes of a request or response payload."""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    # postgrest APIResponse
+    value = getattr(value, "data", value)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class _OperationStats:
+    """Latency histogram and payload totals of one (operation, table) pair."""
+
+    __slots__ = ("buckets", "count", "errors", "total_ms", "max_ms", "request_bytes", "response_bytes")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def add(self, duration_ms: float, request_bytes: int, response_bytes: int, failed: bool) -> None:
+        index = 0
+        while index < len(LATENCY_BUCKETS_MS) and duration_ms > LATENCY_BUCKETS_MS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.errors += failed
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of calls (max for the last bucket)."""
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": self.total_ms / self.count if self.count else 0.0,
+            "max_ms": self.max_ms,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "buckets_ms": {
+                str(bound): count for bound, count in zip(LATENCY_BUCKETS_MS + ("inf",), self.buckets)
+            }
+        }
+
+
+class QueryMetrics:
+    """
+    Per-operation latency histograms and payload sizes of SupabaseController calls.
+
+    Calls are grouped by operation (select, update, rpc, storage.download, ...)
+    and table, RPC function or bucket. Calls slower than the threshold are
+    logged as one JSON line with their filters. When disabled, the controller
+    skips timing and size accounting entirely. Settings are read from the
+    environment:
+
+        SUPABASE_METRICS        record latency and payload sizes (default true)
+        SUPABASE_SLOW_QUERY_MS  log calls slower than this many milliseconds (default 500, 0 disables)
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, slow_query_ms: Optional[float] = None):
+        if enabled is None:
+            enabled = os.getenv("SUPABASE_METRICS", "true").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self.slow_query_ms = float(os.getenv("SUPABASE_SLOW_QUERY_MS", 500)) if slow_query_ms is None else slow_query_ms
+        self._operations: Dict[Tuple[str, str], _OperationStats] = {}
+        self._lock = threading.Lock()
+        self.slow_queries = 0
+
+    def record(self, operation: str, table_name: str, duration: float,
+               filters: Optional[Dict[str, Any]] = None, payload: Any = None,
+               result: Any = None, error: Optional[Exception] = None) -> None:
+        """
+        Record one call.
+
+        Args:
+            operation: Kind of call (select, insert, rpc, storage.upload, ...)
+            table_name: Table, RPC function or storage bucket the call targeted
+            duration: Wall time of the call in seconds, retries included
+            filters: Filters of the call, logged with slow calls
+            payload: Data sent with the call
+            result: Data returned by the call
+            error: Exception raised by the call, if any
+        """
+        duration_ms = duration * 1000
+        request_bytes = payload_size(payload)
+        response_bytes = payload_size(result)
+
+        key = (operation, table_name)
+        with self._lock:
+            stats = self._operations.get(key)
+            if stats is None:
+                stats = self._operations[key] = _OperationStats()
+            stats.add(duration_ms, request_bytes, response_bytes, error is not None)
+
+        if self.slow_query_ms and duration_ms >= self.slow_query_ms:
+            self.slow_queries += 1
+            rows = getattr(result, "data", result)
+            logger.warning(json.dumps({
+                "event": "slow_query",
+                "operation": operation,
+                "table": table_name,
+                "duration_ms": round(duration_ms, 1),
+                "filters": filters,
+                "rows": len(rows) if isinstance(rows, list) else None,
+                "request_bytes": request_bytes,
+                "response_bytes": response_bytes,
+                "error": str(error) if error is not None else None
+            }, default=str))
+
+    def reset(self) -> None:
+        """Drop all recorded calls, e.g. between benchmark runs."""
+        with self._lock:
+            self._operations.clear()
+            self.slow_queries = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the histogram and payload totals of every (operation, table) pair."""
+        with self._lock:
+            operations = {
+                f"{operation} {table_name}": stats.to_dict()
+                for (operation, table_name), stats in sorted(self._operations.items())
+            }
+        return {
+            "enabled": self.enabled,
+            "slow_query_ms": self.slow_query_ms,
+            "slow_queries": self.slow_queries,
+            "operations": operations
+        }
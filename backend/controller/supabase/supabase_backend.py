@@ -0,0 +1,180 @@
+from abc import ABC, abstractmethod
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from supabase import Client
+
+from controller.supabase.supabase_transport import TransportOptions, create_pooled_client
+
+# Keyset position for paginated selects: (sort column, last sort value, last id, descending)
+Keyset = Tuple[str, Any, Any, bool]
+
+
+class SupabaseBackend(ABC):
+    """
+    Storage engine behind SupabaseController.
+
+    The controller owns caching, metrics, retries and the public API; a backend
+    only executes single operations and returns plain data. Implementations:
+    SupabaseClientBackend (the hosted project) and InMemoryBackend (local runs,
+    benchmarks and offline tests).
+    """
+
+    @abstractmethod
+    def select(self, table_name: str, columns: str = "*",
+               filters: Optional[Dict[str, Any]] = None,
+               order_by: Optional[Dict[str, str]] = None,
+               limit: Optional[int] = None,
+               keyset: Optional[Keyset] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert(self, table_name: str, data: Any) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def upsert(self, table_name: str, rows: List[Dict[str, Any]], on_conflict: str = "id",
+               ignore_duplicates: bool = False) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, table_name: str, data: Dict[str, Any], filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, table_name: str, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def rpc(self, function_name: str, params: Dict[str, Any]) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def upload(self, bucket: str, path: str, file_data: bytes, content_type: Optional[str] = None) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def download(self, bucket: str, path: str) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    def create_signed_url(self, bucket: str, path: str, expires_in: int) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove(self, bucket: str, paths: List[str]) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_public_url(self, bucket: str, path: str) -> str:
+        raise NotImplementedError
+
+
+class SupabaseClientBackend(SupabaseBackend):
+    """Backend that runs every operation against the Supabase project through supabase-py."""
+
+    def __init__(self, supabase_url: str, supabase_key: str,
+                 transport_options: Optional[TransportOptions] = None):
+        self.supabase_url = supabase_url
+        self.supabase_key = supabase_key
+        self.transport_options = transport_options or TransportOptions()
+        self._client: Optional[Client] = None
+        self._client_pid: Optional[int] = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self) -> Client:
+        """
+        The Supabase client, created on first use in each process.
+
+        Workers forked after preload_app get their own client and connection
+        pool instead of sharing the parent's sockets.
+        """
+        if self._client is None or self._client_pid != os.getpid():
+            with self._client_lock:
+                if self._client is None or self._client_pid != os.getpid():
+                    self._client = create_pooled_client(self.supabase_url, self.supabase_key, self.transport_options)
+                    self._client_pid = os.getpid()
+        return self._client
+
+    @staticmethod
+    def _check(response: Any, action: str) -> Any:
+        if hasattr(response, 'error') and response.error:
+            raise Exception(f"Supabase {action} error: {response.error.message}")
+        return response
+
+    @staticmethod
+    def _quote(value: Any) -> str:
+        """Quote a value for a PostgREST logic filter (timestamps contain reserved characters)."""
+        text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{text}"'
+
+    @staticmethod
+    def _apply_filters(query, filters: Optional[Dict[str, Any]]):
+        for column, value in (filters or {}).items():
+            if isinstance(value, (list, tuple, set)):
+                query = query.in_(column, list(value))
+            else:
+                query = query.eq(column, value)
+        return query
+
+    @classmethod
+    def _select_query(cls, table, columns="*", filters=None, order_by=None, limit=None, keyset=None):
+        """Build a select on a sync or async table request builder."""
+        query = cls._apply_filters(table.select(columns), filters)
+
+        if keyset:
+            sort_column, last_value, last_id, descending = keyset
+            op = "lt" if descending else "gt"
+            query = query.or_(
+                f'{sort_column}.{op}.{cls._quote(last_value)},'
+                f'and({sort_column}.eq.{cls._quote(last_value)},id.{op}.{cls._quote(last_id)})'
+            )
+
+        for column, direction in (order_by or {}).items():
+            query = query.order(column, desc=direction.lower() != "asc")
+
+        if limit:
+            query = query.limit(limit)
+
+        return query
+
+    def select(self, table_name, columns="*", filters=None, order_by=None, limit=None, keyset=None):
+        query = self._select_query(self.client.table(table_name), columns, filters, order_by, limit, keyset)
+        return self._check(query.execute(), "query").data
+
+    def insert(self, table_name, data):
+        return self._check(self.client.table(table_name).insert(data).execute(), "insert").data
+
+    def upsert(self, table_name, rows, on_conflict="id", ignore_duplicates=False):
+        query = self.client.table(table_name).upsert(rows, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates)
+        return self._check(query.execute(), "upsert").data
+
+    def update(self, table_name, data, filters):
+        query = self._apply_filters(self.client.table(table_name).update(data), filters)
+        return self._check(query.execute(), "update").data
+
+    def delete(self, table_name, filters):
+        query = self._apply_filters(self.client.table(table_name).delete(), filters)
+        return self._check(query.execute(), "delete").data
+
+    def rpc(self, function_name, params):
+        return self._check(self.client.rpc(function_name, params).execute(), "RPC").data
+
+    def upload(self, bucket, path, file_data, content_type=None):
+        options = {"content-type": content_type} if content_type else {}
+        return self._check(self.client.storage.from_(bucket).upload(path, file_data, options), "storage upload")
+
+    def download(self, bucket, path):
+        return self._check(self.client.storage.from_(bucket).download(path), "storage download")
+
+    def create_signed_url(self, bucket, path, expires_in):
+        response = self.client.storage.from_(bucket).create_signed_url(path, expires_in)
+        return self._check(response, "signed URL generation")
+
+    def remove(self, bucket, paths):
+        return self._check(self.client.storage.from_(bucket).remove(paths), "storage delete")
+
+    def get_public_url(self, bucket, path):
+        return self.client.storage.from_(bucket).get_public_url(path)
@@ -1,84 +1,343 @@
+import atexit
+import base64
+import json
 import os
-from supabase import create_client, Client
+import re
+import threading
+import time
+from supabase import Client
 from dotenv import load_dotenv
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, Iterator, List, Any, Optional, Tuple, Union
+
+from controller.supabase.supabase_transport import TransportOptions
+from controller.supabase.supabase_backend import SupabaseBackend, SupabaseClientBackend
+from controller.supabase.memory_backend import InMemoryBackend
+from controller.supabase.query_cache import QueryCache
+from controller.supabase.query_metrics import QueryMetrics
+from controller.supabase.write_buffer import WriteBuffer
+from controller.resilience.dependency import get_dependency
 
 # Load environment variables
 load_dotenv()
 
+# Page sizes for keyset pagination of list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
 class SupabaseController:
-    def __init__(self):
-        self.supabase_url = os.getenv("SUPABASE_URL")
-        self.supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
-        
-        if not self.supabase_url or not self.supabase_key:
-            raise ValueError("Supabase URL and key must be provided in environment variables")
-        
-        self.client: Client = create_client(self.supabase_url, self.supabase_key)
+    def __init__(self, backend: Optional[SupabaseBackend] = None):
+        """
+        Args:
+            backend: Backend that executes the operations. If omitted, SUPABASE_BACKEND
+                     selects it: "supabase" (default) for the project at SUPABASE_URL,
+                     or "memory" for a process-local InMemoryBackend.
+        """
+        if backend is None:
+            if os.getenv("SUPABASE_BACKEND", "supabase").lower() == "memory":
+                backend = InMemoryBackend()
+            else:
+                supabase_url = os.getenv("SUPABASE_URL")
+                supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
+                
+                if not supabase_url or not supabase_key:
+                    raise ValueError("Supabase URL and key must be provided in environment variables")
+                
+                backend = SupabaseClientBackend(supabase_url, supabase_key, TransportOptions())
+        self.backend = backend
+        
+        # Read-through cache for select, disabled unless SUPABASE_CACHE_TTL is set
+        self.cache = QueryCache()
+        
+        # Timeouts, retries of idempotent calls and circuit breaker shared by all Supabase calls
+        self.dependency = get_dependency("supabase")
+        
+        # Latency histograms, payload sizes and slow-query log of all calls
+        self.metrics = QueryMetrics()
+        
+        # Coalesces buffered inserts and upserts, write-through unless SUPABASE_WRITE_DURABILITY is set
+        self.write_buffer = WriteBuffer(self)
+    
+    @property
+    def client(self) -> Client:
+        """The supabase-py client of the backend (only available with the Supabase backend)."""
+        return self.backend.client
     
     def select(self, table_name: str, columns: str = "*", 
                filters: Optional[Dict[str, Any]] = None, 
                order_by: Optional[Dict[str, str]] = None,
-               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+               limit: Optional[int] = None,
+               use_cache: bool = True) -> List[Dict[str, Any]]:
         """
         Select data from a table with optional filtering, ordering, and limiting.
         
         Args:
             table_name: Name of the table to query
             columns: Columns to select (default "*" for all columns)
-            filters: Dictionary of column-value pairs for filtering
+            filters: Dictionary of column-value pairs for filtering; a list value matches any of its items
             order_by: Dictionary with column name as key and "asc" or "desc" as value
             limit: Maximum number of rows to return
+            use_cache: Serve from and fill the query cache if it is enabled for the table
+                       (set False to always read from the database)
             
         Returns:
             List of dictionaries representing the selected rows
         """
-        query = self.client.table(table_name).select(columns)
+        cache_key = None
+        if use_cache and self.cache.is_cached_table(table_name):
+            cache_key = self.cache.make_key(table_name, columns, filters, order_by, limit)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        rows = self._execute("select", table_name, self.backend.select,
+                             table_name, columns, filters, order_by, limit, filters=filters)
+        
+        if cache_key is not None:
+            self.cache.set(cache_key, rows)
+        
+        return rows
+    
+    def select_page(self, table_name: str, columns: str = "*",
+                    filters: Optional[Dict[str, Any]] = None,
+                    sort_column: str = "created_at",
+                    descending: bool = True,
+                    page_size: int = DEFAULT_PAGE_SIZE,
+                    cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Select one page of rows using keyset pagination on (sort_column, id).
         
-        # Apply filters if provided
-        if filters:
-            for column, value in filters.items():
-                query = query.eq(column, value)
+        Each page continues strictly after the last row of the previous one, so
+        the cost of a page does not grow with its position and rows inserted
+        meanwhile do not shift later pages. Pages are not served from the query cache.
         
-        # Apply ordering if provided
-        if order_by:
-            for column, direction in order_by.items():
-                if direction.lower() == "asc":
-                    query = query.order(column)
-                else:
-                    query = query.order(column, desc=True)
+        Args:
+            table_name: Name of the table to query
+            columns: Columns to select; sort_column and id are added if missing
+            filters: Dictionary of column-value pairs for filtering
+            sort_column: Column to order by, with id as the tie-breaker
+            descending: Order newest first (default) or oldest first
+            page_size: Maximum number of rows in the page (capped at MAX_PAGE_SIZE)
+            cursor: Opaque cursor returned with the previous page (None for the first page)
+            
+        Returns:
+            Tuple of the page rows and the cursor of the next page (None on the last page)
+            
+        Raises:
+            ValueError: If the cursor is malformed or page_size is not positive
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be positive")
+        page_size = min(page_size, MAX_PAGE_SIZE)
+        
+        if columns.strip() != "*":
+            selected = [column.strip() for column in columns.split(",")]
+            columns = ", ".join(selected + [key for key in (sort_column, "id") if key not in selected])
+        
+        keyset = None
+        if cursor:
+            last_value, last_id = self.decode_cursor(cursor)
+            keyset = (sort_column, last_value, last_id, descending)
+        
+        # Fetch one extra row to learn whether another page follows
+        direction = "desc" if descending else "asc"
+        rows = self._execute("select_page", table_name, self.backend.select,
+                             table_name, columns, filters, {sort_column: direction, "id": direction},
+                             page_size + 1, keyset, filters=filters)
+        
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = self.encode_cursor(rows[-1][sort_column], rows[-1]["id"])
+        
+        return rows, next_cursor
+    
+    def iter_select(self, table_name: str, columns: str = "*",
+                    filters: Optional[Dict[str, Any]] = None,
+                    sort_column: str = "created_at",
+                    descending: bool = True,
+                    page_size: int = MAX_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over all matching rows, fetching them lazily one page at a time.
         
-        # Apply limit if provided
-        if limit:
-            query = query.limit(limit)
+        Only one page is held in memory, which keeps batch jobs flat regardless
+        of table size.
         
-        # Execute the query
-        response = query.execute()
+        Args:
+            table_name: Name of the table to query
+            columns: Columns to select; sort_column and id are added if missing
+            filters: Dictionary of column-value pairs for filtering
+            sort_column: Column to order by, with id as the tie-breaker
+            descending: Order newest first (default) or oldest first
+            page_size: Number of rows fetched per request
+            
+        Yields:
+            Dictionaries representing the selected rows
+        """
+        cursor = None
+        while True:
+            rows, cursor = self.select_page(table_name, columns, filters, sort_column,
+                                            descending, page_size, cursor)
+            yield from rows
+            if cursor is None:
+                return
+    
+    @staticmethod
+    def encode_cursor(sort_value: Any, row_id: Any) -> str:
+        """Encode the keyset position of a row as an opaque URL-safe cursor."""
+        payload = json.dumps([sort_value, row_id], separators=(",", ":"), default=str)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+        """
+        Decode a cursor created by encode_cursor.
         
-        # Check for errors
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Supabase query error: {response.error.message}")
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except Exception:
+            raise ValueError("Invalid cursor")
+        if sort_value is None or row_id is None:
+            raise ValueError("Invalid cursor")
+        return sort_value, row_id
+    
+    def _execute(self, operation: str, table_name: str, func, *args,
+                 filters: Optional[Dict[str, Any]] = None, payload: Any = None,
+                 idempotent: bool = True, **kwargs) -> Any:
+        """
+        Run a call through the Supabase dependency and record its latency and payload sizes.
         
-        return response.data
+        Args:
+            operation: Kind of call, used as a metrics label
+            table_name: Table, RPC function or storage bucket, used as a metrics label
+            func: The function that performs the call
+            filters: Filters of the call, included in the slow-query log
+            payload: Data sent with the call
+            idempotent: Whether the call may be retried
+            
+        Returns:
+            The result of func
+        """
+        if not self.metrics.enabled:
+            return self.dependency.call(func, *args, idempotent=idempotent, **kwargs)
+        
+        started = time.perf_counter()
+        result = error = None
+        try:
+            result = self.dependency.call(func, *args, idempotent=idempotent, **kwargs)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.metrics.record(operation, table_name, time.perf_counter() - started,
+                                filters=filters, payload=payload, result=result, error=error)
     
-    def insert(self, table_name: str, data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> Dict[str, Any]:
+    def insert(self, table_name: str, data: Union[Dict[str, Any], List[Dict[str, Any]]],
+               buffered: bool = False) -> Dict[str, Any]:
         """
         Insert one or more rows into a table.
         
         Args:
             table_name: Name of the table to insert into
             data: Dictionary or list of dictionaries containing the data to insert
+            buffered: Let the write buffer coalesce this insert with others to the same table
+                      (only takes effect when SUPABASE_WRITE_DURABILITY is group or async)
+            
+        Returns:
+            Dictionary containing the inserted data (empty for buffered inserts in async mode)
+        """
+        if buffered and self.write_buffer.enabled:
+            return self.write_buffer.submit("insert", table_name, data if isinstance(data, list) else [data])
+        
+        rows = self._execute("insert", table_name, self.backend.insert, table_name, data,
+                             payload=data, idempotent=False)
+        
+        self.cache.invalidate(table_name, rows or (data if isinstance(data, list) else [data]))
+        
+        return rows
+    
+    def upsert(self, table_name: str, rows: List[Dict[str, Any]], on_conflict: str = "id",
+               ignore_duplicates: bool = False, buffered: bool = False) -> List[Dict[str, Any]]:
+        """
+        Insert rows, updating the existing rows they conflict with, in one request.
+        
+        Args:
+            table_name: Name of the table to write to
+            rows: Rows to write; all rows should have the same columns
+            on_conflict: Comma-separated columns of the unique constraint that identifies a row
+            ignore_duplicates: Leave conflicting rows unchanged instead of updating them
+            buffered: Let the write buffer coalesce this upsert with others to the same table
             
         Returns:
-            Dictionary containing the inserted data
+            List of the written rows (empty for buffered upserts in async mode)
         """
-        response = self.client.table(table_name).insert(data).execute()
+        if not rows:
+            return []
+        if buffered and self.write_buffer.enabled and not ignore_duplicates:
+            return self.write_buffer.submit("upsert", table_name, rows, on_conflict=on_conflict)
+        
+        # Repeating an upsert leaves the table in the same state
+        written = self._execute("upsert", table_name, self.backend.upsert, table_name, rows,
+                                on_conflict, ignore_duplicates, payload=rows)
         
-        # Check for errors
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Supabase insert error: {response.error.message}")
+        columns = {column for row in rows for column in row}
+        self.cache.invalidate(table_name, written or rows, unknown_columns=columns)
         
-        return response.data
+        return written
+    
+    def bulk_update(self, table_name: str, rows: List[Dict[str, Any]], key: str = "id") -> List[Dict[str, Any]]:
+        """
+        Update many rows, each identified by its key column, with as few requests as possible.
+        
+        Rows that set the same values are updated together by one request
+        filtered on their keys, so e.g. marking 100 rows inactive is a single
+        round trip. Rows with distinct values need one request per distinct value set.
+        
+        Args:
+            table_name: Name of the table to update
+            rows: Dictionaries with the key column and the columns to update
+            key: Column identifying each row
+            
+        Returns:
+            List of the updated rows
+            
+        Raises:
+            ValueError: If a row lacks the key column
+        """
+        groups: Dict[str, Tuple[Dict[str, Any], List[Any]]] = {}
+        for row in rows:
+            if key not in row:
+                raise ValueError(f"Every row needs a value for {key}")
+            data = {column: value for column, value in row.items() if column != key}
+            if not data:
+                continue
+            group_key = json.dumps(data, sort_keys=True, default=str)
+            groups.setdefault(group_key, (data, []))[1].append(row[key])
+        
+        updated = []
+        for data, keys in groups.values():
+            updated.extend(self.update(table_name, data, {key: keys}) or [])
+        return updated
+    
+    def bulk_delete(self, table_name: str, keys: List[Any], key: str = "id") -> List[Dict[str, Any]]:
+        """
+        Delete many rows, identified by their key column, in one request.
+        
+        Args:
+            table_name: Name of the table to delete from
+            keys: Values of the key column of the rows to delete
+            key: Column identifying each row
+            
+        Returns:
+            List of the deleted rows
+        """
+        if not keys:
+            return []
+        return self.delete(table_name, {key: list(keys)})
     
     def update(self, table_name: str, data: Dict[str, Any], filters: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -87,24 +346,20 @@ class SupabaseController:
         Args:
             table_name: Name of the table to update
             data: Dictionary containing the columns and values to update
-            filters: Dictionary of column-value pairs for filtering which rows to update
+            filters: Dictionary of column-value pairs for filtering which rows to update;
+                     a list value matches any of its items
             
         Returns:
             Dictionary containing the updated data
         """
-        query = self.client.table(table_name).update(data)
+        rows = self._execute("update", table_name, self.backend.update, table_name, data, filters,
+                             filters=filters, payload=data)
         
-        # Apply filters
-        for column, value in filters.items():
-            query = query.eq(column, value)
+        # Previous values of the updated columns are unknown, so they match any cached filter
+        if rows:
+            self.cache.invalidate(table_name, rows, unknown_columns=data.keys())
         
-        response = query.execute()
-        
-        # Check for errors
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Supabase update error: {response.error.message}")
-        
-        return response.data
+        return rows
     
     def delete(self, table_name: str, filters: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -112,43 +367,93 @@ class SupabaseController:
         
         Args:
             table_name: Name of the table to delete from
-            filters: Dictionary of column-value pairs for filtering which rows to delete
+            filters: Dictionary of column-value pairs for filtering which rows to delete;
+                     a list value matches any of its items
             
         Returns:
             Dictionary containing the deleted data
         """
-        query = self.client.table(table_name).delete()
-        
-        # Apply filters
-        for column, value in filters.items():
-            query = query.eq(column, value)
+        rows = self._execute("delete", table_name, self.backend.delete, table_name, filters, filters=filters)
         
-        response = query.execute()
+        if rows:
+            self.cache.invalidate(table_name, rows)
         
-        # Check for errors
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Supabase delete error: {response.error.message}")
-        
-        return response.data
+        return rows
     
-    def execute_rpc(self, function_name: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def execute_rpc(self, function_name: str, params: Optional[Dict[str, Any]] = None,
+                    invalidate_tables: Optional[List[str]] = None,
+                    idempotent: bool = False) -> Dict[str, Any]:
         """
         Execute a stored procedure (RPC function) in the Supabase database.
         
         Args:
             function_name: Name of the function to execute
             params: Dictionary of parameters to pass to the function
+            invalidate_tables: Tables the function writes to, whose cached queries are dropped
+            idempotent: Whether the function may be retried after a timeout or 5xx
             
         Returns:
             Dictionary containing the result of the function call
         """
-        response = self.client.rpc(function_name, params or {}).execute()
+        result = self._execute("rpc", function_name, self.backend.rpc, function_name, params or {},
+                               payload=params, idempotent=idempotent)
+        
+        for table_name in invalidate_tables or []:
+            self.cache.invalidate(table_name)
+        
+        return result
+    
+    @staticmethod
+    def projection(fields: Optional[str], default: str = "*") -> str:
+        """
+        Build a select column list from a comma-separated fields parameter.
+        
+        Args:
+            fields: Comma-separated column names (e.g. from a ?fields= query parameter)
+            default: Column list to use when fields is empty
+            
+        Returns:
+            Column list for select
+            
+        Raises:
+            ValueError: If a field is not a plain column name
+        """
+        if not fields:
+            return default
         
-        # Check for errors
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Supabase RPC error: {response.error.message}")
+        columns = [field.strip() for field in fields.split(",") if field.strip()]
+        for column in columns:
+            if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", column):
+                raise ValueError(f"Invalid field: {column}")
         
-        return response.data
+        return ", ".join(columns) if columns else default
+    
+    def get_query_stats(self) -> Dict[str, Any]:
+        """
+        Get latency histograms and payload sizes per operation and table.
+        
+        Returns:
+            Dictionary of query statistics
+        """
+        return self.metrics.stats()
+    
+    def get_write_stats(self) -> Dict[str, Any]:
+        """
+        Get buffered rows and coalescing counters of the write buffer.
+        
+        Returns:
+            Dictionary of write buffer statistics
+        """
+        return self.write_buffer.stats()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get hit ratio, size and approximate memory use of the query cache.
+        
+        Returns:
+            Dictionary of cache statistics
+        """
+        return self.cache.stats()
     
     def raw_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
@@ -163,13 +468,8 @@ class SupabaseController:
             Dictionary containing the query results
         """
         # This requires the service role key
-        response = self.client.rpc('exec_sql', {'query': query, 'params': params or {}}).execute()
-        
-        # Check for errors
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Supabase raw query error: {response.error.message}")
-        
-        return response.data
+        return self._execute("rpc", "exec_sql", self.backend.rpc, 'exec_sql', {'query': query, 'params': params or {}},
+                             payload=params, idempotent=False)
     
     def get_table_schema(self, table_name: str) -> Dict[str, Any]:
         """
@@ -218,7 +518,7 @@ class SupabaseController:
         Returns:
             Public URL for the file
         """
-        return self.client.storage.from_(bucket).get_public_url(path)
+        return self.backend.get_public_url(bucket, path)
     
     def upload_file(self, bucket: str, path: str, file_data: bytes, content_type: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -233,17 +533,8 @@ class SupabaseController:
         Returns:
             Dictionary containing the upload result
         """
-        options = {}
-        if content_type:
-            options['content_type'] = content_type
-            
-        response = self.client.storage.from_(bucket).upload(path, file_data, options)
-        
-        # Check for errors
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Supabase storage upload error: {response.error.message}")
-        
-        return response
+        return self._execute("storage.upload", bucket, self.backend.upload, bucket, path, file_data, content_type,
+                             payload=file_data, idempotent=False)
     
     def download_file(self, bucket: str, path: str) -> bytes:
         """
@@ -256,13 +547,7 @@ class SupabaseController:
         Returns:
             Binary data of the file
         """
-        response = self.client.storage.from_(bucket).download(path)
-        
-        # Check for errors
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Supabase storage download error: {response.error.message}")
-        
-        return response
+        return self._execute("storage.download", bucket, self.backend.download, bucket, path)
     
     def get_signed_url(self, bucket: str, path: str, expires_in: int = 3600) -> Dict[str, Any]:
         """
@@ -276,13 +561,7 @@ class SupabaseController:
         Returns:
             Dictionary containing the signed URL information
         """
-        response = self.client.storage.from_(bucket).create_signed_url(path, expires_in)
-        
-        # Check for errors
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Supabase signed URL generation error: {response.error.message}")
-        
-        return response
+        return self._execute("storage.signed_url", bucket, self.backend.create_signed_url, bucket, path, expires_in)
     
     def delete_file(self, bucket: str, path: str) -> Dict[str, Any]:
         """
@@ -295,10 +574,23 @@ class SupabaseController:
         Returns:
             Dictionary containing the deletion result
         """
-        response = self.client.storage.from_(bucket).remove([path])
-        
-        # Check for errors
-        if hasattr(response, 'error') and response.error:
-            raise Exception(f"Supabase storage delete error: {response.error.message}")
-        
-        return response
\ No newline at end of file
+        return self._execute("storage.remove", bucket, self.backend.remove, bucket, [path])
+
+
+_shared_controller: Optional[SupabaseController] = None
+_shared_controller_lock = threading.Lock()
+
+def get_supabase_controller() -> SupabaseController:
+    """
+    Get the process-wide SupabaseController shared by all blueprints, controllers and tools.
+    
+    Returns:
+        The shared SupabaseController instance
+    """
+    global _shared_controller
+    if _shared_controller is None:
+        with _shared_controller_lock:
+            if _shared_controller is None:
+                _shared_controller = SupabaseController()
+                atexit.register(_shared_controller.write_buffer.stop)
+    return _shared_controller
@@ -0,0 +1,177 @@
+import os
+from typing import Dict, Optional, Union
+
+import httpx
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from postgrest.utils import AsyncClient as AsyncSession, SyncClient
+from storage3 import AsyncStorageClient, SyncStorageClient
+from supabase import create_client, AsyncClient, AsyncClientOptions, Client, ClientOptions
+
+from controller.event_loop.per_loop_transport import PerLoopAsyncTransport
+from controller.resilience.dependency import get_dependency
+
+
+class TransportOptions:
+    """
+    HTTP settings shared by the PostgREST and Storage clients, read from the environment:
+
+        SUPABASE_POOL_MAX_CONNECTIONS    connections per client (default 20)
+        SUPABASE_POOL_MAX_KEEPALIVE      idle connections kept open (default 10)
+        SUPABASE_POOL_KEEPALIVE_EXPIRY   seconds before an idle connection is closed (default 30)
+        SUPABASE_HTTP2                   use HTTP/2 (default true)
+
+    Timeouts come from the supabase Dependency (SUPABASE_CONNECT_TIMEOUT and
+    SUPABASE_READ_TIMEOUT), which also retries and circuit-breaks the calls.
+    """
+
+    def __init__(self):
+        self.max_connections = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", 20))
+        self.max_keepalive_connections = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", 10))
+        self.keepalive_expiry = float(os.getenv("SUPABASE_POOL_KEEPALIVE_EXPIRY", 30))
+        self.http2 = os.getenv("SUPABASE_HTTP2", "true").lower() in ("1", "true", "yes")
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return get_dependency("supabase").httpx_timeout
+
+    def create_session(self, base_url: str, headers: Dict[str, str],
+                       verify: bool = True, proxy: Optional[str] = None) -> SyncClient:
+        """Create a keep-alive HTTP session with the configured pool, timeouts and protocol."""
+        return SyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=self.timeout,
+            verify=verify,
+            proxy=proxy,
+            follow_redirects=True,
+            http2=self.http2,
+            limits=self.limits
+        )
+
+    def create_async_session(self, base_url: str, headers: Dict[str, str],
+                             verify: bool = True, proxy: Optional[str] = None) -> AsyncSession:
+        """Async counterpart of create_session, with one connection pool per event loop."""
+        return AsyncSession(
+            base_url=base_url,
+            headers=headers,
+            timeout=self.timeout,
+            follow_redirects=True,
+            transport=PerLoopAsyncTransport(verify=verify, proxy=proxy, http2=self.http2, limits=self.limits)
+        )
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """PostgREST client whose session uses the configured connection pool."""
+
+    def __init__(self, base_url: str, transport_options: TransportOptions, **kwargs):
+        self.transport_options = transport_options
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url: str, headers: Dict[str, str],
+                       timeout: Union[int, float, httpx.Timeout], verify: bool = True,
+                       proxy: Optional[str] = None) -> SyncClient:
+        return self.transport_options.create_session(base_url, headers, verify, proxy)
+
+
+class PooledStorageClient(SyncStorageClient):
+    """Storage client whose session uses the configured connection pool."""
+
+    def __init__(self, url: str, headers: Dict[str, str], transport_options: TransportOptions):
+        self.transport_options = transport_options
+        super().__init__(url, headers)
+
+    def _create_session(self, base_url: str, headers: Dict[str, str], timeout: int,
+                        verify: bool = True, proxy: Optional[str] = None) -> SyncClient:
+        return self.transport_options.create_session(base_url, headers, verify, proxy)
+
+
+class PooledAsyncPostgrestClient(AsyncPostgrestClient):
+    """Async PostgREST client whose session uses the configured connection pool."""
+
+    def __init__(self, base_url: str, transport_options: TransportOptions, **kwargs):
+        self.transport_options = transport_options
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url: str, headers: Dict[str, str],
+                       timeout: Union[int, float, httpx.Timeout], verify: bool = True,
+                       proxy: Optional[str] = None) -> AsyncSession:
+        return self.transport_options.create_async_session(base_url, headers, verify, proxy)
+
+
+class PooledAsyncStorageClient(AsyncStorageClient):
+    """Async Storage client whose session uses the configured connection pool."""
+
+    def __init__(self, url: str, headers: Dict[str, str], transport_options: TransportOptions):
+        self.transport_options = transport_options
+        super().__init__(url, headers)
+
+    def _create_session(self, base_url: str, headers: Dict[str, str], timeout: int,
+                        verify: bool = True, proxy: Optional[str] = None) -> AsyncSession:
+        return self.transport_options.create_async_session(base_url, headers, verify, proxy)
+
+
+def create_pooled_client(supabase_url: str, supabase_key: str,
+                         transport_options: Optional[TransportOptions] = None) -> Client:
+    """
+    Create a Supabase client whose PostgREST and Storage clients share the tuned transport.
+
+    Args:
+        supabase_url: The Supabase project URL
+        supabase_key: The service key
+        transport_options: HTTP settings (read from the environment if omitted)
+
+    Returns:
+        The Supabase client
+    """
+    transport_options = transport_options or TransportOptions()
+    client = create_client(supabase_url, supabase_key, options=ClientOptions(
+        postgrest_client_timeout=transport_options.timeout,
+        storage_client_timeout=transport_options.timeout
+    ))
+
+    # supabase-py builds these lazily with its own sessions; install the pooled ones up front
+    client._postgrest = PooledPostgrestClient(
+        client.rest_url,
+        transport_options,
+        headers=client.options.headers,
+        schema=client.options.schema
+    )
+    client._storage = PooledStorageClient(client.storage_url, client.options.headers, transport_options)
+    return client
+
+
+def create_pooled_async_client(supabase_url: str, supabase_key: str,
+                               transport_options: Optional[TransportOptions] = None) -> AsyncClient:
+    """
+    Create an async Supabase client whose PostgREST and Storage clients share the tuned transport.
+
+    Args:
+        supabase_url: The Supabase project URL
+        supabase_key: The service key
+        transport_options: HTTP settings (read from the environment if omitted)
+
+    Returns:
+        The async Supabase client
+    """
+    transport_options = transport_options or TransportOptions()
+    client = AsyncClient(supabase_url, supabase_key, options=AsyncClientOptions(
+        postgrest_client_timeout=transport_options.timeout,
+        storage_client_timeout=transport_options.timeout
+    ))
+
+    client._postgrest = PooledAsyncPostgrestClient(
+        client.rest_url,
+        transport_options,
+        headers=client.options.headers,
+        schema=client.options.schema
+    )
+    client._storage = PooledAsyncStorageClient(client.storage_url, client.options.headers, transport_options)
+    return client
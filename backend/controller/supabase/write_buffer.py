@@ -0,0 +1,218 @@
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+# Durability modes of buffered writes
+SYNC = "sync"
+GROUP = "group"
+ASYNC = "async"
+DURABILITY_MODES = (SYNC, GROUP, ASYNC)
+
+
+class _Batch:
+    """Rows of consecutive writes to one table that go out in a single request."""
+
+    __slots__ = ("key", "rows", "writes")
+
+    def __init__(self, key: Tuple[str, str, Optional[str], FrozenSet[str]]):
+        self.key = key
+        self.rows: List[Dict[str, Any]] = []
+        # (number of rows, future) of each coalesced write, in submission order
+        self.writes: List[Tuple[int, Future]] = []
+
+
+class WriteBuffer:
+    """
+    Write-behind buffer that coalesces small inserts and upserts into one request.
+
+    Buffered writes to the same table that arrive within the window are sent
+    as one multi-row insert (or upsert) instead of one round trip each. Only
+    consecutive writes with the same columns are merged, because PostgREST
+    fills columns missing from some rows of a bulk insert with NULL instead of
+    their defaults, and writes to a table are flushed in submission order.
+    Settings are read from the environment:
+
+        SUPABASE_WRITE_DURABILITY  sync (default), group or async:
+                                   sync   - no buffering, every write is its own request
+                                   group  - the caller waits until the batch holding its
+                                            write is committed and gets its rows or error
+                                   async  - the caller returns at once; failures are only
+                                            logged and writes still buffered are lost if
+                                            the worker is killed (a clean exit flushes)
+        SUPABASE_WRITE_WINDOW_MS   how long the first write of a batch waits for others (default 20)
+        SUPABASE_WRITE_MAX_ROWS    buffered rows that trigger an immediate flush (default 500)
+    """
+
+    def __init__(self, supabase_controller, durability: Optional[str] = None,
+                 window_ms: Optional[float] = None, max_rows: Optional[int] = None):
+        """
+        Args:
+            supabase_controller: Controller whose unbuffered writes send the batches
+            durability: sync, group or async (read from SUPABASE_WRITE_DURABILITY if omitted)
+            window_ms: Coalescing window in milliseconds
+            max_rows: Buffered rows that trigger an immediate flush
+        """
+        self.supabase_controller = supabase_controller
+        durability = (durability or os.getenv("SUPABASE_WRITE_DURABILITY", SYNC)).lower()
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"SUPABASE_WRITE_DURABILITY must be one of {', '.join(DURABILITY_MODES)}")
+        self.durability = durability
+        self.window_ms = float(os.getenv("SUPABASE_WRITE_WINDOW_MS", 20)) if window_ms is None else window_ms
+        self.max_rows = int(os.getenv("SUPABASE_WRITE_MAX_ROWS", 500)) if max_rows is None else max_rows
+
+        self._batches: List[_Batch] = []
+        self._pending_rows = 0
+        self._oldest = 0.0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._stopped = False
+
+        self.writes = 0
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.durability != SYNC
+
+    def submit(self, operation: str, table_name: str, rows: List[Dict[str, Any]],
+               on_conflict: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Buffer an insert or upsert.
+
+        Args:
+            operation: "insert" or "upsert"
+            table_name: Name of the table to write to
+            rows: Rows to write
+            on_conflict: Conflict columns of an upsert
+
+        Returns:
+            The written rows in group mode, an empty list in async mode
+        """
+        if not rows:
+            return []
+        if self._stopped:
+            # Shutting down: nothing would flush the buffer anymore
+            return self._write(operation, table_name, rows, on_conflict)
+
+        self._ensure_flusher()
+        future: Future = Future()
+        columns = frozenset(rows[0])
+        if any(frozenset(row) != columns for row in rows):
+            columns = frozenset()
+        key = (table_name, operation, on_conflict, columns)
+
+        with self._condition:
+            batch = self._batches[-1] if self._batches and columns else None
+            if batch is None or batch.key != key:
+                batch = _Batch(key)
+                self._batches.append(batch)
+            if not self._pending_rows:
+                self._oldest = time.monotonic()
+            batch.rows.extend(rows)
+            batch.writes.append((len(rows), future))
+            self._pending_rows += len(rows)
+            self.writes += 1
+            self._condition.notify()
+
+        if self.durability == GROUP:
+            return future.result()
+        return []
+
+    def _write(self, operation: str, table_name: str, rows: List[Dict[str, Any]],
+               on_conflict: Optional[str]) -> List[Dict[str, Any]]:
+        if operation == "upsert":
+            return self.supabase_controller.upsert(table_name, rows, on_conflict=on_conflict or "id")
+        return self.supabase_controller.insert(table_name, rows)
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            # Writes buffered before a fork belong to the parent
+            if self._pid != os.getpid():
+                self._batches = []
+                self._pending_rows = 0
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="supabase-write-buffer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            with self._condition:
+                while not self._pending_rows and not self._stopped:
+                    self._condition.wait()
+                deadline = self._oldest + self.window_ms / 1000
+                while self._pending_rows < self.max_rows and not self._stopped:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Send all buffered writes, one request per batch.
+
+        Returns:
+            Number of rows written
+        """
+        with self._condition:
+            batches, self._batches = self._batches, []
+            self._pending_rows = 0
+
+        written = 0
+        for batch in batches:
+            table_name, operation, on_conflict, _ = batch.key
+            try:
+                result = self._write(operation, table_name, batch.rows, on_conflict)
+            except Exception as e:
+                self.failures += 1
+                for _, future in batch.writes:
+                    future.set_exception(e)
+                if self.durability == ASYNC:
+                    print(f"Error flushing {len(batch.rows)} buffered {operation} rows into {table_name}: {str(e)}")
+                    print(traceback.format_exc())
+                continue
+
+            self.flushes += 1
+            self.rows_flushed += len(batch.rows)
+            written += len(batch.rows)
+            # PostgREST returns the rows in input order; hand each caller its share
+            result = result or []
+            offset = 0
+            for count, future in batch.writes:
+                future.set_result(result[offset:offset + count] if len(result) == len(batch.rows) else [])
+                offset += count
+        return written
+
+    def stop(self) -> None:
+        """Stop the flusher thread and write everything still buffered."""
+        self._stopped = True
+        with self._condition:
+            self._condition.notify_all()
+        if self._pid == os.getpid():
+            self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get buffered rows, flush counters and the average number of writes per request."""
+        with self._condition:
+            pending_rows = self._pending_rows
+        return {
+            "durability": self.durability,
+            "window_ms": self.window_ms,
+            "max_rows": self.max_rows,
+            "pending_rows": pending_rows,
+            "writes": self.writes,
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "writes_per_flush": self.writes / self.flushes if self.flushes else 0.0,
+            "failures": self.failures
+        }
@@ -3,6 +3,8 @@ import time
 import os
 from dotenv import load_dotenv
 
+from controller.resilience.dependency import get_dependency
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -19,6 +21,8 @@ def send_telegram_notification(message, markdown=None, chat_id=None, bot_token=N
     else:
         payload = {"chat_id": chat_id, "text": message}
 
-    response = requests.post(url, json=payload)
+    # Sending is not idempotent, so it is only retried when the connection failed
+    telegram = get_dependency("telegram")
+    response = telegram.call(requests.post, url, json=payload, timeout=telegram.timeout, idempotent=False)
     return response.json()
 
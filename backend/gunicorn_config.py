@@ -1,9 +1,25 @@
 # gunicorn_config.py
+import os
+
+# Serving mode, see "Serving modes" in README.md
+#   sync     - one request at a time per worker (default)
+#   threaded - gthread workers, GUNICORN_THREADS requests in flight per worker
+#   asgi     - uvicorn workers serving asgi:app, ASGI_WSGI_THREADS requests in flight per worker
+SERVER_MODE = os.getenv('SERVER_MODE', 'sync')
 
 # Worker configuration
-workers = 2  # Reduced number of workers for Digital Ocean's resource constraints
-worker_class = 'sync'  # Using sync workers for simplicity
-threads = 1  # Single thread per worker
+workers = int(os.getenv('GUNICORN_WORKERS', 2))  # Reduced number of workers for Digital Ocean's resource constraints
+if SERVER_MODE == 'threaded':
+    worker_class = 'gthread'
+    threads = int(os.getenv('GUNICORN_THREADS', 100))
+elif SERVER_MODE == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    # Only used when no app is given on the command line; start this mode with asgi:app, never app:app
+    wsgi_app = 'asgi:app'
+    threads = 1
+else:
+    worker_class = 'sync'  # Using sync workers for simplicity
+    threads = 1  # Single thread per worker
 
 # Request handling
 max_requests = 1000
@@ -30,3 +46,17 @@ bind = '0.0.0.0:8080'
 # Prevent timeouts during startup
 timeout = 0  # During startup
 preload_app = True  # Load application code before worker processes are forked
+
+
+def worker_exit(server, worker):
+    # Write usage counts still buffered in this worker before it exits
+    from controller.agent.usage_counter import agent_usage_counter
+    agent_usage_counter.stop()
+
+    # Send inserts still held by the Supabase write buffer
+    from controller.supabase.supabase_controller import get_supabase_controller
+    get_supabase_controller().write_buffer.stop()
+
+    # Background agent jobs die with the worker; fail them so polling clients stop waiting
+    from controller.jobs.agent_job_queue import agent_job_queue
+    agent_job_queue.fail_owned()
@@ -1,6 +1,7 @@
 from langchain_core.tools import tool, InjectedToolArg
 from typing_extensions import Annotated
-from controller.supabase.supabase_controller import SupabaseController
+from controller.supabase.async_supabase_controller import get_async_supabase_controller
+import asyncio
 import json
 import os
 import mimetypes
@@ -10,11 +11,23 @@ from langchain_core.runnables import RunnableConfig
 # Set up logging
 logger = logging.getLogger("file_tool")
 
-# Initialize the Supabase controller for database operations
-supabase_controller = SupabaseController()
+# Tools run inside agent.ainvoke, so they use the async controller and never block the event loop
+supabase_controller = get_async_supabase_controller()
+
+# MIME types whose content get_file_content can extract
+READABLE_MIME_TYPES = [
+    "text/",
+    "application/json",
+    "application/vnd.ms-excel",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.oasis.opendocument.spreadsheet",
+    "application/pdf",
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+]
 
 @tool
-def list_uploaded_files(
+async def list_uploaded_files(
     config: RunnableConfig
 ) -> list:
     """
@@ -32,51 +45,57 @@ def list_uploaded_files(
 
         logger.info(f"list_uploaded_files called with user_id={user_id}, agent_id={agent_id}")
         
-        # Check if we have the required parameters
-        if not user_id or not agent_id:
-            logger.error("Missing required parameters - user_id or agent_id is None")
-            return [{"id": None, "name": "Missing required parameters: user_id and agent_id are required"}]
-        
-        # Validate user access to agent
-        agent_result = supabase_controller.select(
+        return await _list_agent_files(user_id, agent_id)
+    except Exception as e:
+        logger.error(f"Error in list_uploaded_files: {str(e)}", exc_info=True)
+        return [{"id": None, "name": f"Error listing files: {str(e)}"}]
+
+async def _list_agent_files(user_id: str, agent_id: str) -> list:
+    """List the files of an agent after checking that the user owns it."""
+    # Check if we have the required parameters
+    if not user_id or not agent_id:
+        logger.error("Missing required parameters - user_id or agent_id is None")
+        return [{"id": None, "name": "Missing required parameters: user_id and agent_id are required"}]
+    
+    # The ownership check and the file listing are independent, so run them concurrently
+    agent_result, result = await asyncio.gather(
+        supabase_controller.select(
             "ai_agents",
+            columns="id",
             filters={"id": agent_id, "user_id": user_id}
-        )
-        
-        if not agent_result:
-            logger.warning(f"Authorization failed: user_id={user_id}, agent_id={agent_id}")
-            return [{"id": None, "name": "Not authorized to access files for this agent"}]
-        
-        # Get files
-        result = supabase_controller.select(
+        ),
+        supabase_controller.select(
             "files",
+            columns="id, filename, file_size, mime_type, uploaded_at",
             filters={"agent_id": agent_id},
             order_by={"uploaded_at": "desc"}
         )
+    )
+    
+    if not agent_result:
+        logger.warning(f"Authorization failed: user_id={user_id}, agent_id={agent_id}")
+        return [{"id": None, "name": "Not authorized to access files for this agent"}]
+    
+    if not result or len(result) == 0:
+        logger.info(f"No files found for agent_id={agent_id}")
+        return [{"id": None, "name": "No files found for this agent"}]
         
-        if not result or len(result) == 0:
-            logger.info(f"No files found for agent_id={agent_id}")
-            return [{"id": None, "name": "No files found for this agent"}]
-            
-        # Format file information
-        file_details = []
-        for file in result:
-            file_details.append({
-                "id": file.get("id"),
-                "name": file.get("filename"),
-                "size": _format_file_size(file.get("file_size", 0)),
-                "type": file.get("mime_type"),
-                "uploaded_at": file.get("uploaded_at")
-            })
-        
-        logger.info(f"Returning {len(file_details)} files")
-        return file_details
-    except Exception as e:
-        logger.error(f"Error in list_uploaded_files: {str(e)}", exc_info=True)
-        return [{"id": None, "name": f"Error listing files: {str(e)}"}]
+    # Format file information
+    file_details = []
+    for file in result:
+        file_details.append({
+            "id": file.get("id"),
+            "name": file.get("filename"),
+            "size": _format_file_size(file.get("file_size", 0)),
+            "type": file.get("mime_type"),
+            "uploaded_at": file.get("uploaded_at")
+        })
+    
+    logger.info(f"Returning {len(file_details)} files")
+    return file_details
 
 @tool
-def get_file_content(
+async def get_file_content(
     file_id: str,
     config: RunnableConfig
 ) -> str:
@@ -103,8 +122,9 @@ def get_file_content(
             return "⚠️ Missing required parameter: file_id is required"
         
         # Get file details and verify ownership
-        file_result = supabase_controller.select(
+        file_result = await supabase_controller.select(
             "files",
+            columns="agent_id, file_path, filename, mime_type",
             filters={"id": file_id}
         )
         
@@ -115,8 +135,9 @@ def get_file_content(
         
         # Verify user has access to the agent that owns this file
         agent_id = file_data.get("agent_id")
-        agent_result = supabase_controller.select(
+        agent_result = await supabase_controller.select(
             "ai_agents",
+            columns="id",
             filters={"id": agent_id, "user_id": user_id}
         )
         
@@ -127,40 +148,35 @@ def get_file_content(
         file_name = file_data.get("filename")
         mime_type = file_data.get("mime_type")
         
-        # Generate a signed URL for the file
-        storage_client = supabase_controller.client.storage.from_("files")
-        url_result = storage_client.create_signed_url(file_path, 60*60) # 1 hour expiry
+        file_bytes = None
+        if mime_type and any(readable_type in mime_type for readable_type in READABLE_MIME_TYPES):
+            file_bytes = await supabase_controller.download_file("files", file_path)
         
-        if hasattr(url_result, 'error') and url_result.error:
-            return f"⚠️ Error generating URL: {url_result.error}"
-            
-        signed_url = url_result.get("signedURL")
+        # Parsing spreadsheets, PDFs and documents is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(_read_file_content, file_id, file_name, mime_type, file_bytes)
         
-        # For text-based files, fetch the content
+    except Exception as e:
+        return f"❌ Error fetching file content: {str(e)}"
+
+def _read_file_content(file_id: str, file_name: str, mime_type: str, file_bytes: bytes) -> str:
+    """Extract the readable content of a downloaded file."""
+    try:
+        # For text-based files, return the content
         if mime_type and ("text/" in mime_type or "application/json" in mime_type):
-            import requests
-            response = requests.get(signed_url)
-            if response.status_code == 200:
-                return f"📄 File: {file_name}\n\n{response.text}"
-            else:
-                return f"⚠️ Failed to fetch file content: HTTP {response.status_code}"
+            return f"📄 File: {file_name}\n\n{file_bytes.decode('utf-8', errors='replace')}"
                 
         # For CSV files, try to parse as CSV
         if mime_type and ("text/csv" in mime_type):
-            import requests
             import pandas as pd
             from io import StringIO
             
-            response = requests.get(signed_url)
-            if response.status_code == 200:
-                try:
-                    df = pd.read_csv(StringIO(response.text))
-                    summary = df.to_json(orient="records")
-                    return f"📊 CSV File: {file_name}\n\n{summary}"
-                except Exception as e:
-                    return f"⚠️ Failed to parse CSV: {str(e)}\n\nRaw content:\n{response.text[:1000]}..."
-            else:
-                return f"⚠️ Failed to fetch file content: HTTP {response.status_code}"
+            text = file_bytes.decode('utf-8', errors='replace')
+            try:
+                df = pd.read_csv(StringIO(text))
+                summary = df.to_json(orient="records")
+                return f"📊 CSV File: {file_name}\n\n{summary}"
+            except Exception as e:
+                return f"⚠️ Failed to parse CSV: {str(e)}\n\nRaw content:\n{text[:1000]}..."
 
         # For Excel files (.xls, .xlsx) and OpenDocument spreadsheets
         if mime_type and any(excel_type in mime_type for excel_type in [
@@ -168,59 +184,48 @@ def get_file_content(
             "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             "application/vnd.oasis.opendocument.spreadsheet"
         ]):
-            import requests
             import pandas as pd
             import io
             
-            response = requests.get(signed_url)
-            if response.status_code == 200:
-                try:
-                    # Read Excel file content
-                    excel_file = io.BytesIO(response.content)
-                    # Excel files can have multiple sheets, read all sheets into a dict of dataframes
-                    excel_data = pd.read_excel(excel_file, sheet_name=None)
-                    
-                    result = f"📊 Excel File: {file_name}\n\n"
+            try:
+                # Read Excel file content
+                excel_file = io.BytesIO(file_bytes)
+                # Excel files can have multiple sheets, read all sheets into a dict of dataframes
+                excel_data = pd.read_excel(excel_file, sheet_name=None)
+                
+                result = f"📊 Excel File: {file_name}\n\n"
+                
+                # Process each sheet
+                for sheet_name, df in excel_data.items():
+                    # Get number of rows and columns
+                    rows, cols = df.shape
                     
-                    # Process each sheet
-                    for sheet_name, df in excel_data.items():
-                        # Get number of rows and columns
-                        rows, cols = df.shape
-                        
-                        # Add sheet summary
-                        result += f"Sheet: {sheet_name} ({rows} rows, {cols} columns)\n"
-                        
-                        # If the sheet is small enough, include all data as JSON
-                        if rows <= 50:  # Limit to avoid overwhelming responses
-                            sheet_data = df.to_json(orient="records")
-                            result += f"{sheet_data}\n\n"
-                        else:
-                            # Otherwise just show a sample of the first few rows
-                            sample_data = df.head(10).to_json(orient="records")
-                            result += f"Sample (first 10 rows):\n{sample_data}\n\n"
+                    # Add sheet summary
+                    result += f"Sheet: {sheet_name} ({rows} rows, {cols} columns)\n"
                     
-                    return result
-                except Exception as e:
-                    return f"⚠️ Failed to parse Excel file: {str(e)}"
-            else:
-                return f"⚠️ Failed to fetch file content: HTTP {response.status_code}"
+                    # If the sheet is small enough, include all data as JSON
+                    if rows <= 50:  # Limit to avoid overwhelming responses
+                        sheet_data = df.to_json(orient="records")
+                        result += f"{sheet_data}\n\n"
+                    else:
+                        # Otherwise just show a sample of the first few rows
+                        sample_data = df.head(10).to_json(orient="records")
+                        result += f"Sample (first 10 rows):\n{sample_data}\n\n"
+                
+                return result
+            except Exception as e:
+                return f"⚠️ Failed to parse Excel file: {str(e)}"
 
         # For PDFs specifically
         if mime_type and "application/pdf" in mime_type:
-            import requests
             import io
             
             try:
-                # First, download the PDF content
-                response = requests.get(signed_url)
-                if response.status_code != 200:
-                    return f"⚠️ Failed to fetch PDF: HTTP {response.status_code}"
-                
                 # Use PyPDF2 to extract text from the PDF
                 from PyPDF2 import PdfReader
                 
                 # Create a PDF reader object
-                pdf_file = io.BytesIO(response.content)
+                pdf_file = io.BytesIO(file_bytes)
                 pdf_reader = PdfReader(pdf_file)
                 
                 # Extract text from all pages
@@ -241,50 +246,45 @@ def get_file_content(
             "application/msword",
             "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
         ]):
-            import requests
             import io
             
-            response = requests.get(signed_url)
-            if response.status_code == 200:
-                try:
-                    # Use python-docx for .docx files
-                    if "openxmlformats" in mime_type:
-                        import docx
+            try:
+                # Use python-docx for .docx files
+                if "openxmlformats" in mime_type:
+                    import docx
+                    
+                    doc_file = io.BytesIO(file_bytes)
+                    doc = docx.Document(doc_file)
+                    
+                    # Extract text from paragraphs
+                    text_content = "\n\n".join([paragraph.text for paragraph in doc.paragraphs if paragraph.text])
+                    
+                    return f"📝 Word Document: {file_name}\n\n{text_content}"
+                # For .doc files (older format), use textract if available
+                else:
+                    try:
+                        import textract
+                        # Save to a temporary file
+                        import tempfile
+                        import os
+                        
+                        temp_dir = tempfile.gettempdir()
+                        temp_path = os.path.join(temp_dir, file_name)
                         
-                        doc_file = io.BytesIO(response.content)
-                        doc = docx.Document(doc_file)
+                        with open(temp_path, 'wb') as f:
+                            f.write(file_bytes)
                         
-                        # Extract text from paragraphs
-                        text_content = "\n\n".join([paragraph.text for paragraph in doc.paragraphs if paragraph.text])
+                        # Extract text from the .doc file
+                        text_content = textract.process(temp_path).decode('utf-8')
+                        
+                        # Clean up
+                        os.remove(temp_path)
                         
                         return f"📝 Word Document: {file_name}\n\n{text_content}"
-                    # For .doc files (older format), use textract if available
-                    else:
-                        try:
-                            import textract
-                            # Save to a temporary file
-                            import tempfile
-                            import os
-                            
-                            temp_dir = tempfile.gettempdir()
-                            temp_path = os.path.join(temp_dir, file_name)
-                            
-                            with open(temp_path, 'wb') as f:
-                                f.write(response.content)
-                            
-                            # Extract text from the .doc file
-                            text_content = textract.process(temp_path).decode('utf-8')
-                            
-                            # Clean up
-                            os.remove(temp_path)
-                            
-                            return f"📝 Word Document: {file_name}\n\n{text_content}"
-                        except ImportError:
-                            return f"📝 Word Document: {file_name}\n\nCannot extract text from .doc files. The textract library is not installed."
-                except Exception as e:
-                    return f"⚠️ Failed to parse Word document: {str(e)}"
-            else:
-                return f"⚠️ Failed to fetch file content: HTTP {response.status_code}"
+                    except ImportError:
+                        return f"📝 Word Document: {file_name}\n\nCannot extract text from .doc files. The textract library is not installed."
+            except Exception as e:
+                return f"⚠️ Failed to parse Word document: {str(e)}"
 
         # For other binary formats
         return f"📎 File available at: {file_name} (ID: {file_id})\nFile type: {mime_type}\nThis file cannot be directly read. Please use external tools to process this file type."
@@ -293,7 +293,7 @@ def get_file_content(
         return f"❌ Error fetching file content: {str(e)}"
 
 @tool
-def search_files(
+async def search_files(
     config: RunnableConfig,
     query: str = None,
     **kwargs
@@ -318,17 +318,12 @@ def search_files(
         
         logger.info(f"search_files called with query={query}, user_id={user_id}, agent_id={agent_id}")
         
-        # Check if we have the required parameters
-        if not user_id or not agent_id:
-            logger.error("Missing required parameters - user_id or agent_id is None")
-            return [{"id": None, "name": "Missing required parameters: user_id and agent_id are required"}]
-            
         if not query:
             logger.error("Missing query parameter")
             return [{"id": None, "name": "Missing query parameter"}]
             
         # First list all files for this agent
-        all_files = list_uploaded_files(user_id=user_id, agent_id=agent_id)
+        all_files = await _list_agent_files(user_id, agent_id)
         
         # Check if there was an error or no files
         if len(all_files) == 1 and all_files[0].get("id") is None:
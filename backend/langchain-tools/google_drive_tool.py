@@ -1,11 +1,15 @@
 from langchain_core.tools import tool, InjectedToolArg
 from googleapiclient.discovery import build
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
+import httplib2
+from controller.resilience.dependency import get_dependency
 import os
 import json
 import pandas as pd
 from io import StringIO
 import re
+import threading
 from typing_extensions import Annotated
 
 SERVICE_ACCOUNT_JSON = os.getenv("GOOGLE_DRIVE_SERVICE_ACCOUNT_JSON")
@@ -17,7 +21,16 @@ if SERVICE_ACCOUNT_JSON:
 else:
     raise ValueError("GOOGLE_DRIVE_SERVICE_ACCOUNT_JSON is not set! Please set the environment variable.")
 
-drive_service = build("drive", "v3", credentials=creds)
+_local = threading.local()
+google_drive = get_dependency("google_drive")
+
+def _get_drive_service():
+    """Get this thread's Drive service; the underlying httplib2 connection is not thread-safe."""
+    if not hasattr(_local, "drive_service"):
+        # httplib2 has a single socket timeout, used for both connecting and reading
+        http = AuthorizedHttp(creds, http=httplib2.Http(timeout=google_drive.read_timeout))
+        _local.drive_service = build("drive", "v3", http=http)
+    return _local.drive_service
 
 ALLOWED_FILE_IDS = {"1a2YLu3wLWBbx_nAj8Zp_pH4mbLN0AHjQ5_o1CMC1KMs"}  # List of allowed folder IDs
 
@@ -35,12 +48,13 @@ def list_allowed_files(
     """
     try:
         file_details = []
+        drive_service = _get_drive_service()
         
         # TODO: Implement logic to get allowed files for the user-agent combination
         # For now, using the hardcoded ALLOWED_FILE_IDS
         for file_id in ALLOWED_FILE_IDS:
             try:
-                file_metadata = drive_service.files().get(fileId=file_id, fields="id, name").execute()
+                file_metadata = google_drive.call(drive_service.files().get(fileId=file_id, fields="id, name").execute)
                 file_details.append({"id": file_metadata["id"], "name": file_metadata["name"]})
             except Exception as e:
                 file_details.append({"id": file_id, "name": f"Error: {str(e)}"})
@@ -59,24 +73,25 @@ def get_drive_file_content(file_id: str) -> str:
     :return: The content of the file if it's a readable format; otherwise, a warning message.
     """
     try:
-        file_metadata = drive_service.files().get(fileId=file_id, fields="mimeType, name").execute()
+        drive_service = _get_drive_service()
+        file_metadata = google_drive.call(drive_service.files().get(fileId=file_id, fields="mimeType, name").execute)
         file_name = file_metadata["name"]
         mime_type = file_metadata["mimeType"]
 
         if "text" in mime_type or "json" in mime_type:
             request = drive_service.files().get_media(fileId=file_id)
-            content = request.execute().decode("utf-8")  
+            content = google_drive.call(request.execute).decode("utf-8")  
             return content
 
         elif mime_type == "application/vnd.google-apps.document":
             export_mime_type = "text/plain"
             request = drive_service.files().export_media(fileId=file_id, mimeType=export_mime_type)
-            content = request.execute().decode("utf-8")
+            content = google_drive.call(request.execute).decode("utf-8")
             return f"📄 Google Docs File: {file_name}\n\n{content}"
 
         elif mime_type == "application/vnd.google-apps.spreadsheet":
             request = drive_service.files().export_media(fileId=file_id, mimeType="text/csv")
-            content = request.execute().decode("utf-8")
+            content = google_drive.call(request.execute).decode("utf-8")
 
             # Load CSV into Pandas DataFrame
             df = pd.read_csv(StringIO(content))
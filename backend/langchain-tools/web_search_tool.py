@@ -1,5 +1,7 @@
 from langchain_core.tools import tool
 from langchain_community.utilities import SerpAPIWrapper
+from serpapi import GoogleSearch
+from controller.resilience.dependency import get_dependency
 import os
 
 # Load API Key
@@ -7,7 +9,19 @@ SERPAPI_KEY = os.getenv("SERPAPI_API_KEY")
 if not SERPAPI_KEY:
     raise ValueError("Missing SerpAPI Key! Set SERPAPI_API_KEY in environment variables.")
 
+serpapi = get_dependency("serpapi")
+
+
+class _TimedGoogleSearch(GoogleSearch):
+    """GoogleSearch with the serpapi connect/read timeouts instead of the client's 60000s default."""
+
+    def __init__(self, params_dict):
+        super().__init__(params_dict)
+        self.timeout = serpapi.timeout
+
+
 search = SerpAPIWrapper(serpapi_api_key=SERPAPI_KEY)
+search.search_engine = _TimedGoogleSearch
 
 @tool
 def web_search(query: str, num_results: int = 5) -> list:
@@ -19,7 +33,7 @@ def web_search(query: str, num_results: int = 5) -> list:
     :return: A list of search result snippets.
     """
     try:
-        results = search.run(query) 
+        results = serpapi.call(search.run, query)
         
         if isinstance(results, str): 
             return [results] 
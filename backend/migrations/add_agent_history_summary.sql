@@ -0,0 +1,16 @@
+-- Running summary of the agent history that no longer fits the prompt window
+ALTER TABLE public.ai_agents
+    ADD COLUMN IF NOT EXISTS history_summary TEXT,
+    ADD COLUMN IF NOT EXISTS summarized_through BIGINT NOT NULL DEFAULT 0;
+
+COMMENT ON COLUMN public.ai_agents.history_summary IS 'Summary of the agent messages up to summarized_through, written in the background';
+COMMENT ON COLUMN public.ai_agents.summarized_through IS 'Id of the last agent_messages row covered by history_summary (0 if none)';
+
+-- Summarizing history is not an edit of the agent: keep updated_at for configuration changes
+DROP TRIGGER IF EXISTS update_ai_agents_updated_at ON public.ai_agents;
+CREATE TRIGGER update_ai_agents_updated_at
+BEFORE UPDATE ON public.ai_agents
+FOR EACH ROW
+WHEN ((to_jsonb(OLD) - 'usage_count' - 'last_used_at' - 'history_summary' - 'summarized_through' - 'updated_at')
+      IS DISTINCT FROM (to_jsonb(NEW) - 'usage_count' - 'last_used_at' - 'history_summary' - 'summarized_through' - 'updated_at'))
+EXECUTE FUNCTION update_updated_at_column();
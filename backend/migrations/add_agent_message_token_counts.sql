@@ -0,0 +1,7 @@
+-- Token count of each message, counted once when it is persisted, for the history window of agent prompts
+ALTER TABLE public.agent_messages
+    ADD COLUMN IF NOT EXISTS token_count INTEGER,
+    ADD COLUMN IF NOT EXISTS tokenizer VARCHAR(40);
+
+COMMENT ON COLUMN public.agent_messages.token_count IS 'Tokens of content, counted with the tokenizer below (NULL for messages stored before counting)';
+COMMENT ON COLUMN public.agent_messages.tokenizer IS 'Tokenizer that produced token_count, e.g. the tiktoken encoding cl100k_base';
@@ -0,0 +1,24 @@
+-- Add batched usage counting for agents
+-- Applies one delta per agent in a single statement, for flushing counts buffered in the API workers
+CREATE OR REPLACE FUNCTION increment_agent_usage_batch(agent_ids UUID[], deltas INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    UPDATE public.ai_agents AS a
+    SET
+        usage_count = a.usage_count + d.delta,
+        last_used_at = now()
+    FROM unnest(agent_ids, deltas) AS d(agent_id, delta)
+    WHERE a.id = d.agent_id;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION increment_agent_usage_batch TO authenticated;
+
+-- Usage counting is not an edit of the agent: keep updated_at for configuration changes
+DROP TRIGGER IF EXISTS update_ai_agents_updated_at ON public.ai_agents;
+CREATE TRIGGER update_ai_agents_updated_at
+BEFORE UPDATE ON public.ai_agents
+FOR EACH ROW
+WHEN ((to_jsonb(OLD) - 'usage_count' - 'last_used_at' - 'updated_at')
+      IS DISTINCT FROM (to_jsonb(NEW) - 'usage_count' - 'last_used_at' - 'updated_at'))
+EXECUTE FUNCTION update_updated_at_column();
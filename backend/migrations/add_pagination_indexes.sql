@@ -0,0 +1,9 @@
+-- Keyset pagination indexes: list endpoints page on (sort column, id) within an owner
+CREATE INDEX IF NOT EXISTS idx_ai_agents_user_id_created_at_id
+    ON public.ai_agents(user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_user_drive_permissions_user_id_created_at_id
+    ON public.user_drive_permissions(user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_files_agent_id_uploaded_at_id
+    ON public.files(agent_id, uploaded_at DESC, id DESC);
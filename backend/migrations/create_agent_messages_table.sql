@@ -0,0 +1,63 @@
+-- Create the agent_messages table (one row per chat message)
+CREATE TABLE public.agent_messages (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    agent_id UUID NOT NULL REFERENCES public.ai_agents(id) ON DELETE CASCADE,
+    role VARCHAR(20) NOT NULL,
+    content TEXT NOT NULL DEFAULT '',
+    steps JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Recent-window reads walk this index backwards
+CREATE INDEX idx_agent_messages_agent_id_id ON public.agent_messages(agent_id, id);
+
+-- Enable Row Level Security
+ALTER TABLE public.agent_messages ENABLE ROW LEVEL SECURITY;
+
+-- Users can view messages of their own agents
+CREATE POLICY "Users can view messages of their own agents"
+    ON public.agent_messages
+    FOR SELECT
+    USING (
+        EXISTS (
+            SELECT 1 FROM public.ai_agents a
+            WHERE a.id = agent_id AND a.user_id = auth.uid()
+        )
+    );
+
+-- Service role can manage all messages
+CREATE POLICY "Service role can manage all messages"
+    ON public.agent_messages
+    TO service_role
+    USING (true)
+    WITH CHECK (true);
+
+GRANT SELECT ON public.agent_messages TO authenticated;
+
+-- Move existing chat_history arrays into the message table, keeping their order
+BEGIN;
+
+INSERT INTO public.agent_messages (agent_id, role, content, steps, created_at)
+SELECT
+    a.id,
+    m.value->>'role',
+    COALESCE(m.value->>'content', ''),
+    m.value->'steps',
+    COALESCE((m.value->>'timestamp')::timestamptz, a.created_at)
+FROM public.ai_agents a
+CROSS JOIN LATERAL jsonb_array_elements(COALESCE(a.chat_history, '[]'::jsonb))
+    WITH ORDINALITY AS m(value, idx)
+ORDER BY a.id, m.idx;
+
+UPDATE public.ai_agents SET chat_history = '[]'::jsonb;
+
+COMMIT;
+
+-- Comments for documentation
+COMMENT ON TABLE public.agent_messages IS 'Append-only chat history of AI agents, one row per message';
+COMMENT ON COLUMN public.agent_messages.id IS 'Monotonic identifier, defines message order within an agent';
+COMMENT ON COLUMN public.agent_messages.agent_id IS 'Reference to the agent the message belongs to';
+COMMENT ON COLUMN public.agent_messages.role IS 'Message author: user or assistant';
+COMMENT ON COLUMN public.agent_messages.content IS 'Message text';
+COMMENT ON COLUMN public.agent_messages.steps IS 'JSON array of tool steps taken to produce an assistant message';
+COMMENT ON COLUMN public.agent_messages.created_at IS 'Timestamp when the message was created';
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
-from controller.supabase.supabase_controller import SupabaseController
+from controller.supabase.supabase_controller import get_supabase_controller, DEFAULT_PAGE_SIZE
+from controller.chat_history.chat_history_controller import ChatHistoryController
+from controller.http.etag_cache import etag_cache
 import traceback
 from flasgger import swag_from
 from uuid import UUID
@@ -7,8 +9,17 @@ from uuid import UUID
 # Create a Blueprint for the AI Agents routes
 ai_agents_bp = Blueprint('ai_agents', __name__)
 
-# Initialize the Supabase controller
-supabase_controller = SupabaseController()
+# Get the shared Supabase controller
+supabase_controller = get_supabase_controller()
+
+# Initialize the chat history store
+chat_history_controller = ChatHistoryController(supabase_controller)
+
+# Agent columns without the heavy chat_history JSON, used for listings
+AGENT_SUMMARY_COLUMNS = (
+    "id, user_id, name, description, model_id, tool_categories, custom_instructions, "
+    "created_at, updated_at, is_active, usage_count, last_used_at, configuration"
+)
 
 @ai_agents_bp.route('/', methods=['POST'])
 @swag_from({
@@ -58,22 +69,58 @@ def create_agent():
         "required": True,
         "type": "string",
         "format": "uuid"
+    }, {
+        "name": "fields",
+        "in": "query",
+        "required": False,
+        "type": "string",
+        "description": "Comma-separated agent columns to return (default: all except chat_history)"
+    }, {
+        "name": "include_history",
+        "in": "query",
+        "required": False,
+        "type": "boolean",
+        "default": True,
+        "description": "Include chat_history from the message store"
+    }, {
+        "name": "If-None-Match",
+        "in": "header",
+        "required": False,
+        "type": "string",
+        "description": "ETag of a previous response; answered with 304 Not Modified if the content is unchanged"
     }],
     "responses": {
         "200": {"description": "AI agent details"},
+        "304": {"description": "Not modified since the ETag in If-None-Match"},
         "404": {"description": "Agent not found"},
         "500": {"description": "Server error"}
     }
 })
 def get_agent(agent_id):
     try:
+        columns = supabase_controller.projection(request.args.get("fields"), AGENT_SUMMARY_COLUMNS)
+        include_history = request.args.get("include_history", "true").lower() != "false"
+        
+        etag_key = ("agent", agent_id, columns, include_history)
+        not_modified = etag_cache.not_modified(etag_key)
+        if not_modified:
+            return not_modified
+        
         result = supabase_controller.select(
             "ai_agents",
+            columns=columns,
             filters={"id": agent_id}
         )
         if not result:
             return jsonify({"error": "Agent not found"}), 404
-        return jsonify(result[0]), 200
+        agent = result[0]
+        dependencies = [("ai_agents", {"id": agent_id})]
+        if include_history:
+            agent["chat_history"] = chat_history_controller.get_history(agent_id)
+            dependencies.append(("agent_messages", {"agent_id": agent_id}))
+        return etag_cache.respond(etag_key, agent, dependencies)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error getting agent: {str(e)}")
         print(traceback.format_exc())
@@ -83,26 +130,78 @@ def get_agent(agent_id):
 @swag_from({
     "tags": ["AI Agents"],
     "summary": "List all AI agents for a user",
+    "description": "Returns agent summaries without chat_history; use GET /agents/{agent_id}/history to load a history. Without cursor or page_size the full list is returned as an array; with either, the response is {\"items\": [...], \"next_cursor\": ...} and next_cursor is null on the last page.",
     "parameters": [{
         "name": "user_id",
         "in": "path",
         "required": True,
         "type": "string",
         "format": "uuid"
+    }, {
+        "name": "fields",
+        "in": "query",
+        "required": False,
+        "type": "string",
+        "description": "Comma-separated agent columns to return (default: all except chat_history)",
+        "example": "id,name,model_id"
+    }, {
+        "name": "cursor",
+        "in": "query",
+        "required": False,
+        "type": "string",
+        "description": "Cursor from next_cursor of the previous page; enables the paginated response"
+    }, {
+        "name": "page_size",
+        "in": "query",
+        "required": False,
+        "type": "integer",
+        "description": "Rows per page (default 50, max 200); enables the paginated response"
+    }, {
+        "name": "If-None-Match",
+        "in": "header",
+        "required": False,
+        "type": "string",
+        "description": "ETag of a previous response; answered with 304 Not Modified if the content is unchanged"
     }],
     "responses": {
-        "200": {"description": "List of AI agents"},
+        "200": {"description": "List of AI agents, or a page of them"},
+        "304": {"description": "Not modified since the ETag in If-None-Match"},
+        "400": {"description": "Invalid fields or cursor"},
         "500": {"description": "Server error"}
     }
 })
 def list_agents(user_id):
     try:
+        columns = supabase_controller.projection(request.args.get("fields"), AGENT_SUMMARY_COLUMNS)
+        cursor = request.args.get("cursor")
+        page_size = request.args.get("page_size", type=int)
+        
+        etag_key = ("agents", user_id, columns, cursor, page_size)
+        not_modified = etag_cache.not_modified(etag_key)
+        if not_modified:
+            return not_modified
+        dependencies = [("ai_agents", {"user_id": user_id})]
+        
+        if cursor or page_size:
+            items, next_cursor = supabase_controller.select_page(
+                "ai_agents",
+                columns=columns,
+                filters={"user_id": user_id},
+                sort_column="created_at",
+                page_size=page_size or DEFAULT_PAGE_SIZE,
+                cursor=cursor
+            )
+            return etag_cache.respond(etag_key, {"items": items, "next_cursor": next_cursor}, dependencies)
+        
         result = supabase_controller.select(
             "ai_agents",
+            columns=columns,
             filters={"user_id": user_id},
             order_by={"created_at": "desc"}
         )
-        return jsonify(result), 200
+        return etag_cache.respond(etag_key, result, dependencies)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error listing agents: {str(e)}")
         print(traceback.format_exc())
@@ -211,7 +310,8 @@ def increment_usage(agent_id):
     try:
         result = supabase_controller.execute_rpc(
             "increment_agent_usage",
-            {"agent_id": agent_id}
+            {"agent_id": agent_id},
+            invalidate_tables=["ai_agents"]
         )
         return jsonify({"message": "Usage count incremented successfully"}), 200
     except Exception as e:
@@ -219,6 +319,30 @@ def increment_usage(agent_id):
         print(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+@ai_agents_bp.route('/<agent_id>/history', methods=['GET'])
+@swag_from({
+    "tags": ["AI Agents"],
+    "summary": "Get the chat history of an AI agent",
+    "parameters": [{
+        "name": "agent_id",
+        "in": "path",
+        "required": True,
+        "type": "string",
+        "format": "uuid"
+    }],
+    "responses": {
+        "200": {"description": "Chat messages in chronological order"},
+        "500": {"description": "Server error"}
+    }
+})
+def get_chat_history(agent_id):
+    try:
+        return jsonify(chat_history_controller.get_history(agent_id)), 200
+    except Exception as e:
+        print(f"Error getting chat history: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
 @ai_agents_bp.route('/<agent_id>/clear-history', methods=['POST'])
 @swag_from({
     "tags": ["AI Agents"],
@@ -240,11 +364,12 @@ def clear_chat_history(agent_id):
     try:
         result = supabase_controller.update(
             "ai_agents",
-            data={"chat_history": []},
+            data={"chat_history": [], "history_summary": None, "summarized_through": 0},
             filters={"id": agent_id}
         )
         if not result:
             return jsonify({"error": "Agent not found"}), 404
+        chat_history_controller.clear_history(agent_id)
         return jsonify({"message": "Chat history cleared successfully"}), 200
     except Exception as e:
         print(f"Error clearing chat history: {str(e)}")
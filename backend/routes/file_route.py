@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify, current_app, url_for, send_file, Response, stream_with_context
-from controller.supabase.supabase_controller import SupabaseController
+from controller.supabase.supabase_controller import get_supabase_controller, DEFAULT_PAGE_SIZE
+from controller.http.etag_cache import etag_cache
 import traceback
 from flasgger import swag_from
 from uuid import UUID, uuid4
@@ -10,8 +11,8 @@ import mimetypes
 # Create a Blueprint for file routes
 file_bp = Blueprint('file', __name__)
 
-# Initialize the Supabase controller
-supabase_controller = SupabaseController()
+# Get the shared Supabase controller
+supabase_controller = get_supabase_controller()
 
 @file_bp.route('/<agent_id>', methods=['POST'])
 @swag_from({
@@ -80,13 +81,8 @@ def upload_file(agent_id):
         # Get content type as string
         content_type = str(file.content_type) if file.content_type else "application/octet-stream"
         
-        # Upload to Supabase Storage - important fix here
-        storage_client = supabase_controller.client.storage.from_("files")
-        storage_result = storage_client.upload(
-            file_path,
-            file_content,
-            file_options={"contentType": content_type}  # Use contentType key, not content-type
-        )
+        # Upload to Supabase Storage
+        storage_result = supabase_controller.upload_file("files", file_path, file_content, content_type)
         
         if hasattr(storage_result, 'error') and storage_result.error:
             return jsonify({"error": f"Storage error: {storage_result.error}"}), 500
@@ -105,7 +101,7 @@ def upload_file(agent_id):
         
         if not db_result:
             # Try to delete the uploaded file if database insert fails
-            storage_client.remove([file_path])
+            supabase_controller.delete_file("files", file_path)
             return jsonify({"error": "Failed to create file record"}), 500
             
         return jsonify(db_result[0]), 200
@@ -120,6 +116,7 @@ def upload_file(agent_id):
 @swag_from({
     "tags": ["Files"],
     "summary": "List all files for an agent",
+    "description": "Without cursor or page_size the full list is returned as an array; with either, the response is {\"items\": [...], \"next_cursor\": ...} and next_cursor is null on the last page.",
     "parameters": [{
         "name": "agent_id",
         "in": "path",
@@ -132,9 +129,36 @@ def upload_file(agent_id):
         "required": True,
         "type": "string",
         "format": "uuid"
+    }, {
+        "name": "fields",
+        "in": "query",
+        "required": False,
+        "type": "string",
+        "description": "Comma-separated file columns to return (default: all)",
+        "example": "id,filename,mime_type"
+    }, {
+        "name": "cursor",
+        "in": "query",
+        "required": False,
+        "type": "string",
+        "description": "Cursor from next_cursor of the previous page; enables the paginated response"
+    }, {
+        "name": "page_size",
+        "in": "query",
+        "required": False,
+        "type": "integer",
+        "description": "Rows per page (default 50, max 200); enables the paginated response"
+    }, {
+        "name": "If-None-Match",
+        "in": "header",
+        "required": False,
+        "type": "string",
+        "description": "ETag of a previous response; answered with 304 Not Modified if the content is unchanged"
     }],
     "responses": {
-        "200": {"description": "List of files"},
+        "200": {"description": "List of files, or a page of them"},
+        "304": {"description": "Not modified since the ETag in If-None-Match"},
+        "400": {"description": "Invalid fields or cursor"},
         "403": {"description": "Not authorized"},
         "500": {"description": "Server error"}
     }
@@ -142,10 +166,21 @@ def upload_file(agent_id):
 def list_agent_files(agent_id):
     try:
         user_id = request.args.get('user_id')
+        columns = supabase_controller.projection(request.args.get('fields'))
+        cursor = request.args.get('cursor')
+        page_size = request.args.get('page_size', type=int)
+        
+        # A remembered ETag was only stored after this user passed the access check
+        etag_key = ("agent_files", agent_id, user_id, columns, cursor, page_size)
+        not_modified = etag_cache.not_modified(etag_key)
+        if not_modified:
+            return not_modified
+        dependencies = [("ai_agents", {"id": agent_id, "user_id": user_id}), ("files", {"agent_id": agent_id})]
         
         # Validate user access to agent
         agent_result = supabase_controller.select(
             "ai_agents",
+            columns="id",
             filters={"id": agent_id, "user_id": user_id}
         )
         
@@ -153,14 +188,28 @@ def list_agent_files(agent_id):
             return jsonify({"error": "Not authorized to access files for this agent"}), 403
         
         # Get files
+        if cursor or page_size:
+            items, next_cursor = supabase_controller.select_page(
+                "files",
+                columns=columns,
+                filters={"agent_id": agent_id},
+                sort_column="uploaded_at",
+                page_size=page_size or DEFAULT_PAGE_SIZE,
+                cursor=cursor
+            )
+            return etag_cache.respond(etag_key, {"items": items, "next_cursor": next_cursor}, dependencies)
+        
         result = supabase_controller.select(
             "files",
+            columns=columns,
             filters={"agent_id": agent_id},
             order_by={"uploaded_at": "desc"}
         )
         
-        return jsonify(result), 200
+        return etag_cache.respond(etag_key, result, dependencies)
         
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error listing files: {str(e)}")
         print(traceback.format_exc())
@@ -316,15 +365,24 @@ def proxy_file(file_id):
         from flask import Response, stream_with_context
         
         # Make a streaming request to Supabase
-        supabase_response = requests.get(supabase_signed_url, stream=True)
+        supabase_response = supabase_controller.dependency.call(
+            requests.get, supabase_signed_url, stream=True, timeout=supabase_controller.dependency.timeout
+        )
+        
+        headers = {
+            'Content-Disposition': f'inline; filename="{filename}"'
+        }
+        # Lets the compressor pass small files through; it drops the length when it compresses.
+        # iter_content decodes an upstream Content-Encoding, so the length only holds for identity bodies.
+        if (supabase_response.headers.get('Content-Length')
+                and supabase_response.headers.get('Content-Encoding', 'identity') == 'identity'):
+            headers['Content-Length'] = supabase_response.headers['Content-Length']
         
         # Return a streaming response to the client
         return Response(
-            stream_with_context(supabase_response.iter_content(chunk_size=1024)),
+            stream_with_context(supabase_response.iter_content(chunk_size=65536)),
             content_type=mime_type or 'application/octet-stream',
-            headers={
-                'Content-Disposition': f'inline; filename="{filename}"'
-            }
+            headers=headers
         )
         
     except Exception as e:
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
-from controller.supabase.supabase_controller import SupabaseController
+from controller.supabase.supabase_controller import get_supabase_controller, DEFAULT_PAGE_SIZE
+from controller.http.etag_cache import etag_cache
 import traceback
 from flasgger import swag_from
 from uuid import UUID
@@ -7,8 +8,8 @@ from uuid import UUID
 # Create a Blueprint for the Google Drive routes
 google_drive_bp = Blueprint('google_drive', __name__)
 
-# Initialize the Supabase controller
-supabase_controller = SupabaseController()
+# Get the shared Supabase controller
+supabase_controller = get_supabase_controller()
 
 @google_drive_bp.route('/file', methods=['POST'])
 @swag_from({
@@ -47,26 +48,78 @@ def create_file_access():
 @swag_from({
     "tags": ["Google Drive"],
     "summary": "List all accessible files for a user",
+    "description": "Without cursor or page_size the full list is returned as an array; with either, the response is {\"items\": [...], \"next_cursor\": ...} and next_cursor is null on the last page.",
     "parameters": [{
         "name": "user_id",
         "in": "path",
         "required": True,
         "type": "string",
         "format": "uuid"
+    }, {
+        "name": "fields",
+        "in": "query",
+        "required": False,
+        "type": "string",
+        "description": "Comma-separated permission columns to return (default: all)",
+        "example": "id,file_id"
+    }, {
+        "name": "cursor",
+        "in": "query",
+        "required": False,
+        "type": "string",
+        "description": "Cursor from next_cursor of the previous page; enables the paginated response"
+    }, {
+        "name": "page_size",
+        "in": "query",
+        "required": False,
+        "type": "integer",
+        "description": "Rows per page (default 50, max 200); enables the paginated response"
+    }, {
+        "name": "If-None-Match",
+        "in": "header",
+        "required": False,
+        "type": "string",
+        "description": "ETag of a previous response; answered with 304 Not Modified if the content is unchanged"
     }],
     "responses": {
-        "200": {"description": "List of accessible files"},
+        "200": {"description": "List of accessible files, or a page of them"},
+        "304": {"description": "Not modified since the ETag in If-None-Match"},
+        "400": {"description": "Invalid fields or cursor"},
         "500": {"description": "Server error"}
     }
 })
 def list_user_files(user_id):
     try:
+        columns = supabase_controller.projection(request.args.get('fields'))
+        cursor = request.args.get('cursor')
+        page_size = request.args.get('page_size', type=int)
+        
+        etag_key = ("drive_permissions", user_id, columns, cursor, page_size)
+        not_modified = etag_cache.not_modified(etag_key)
+        if not_modified:
+            return not_modified
+        dependencies = [("user_drive_permissions", {"user_id": user_id})]
+        
+        if cursor or page_size:
+            items, next_cursor = supabase_controller.select_page(
+                "user_drive_permissions",
+                columns=columns,
+                filters={"user_id": user_id},
+                sort_column="created_at",
+                page_size=page_size or DEFAULT_PAGE_SIZE,
+                cursor=cursor
+            )
+            return etag_cache.respond(etag_key, {"items": items, "next_cursor": next_cursor}, dependencies)
+        
         result = supabase_controller.select(
             "user_drive_permissions",
+            columns=columns,
             filters={"user_id": user_id},
             order_by={"created_at": "desc"}
         )
-        return jsonify(result), 200
+        return etag_cache.respond(etag_key, result, dependencies)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error listing files: {str(e)}")
         print(traceback.format_exc())
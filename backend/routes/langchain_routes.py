@@ -1,9 +1,14 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from controller.langchain.langchain_controller import LangChainController
 import traceback
+import json
 from flasgger import swag_from
 from datetime import datetime
-from controller.supabase.supabase_controller import SupabaseController
+from controller.supabase.supabase_controller import get_supabase_controller
+from controller.chat_history.chat_history_controller import ChatHistoryController
+from controller.agent.agent_context import AgentContext, AgentNotFoundError
+from controller.event_loop.background_loop import background_loop
+from controller.jobs.agent_job_queue import agent_job_queue, JobQueueFullError
 
 # Create a Blueprint for the LangChain routes
 langchain_bp = Blueprint('langchain', __name__)
@@ -11,8 +16,42 @@ langchain_bp = Blueprint('langchain', __name__)
 # Initialize the LangChain controller
 langchain_controller = LangChainController()
 
-# Initialize the Supabase controller
-supabase_controller = SupabaseController()
+# Get the shared Supabase controller
+supabase_controller = get_supabase_controller()
+
+# Initialize the chat history store
+chat_history_controller = ChatHistoryController(supabase_controller)
+
+def _sse(event, data):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _turn_messages(question, user_timestamp, result):
+    """Build the user and assistant chat messages of a completed agent turn, counted for the model that answered it."""
+    return langchain_controller.count_message_tokens([
+        {
+            "role": "user",
+            "content": question,
+            "timestamp": user_timestamp
+        },
+        {
+            "role": "assistant",
+            "content": result["final_answer"],
+            "steps": result["steps"],
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    ], result["model"])
+
+def _sse_response(events):
+    """Wrap a generator of SSE strings in a streaming response."""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering so events are flushed immediately
+        }
+    )
 
 @langchain_bp.route('/ask', methods=['POST'])
 @swag_from({
@@ -35,10 +74,15 @@ supabase_controller = SupabaseController()
                     },
                     "model": {
                         "type": "string",
-                        "description": "The ID of the model to use",
-                        "enum": ["claude-3-7-sonnet-20250219", "claude-3-5-haiku-20241022"],
+                        "description": "The ID of the model to use, or auto to let the router pick one",
+                        "enum": ["claude-3-7-sonnet-20250219", "claude-3-5-haiku-20241022", "auto"],
                         "default": "claude-3-5-haiku-20241022",
                         "example": "claude-3-5-haiku-20241022"
+                    },
+                    "use_cache": {
+                        "type": "boolean",
+                        "description": "Serve a cached answer to the same or a similar question if there is one",
+                        "default": True
                     }
                 }
             }
@@ -59,6 +103,16 @@ supabase_controller = SupabaseController()
                         "type": "string",
                         "description": "The ID of the model that generated the answer",
                         "example": "claude-3-5-haiku-20241022"
+                    },
+                    "cached": {
+                        "type": "boolean",
+                        "description": "Whether the answer was served from the response cache",
+                        "example": False
+                    },
+                    "similarity": {
+                        "type": "number",
+                        "description": "Similarity of the question to the cached one, present when the answer was cached for a similar question",
+                        "example": 0.9612
                     }
                 }
             }
@@ -102,9 +156,10 @@ def ask():
         
         question = data['question']
         model_id = data.get('model', 'claude-3-5-haiku-20241022')
+        use_cache = data.get('use_cache', True)
         
         # Ask the question using the LangChain controller
-        result = langchain_controller.ask_question(question, model_id)
+        result = langchain_controller.ask_question(question, model_id, use_cache=use_cache)
         
         # Return the answer
         return jsonify(result), 200
@@ -153,8 +208,8 @@ def ask():
                     },
                     "model": {
                         "type": "string",
-                        "description": "The ID of the model to use",
-                        "enum": ["claude-3-7-sonnet-20250219", "claude-3-5-haiku-20241022", "claude-3-5-sonnet-20241022"],
+                        "description": "The ID of the model to use, or auto to let the router pick one",
+                        "enum": ["claude-3-7-sonnet-20250219", "claude-3-5-haiku-20241022", "claude-3-5-sonnet-20241022", "auto"],
                         "default": "claude-3-5-haiku-20241022",
                         "example": "claude-3-5-haiku-20241022"
                     },
@@ -163,12 +218,36 @@ def ask():
                         "items": { "type": "string" },
                         "description": "List of tool categories to enable (e.g. ['math']). If not provided, all tools are available.",
                         "example": ["math", "web"]
+                    },
+                    "background": {
+                        "type": "boolean",
+                        "description": "Run the agent as a background job and return its job_id immediately. Poll /agent/jobs/{job_id} for the result.",
+                        "default": False
                     }
                 }
             }
         }
     ],
     "responses": {
+        "202": {
+            "description": "Job queued (when background is true)",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "job_id": {"type": "string", "example": "3f2b9c1e-8f57-4a8e-9d5c-0b7e6f1a2c3d"},
+                    "status": {"type": "string", "example": "queued"}
+                }
+            }
+        },
+        "503": {
+            "description": "Too many background jobs in progress",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "error": {"type": "string", "example": "Too many agent jobs in progress, please retry later"}
+                }
+            }
+        },
         "200": {
             "description": "Successful response with agent's reasoning steps and final answer",
             "schema": {
@@ -212,6 +291,16 @@ def ask():
                         "type": "string",
                         "description": "The agent's final answer after completing all reasoning steps",
                         "example": "The result is 47."
+                    },
+                    "model": {
+                        "type": "string",
+                        "description": "The ID of the model that ran the agent, the routed one for auto",
+                        "example": "claude-3-5-haiku-20241022"
+                    },
+                    "usage": {
+                        "type": "object",
+                        "description": "Tokens of all model calls of the run; cache_read_tokens and cache_creation_tokens are the input tokens read from and written to the provider's prompt cache",
+                        "example": {"input_tokens": 5210, "output_tokens": 180, "cache_read_tokens": 4096, "cache_creation_tokens": 350}
                     }
                 }
             }
@@ -228,6 +317,18 @@ def ask():
                 }
             }
         },
+        "404": {
+            "description": "Agent not found",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "error": {
+                        "type": "string",
+                        "example": "Agent agent-123 not found"
+                    }
+                }
+            }
+        },
         "500": {
             "description": "Server error",
             "schema": {
@@ -262,44 +363,39 @@ def agent():
         # Create user message timestamp when request is received
         user_timestamp = datetime.utcnow().isoformat()
         
-        # Process the query using the LangChain agent
-        result = langchain_controller.ask_agent(question, model_id, tool_categories, user_id, agent_id)
-        
-        # Get current agent data to access existing chat history
-        agent_data = supabase_controller.select("ai_agents", filters={"id": agent_id})[0]
-        existing_history = agent_data.get("chat_history", [])
+        # Load the agent once for the whole request
+        agent_context = AgentContext.load(agent_id, supabase_controller, chat_history_controller)
         
-        # Create new messages
-        new_messages = [
-            {
-                "role": "user",
-                "content": question,
-                "timestamp": user_timestamp
-            },
-            {
-                "role": "assistant",
-                "content": result["final_answer"],
-                "steps": result["steps"],
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        ]
+        # Queue the run and return immediately if the client will poll for the result
+        if data.get('background'):
+            job_id = agent_job_queue.submit(
+                langchain_controller.stream_agent(question, model_id, tool_categories, user_id, agent_id, agent_context),
+                on_done=lambda result: agent_context.record_turn(_turn_messages(question, user_timestamp, result))
+            )
+            return jsonify({
+                'job_id': job_id,
+                'status': 'queued'
+            }), 202
         
-        # Combine existing history with new messages
-        updated_history = existing_history + new_messages if existing_history else new_messages
+        # Process the query using the LangChain agent
+        result = langchain_controller.ask_agent(question, model_id, tool_categories, user_id, agent_id, agent_context)
         
-        # Update both chat_history and increment usage_count
-        supabase_controller.update(
-            "ai_agents",
-            {
-                "chat_history": updated_history,
-                "usage_count": agent_data.get("usage_count", 0) + 1
-            },
-            filters={"id": agent_id}
-        )
+        # Persist the turn and count it
+        agent_context.record_turn(_turn_messages(question, user_timestamp, result))
         
         # Return the answer
         return jsonify(result), 200
     
+    except AgentNotFoundError as e:
+        return jsonify({
+            'error': str(e)
+        }), 404
+    
+    except JobQueueFullError as e:
+        return jsonify({
+            'error': str(e)
+        }), 503
+    
     except Exception as e:
         # Log the error
         print(f"Error in /agent endpoint: {str(e)}")
@@ -310,6 +406,207 @@ def agent():
             'error': str(e)
         }), 500
 
+@langchain_bp.route('/agent/jobs/<job_id>', methods=['GET'])
+@swag_from({
+    "tags": ["LangChain"],
+    "summary": "Get the status of a background agent job",
+    "description": (
+        "Returns the job status (queued, running, succeeded or failed), the steps "
+        "completed so far and, once succeeded, the /agent/ask response body in `result`. "
+        "With `wait`, the request long-polls until the job finishes, records a new step "
+        "or the wait time passes."
+    ),
+    "parameters": [
+        {
+            "name": "job_id",
+            "in": "path",
+            "required": True,
+            "type": "string"
+        },
+        {
+            "name": "wait",
+            "in": "query",
+            "required": False,
+            "type": "number",
+            "description": "Seconds to long-poll for a change (max 25)",
+            "default": 0
+        }
+    ],
+    "responses": {
+        "200": {
+            "description": "Job state",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "status": {"type": "string", "example": "running"},
+                    "steps": {"type": "array", "items": {"type": "object"}},
+                    "result": {"type": "object"},
+                    "error": {"type": "string"},
+                    "created_at": {"type": "string"},
+                    "updated_at": {"type": "string"}
+                }
+            }
+        },
+        "400": {"description": "wait is not a number"},
+        "404": {"description": "Job not found"},
+        "500": {"description": "Server error"}
+    }
+})
+def get_agent_job(job_id):
+    try:
+        MAX_WAIT_SECONDS = 25  # Stay under the gunicorn timeout
+        try:
+            wait = min(float(request.args.get('wait', 0)), MAX_WAIT_SECONDS)
+        except ValueError:
+            return jsonify({"error": "wait must be a number of seconds"}), 400
+        
+        job = agent_job_queue.wait(job_id, wait) if wait > 0 else agent_job_queue.get(job_id)
+        if not job:
+            return jsonify({"error": "Job not found"}), 404
+        
+        return jsonify(job), 200
+    
+    except Exception as e:
+        print(f"Error in /agent/jobs endpoint: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            'error': str(e)
+        }), 500
+
+@langchain_bp.route('/ask/stream', methods=['POST'])
+@swag_from({
+    "tags": ["LangChain"],
+    "summary": "Stream the answer of an AI model as Server-Sent Events",
+    "description": (
+        "Same request body as /ask. The response is a text/event-stream with "
+        "`token` events ({\"delta\": \"...\"}) followed by one `done` event with "
+        "the /ask response body, or an `error` event ({\"error\": \"...\"})."
+    ),
+    "produces": ["text/event-stream"],
+    "parameters": [
+        {
+            "in": "body",
+            "name": "body",
+            "required": True,
+            "schema": {
+                "type": "object",
+                "required": ["question"],
+                "properties": {
+                    "question": {"type": "string", "example": "What is the capital of France?"},
+                    "model": {"type": "string", "default": "claude-3-5-haiku-20241022", "description": "Model ID, or auto"}
+                }
+            }
+        }
+    ],
+    "responses": {
+        "200": {"description": "Event stream"},
+        "400": {"description": "Bad request, missing required parameters"}
+    }
+})
+def ask_stream():
+    data = request.get_json()
+    
+    if not data or 'question' not in data:
+        return jsonify({
+            'error': 'Question is required'
+        }), 400
+    
+    question = data['question']
+    model_id = data.get('model', 'claude-3-5-haiku-20241022')
+    
+    def generate():
+        try:
+            for event, payload in background_loop.iterate(langchain_controller.stream_question(question, model_id)):
+                yield _sse(event, payload)
+        except Exception as e:
+            print(f"Error in /ask/stream endpoint: {str(e)}")
+            print(traceback.format_exc())
+            yield _sse("error", {"error": f"Failed to get answer: {str(e)}"})
+    
+    return _sse_response(generate())
+
+@langchain_bp.route('/agent/ask/stream', methods=['POST'])
+@swag_from({
+    "tags": ["LangChain"],
+    "summary": "Stream a ReAct Agent run as Server-Sent Events",
+    "description": (
+        "Same request body as /agent/ask. The response is a text/event-stream with "
+        "`token` events ({\"delta\": \"...\"}) for model output, a `step` event for "
+        "each tool call once it returns (same shape as the /agent/ask steps), and "
+        "one `done` event with the /agent/ask response body. The turn is saved to "
+        "the chat history when the run completes; failures are sent as an `error` event."
+    ),
+    "produces": ["text/event-stream"],
+    "parameters": [
+        {
+            "in": "body",
+            "name": "body",
+            "required": True,
+            "schema": {
+                "type": "object",
+                "required": ["question", "user_id", "agent_id"],
+                "properties": {
+                    "question": {"type": "string", "example": "What is 7 multiplied by 5, then add 12?"},
+                    "user_id": {"type": "string"},
+                    "agent_id": {"type": "string"},
+                    "model": {"type": "string", "default": "claude-3-5-haiku-20241022", "description": "Model ID, or auto"},
+                    "tool_categories": {"type": "array", "items": {"type": "string"}}
+                }
+            }
+        }
+    ],
+    "responses": {
+        "200": {"description": "Event stream"},
+        "400": {"description": "Bad request, missing required parameters"},
+        "404": {"description": "Agent not found"},
+        "500": {"description": "Server error while loading the agent"}
+    }
+})
+def agent_stream():
+    data = request.get_json()
+    
+    if not data or 'question' not in data or 'user_id' not in data or 'agent_id' not in data:
+        return jsonify({
+            'error': 'Question, user_id, and agent_id are required'
+        }), 400
+    
+    question = data['question']
+    user_id = data['user_id']
+    agent_id = data['agent_id']
+    model_id = data.get('model', 'claude-3-5-haiku-20241022')
+    tool_categories = data.get('tool_categories', None)
+    
+    user_timestamp = datetime.utcnow().isoformat()
+    
+    try:
+        agent_context = AgentContext.load(agent_id, supabase_controller, chat_history_controller)
+    except AgentNotFoundError as e:
+        return jsonify({
+            'error': str(e)
+        }), 404
+    except Exception as e:
+        print(f"Error in /agent/ask/stream endpoint: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            'error': str(e)
+        }), 500
+    
+    def generate():
+        try:
+            stream = langchain_controller.stream_agent(question, model_id, tool_categories, user_id, agent_id, agent_context)
+            for event, payload in background_loop.iterate(stream):
+                if event == "done":
+                    # Save the turn before telling the client the run is complete
+                    agent_context.record_turn(_turn_messages(question, user_timestamp, payload))
+                yield _sse(event, payload)
+        except Exception as e:
+            print(f"Error in /agent/ask/stream endpoint: {str(e)}")
+            print(traceback.format_exc())
+            yield _sse("error", {"error": f"Failed to process query: {str(e)}"})
+    
+    return _sse_response(generate())
+
 @langchain_bp.route('/models', methods=['GET'])
 @swag_from({
     "tags": ["LangChain"],
@@ -0,0 +1,129 @@
+from flask import Blueprint, jsonify
+import traceback
+from flasgger import swag_from
+from routes.langchain_routes import langchain_controller
+from controller.event_loop.background_loop import background_loop
+from controller.jobs.agent_job_queue import agent_job_queue
+from controller.agent.usage_counter import agent_usage_counter
+from controller.resilience.dependency import dependency_stats
+from controller.supabase.supabase_controller import get_supabase_controller
+from controller.http.etag_cache import etag_cache
+from controller.http.compression import response_compressor
+
+# Create a Blueprint for the metrics routes
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/', methods=['GET'])
+@swag_from({
+    "tags": ["Metrics"],
+    "summary": "Get in-process metrics of this worker",
+    "description": "Returns cache and runtime counters of the worker process that served the request",
+    "responses": {
+        "200": {
+            "description": "Metrics grouped by component",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "agent_cache": {
+                        "type": "object",
+                        "description": "Compiled ReAct agent cache",
+                        "example": {"size": 3, "maxsize": 32, "ttl": None, "hits": 120, "misses": 3, "evictions": 0, "hit_ratio": 0.97}
+                    },
+                    "model_pool": {
+                        "type": "object",
+                        "description": "Pooled chat model clients and HTTP connection limits"
+                    },
+                    "model_router": {
+                        "type": "object",
+                        "description": "Requests routed per model for model auto, with moving averages of latency and error rate",
+                        "example": {"fast_model": "claude-3-5-haiku-20241022", "strong_model": "claude-3-7-sonnet-20250219", "threshold": 1.2, "models": {"claude-3-5-haiku-20241022": {"routed": 310, "calls": 305, "errors": 2, "avg_latency_ms": 2140.5, "error_rate": 0.0061}}}
+                    },
+                    "history_summary": {
+                        "type": "object",
+                        "description": "Background summarization of agent history that left the prompt window",
+                        "example": {"enabled": True, "model": "claude-3-5-haiku-20241022", "in_flight": 1, "scheduled": 64, "completed": 61, "conflicts": 2, "failures": 0, "messages_summarized": 540}
+                    },
+                    "prompt_cache": {
+                        "type": "object",
+                        "description": "Input and output tokens of agent runs, and input tokens read from and written to the provider's prompt cache",
+                        "example": {"enabled": True, "requests": 420, "input_tokens": 2310000, "output_tokens": 98000, "cache_read_tokens": 1720000, "cache_creation_tokens": 240000, "cache_read_ratio": 0.745}
+                    },
+                    "ask_cache": {
+                        "type": "object",
+                        "description": "Response cache of /langchain/ask: exact and similar-question hits, hit rate and estimated tokens saved",
+                        "example": {"enabled": True, "ttl": 3600.0, "similarity_threshold": 0.92, "size": 180, "exact_hits": 240, "similar_hits": 35, "misses": 410, "hit_rate": 0.4, "tokens_saved": 96200}
+                    },
+                    "event_loop": {
+                        "type": "object",
+                        "description": "Background event loop lag (seconds) and task counters",
+                        "example": {"running": True, "pending_tasks": 1, "submitted": 42, "completed": 41, "failed": 0, "last_lag": 0.0004, "max_lag": 0.012}
+                    },
+                    "agent_jobs": {
+                        "type": "object",
+                        "description": "Background agent jobs pending in this worker and their limits",
+                        "example": {"pending": 2, "max_pending": 32, "max_concurrent": 4}
+                    },
+                    "supabase_cache": {
+                        "type": "object",
+                        "description": "Supabase query cache hit ratio, entries and approximate bytes held",
+                        "example": {"enabled": True, "size": 210, "hits": 5400, "misses": 830, "hit_ratio": 0.87, "invalidations": 95, "bytes": 1843200}
+                    },
+                    "supabase_queries": {
+                        "type": "object",
+                        "description": "Latency histogram (ms), percentiles and payload bytes per Supabase operation and table, and the number of slow queries logged",
+                        "example": {"enabled": True, "slow_query_ms": 500.0, "slow_queries": 2, "operations": {"select ai_agents": {"count": 820, "errors": 0, "avg_ms": 38.2, "max_ms": 612.0, "p50_ms": 50, "p95_ms": 100, "p99_ms": 250, "request_bytes": 0, "response_bytes": 1432000, "buckets_ms": {"25": 301, "50": 420, "100": 80, "250": 17, "1000": 2}}}}
+                    },
+                    "supabase_writes": {
+                        "type": "object",
+                        "description": "Write buffer durability mode, rows waiting to be flushed and how many writes were coalesced per request",
+                        "example": {"durability": "group", "window_ms": 20.0, "max_rows": 500, "pending_rows": 4, "writes": 1800, "flushes": 310, "rows_flushed": 3596, "writes_per_flush": 5.8, "failures": 0}
+                    },
+                    "etag_cache": {
+                        "type": "object",
+                        "description": "Conditional GET: 304s answered from remembered ETags without a query, 304s after re-querying, and full responses",
+                        "example": {"enabled": True, "size": 140, "hits": 2300, "misses": 410, "not_modified_cached": 2300, "not_modified_revalidated": 95, "full_responses": 315, "invalidations": 60}
+                    },
+                    "response_compression": {
+                        "type": "object",
+                        "description": "Responses compressed per encoding, responses left uncompressed per reason, and body bytes before and after compression",
+                        "example": {"enabled": True, "brotli_available": True, "min_size": 1024, "compressed": {"br": 820, "gzip": 45}, "skipped": {"small": 3100, "content_type": 12, "not_accepted": 2}, "bytes_before": 48211000, "bytes_after": 6120400, "ratio": 0.127}
+                    },
+                    "agent_usage": {
+                        "type": "object",
+                        "description": "Agent usage counts waiting to be flushed and flush counters",
+                        "example": {"batching": True, "flush_interval": 5.0, "pending_agents": 3, "pending_turns": 17, "recorded": 940, "flushes": 120, "flushed": 923, "failures": 0}
+                    },
+                    "dependencies": {
+                        "type": "object",
+                        "description": "Circuit breaker state (closed, open or half_open), retries and timeouts per external service used by this worker",
+                        "example": {"supabase": {"state": "closed", "consecutive_failures": 0, "failure_threshold": 5, "reset_timeout": 30.0, "opened": 1, "calls": 5120, "failures": 7, "retries": 6, "rejected": 0, "connect_timeout": 3.0, "read_timeout": 10.0, "max_retries": 2}}
+                    }
+                }
+            }
+        },
+        "500": {"description": "Server error"}
+    }
+})
+def get_metrics():
+    try:
+        return jsonify({
+            "agent_cache": langchain_controller.get_agent_cache_stats(),
+            "model_pool": langchain_controller.get_model_pool_stats(),
+            "model_router": langchain_controller.get_model_router_stats(),
+            "history_summary": langchain_controller.get_history_summary_stats(),
+            "prompt_cache": langchain_controller.get_prompt_cache_stats(),
+            "ask_cache": langchain_controller.get_ask_cache_stats(),
+            "event_loop": background_loop.stats(),
+            "agent_jobs": agent_job_queue.stats(),
+            "supabase_cache": get_supabase_controller().get_cache_stats(),
+            "supabase_queries": get_supabase_controller().get_query_stats(),
+            "supabase_writes": get_supabase_controller().get_write_stats(),
+            "etag_cache": etag_cache.stats(),
+            "response_compression": response_compressor.stats(),
+            "agent_usage": agent_usage_counter.stats(),
+            "dependencies": dependency_stats()
+        }), 200
+    except Exception as e:
+        print(f"Error getting metrics: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500